@@ -42,3 +42,22 @@ class CDRReadWriteTests(unittest.TestCase):
             self.fail("IOError expected")
         except IOError:
             pass
+
+    def test_write_compression_profile(self):
+        testFile = os.path.join(self.testDir, 'delete_me.nc')
+        dataset = CDRWriter.createTemplate('UTH', 36, 20)
+        for name, value in dataset.attrs.items():
+            if value is None:
+                dataset.attrs[name] = "CDRReadWriteTests"
+        dataset["uth_ascend"].data[:] = 42.123456
+        dataset["uth_ascend"].encoding = dict(least_significant_digit=1)
+
+        CDRWriter.write(dataset, testFile, compression_profile="archive")
+
+        target_data = xr.open_dataset(testFile)
+        try:
+            self.assertEqual(9, target_data["uth_ascend"].encoding["complevel"])
+            self.assertTrue(target_data["uth_ascend"].encoding["shuffle"])
+            self.assertAlmostEqual(42.125, float(target_data["uth_ascend"].values[0, 0]), 5)
+        finally:
+            target_data.close()
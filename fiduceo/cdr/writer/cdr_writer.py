@@ -4,6 +4,7 @@ import xarray as xr
 
 from fiduceo.cdr.writer.templates.cdr_template_factory import CDR_TemplateFactory
 from fiduceo.common.version import __version__
+from fiduceo.common.writer.compression_profile import CompressionProfile
 from fiduceo.common.writer.writer_utils import WriterUtils
 
 DATE_PATTERN = "%Y%m%d%H%M%S"
@@ -12,13 +13,15 @@ DATE_PATTERN = "%Y%m%d%H%M%S"
 class CDRWriter:
 
     @staticmethod
-    def write(ds, file, compression_level=None, overwrite=False):
+    def write(ds, file, compression_level=None, overwrite=False, compression_profile=None):
         """
         Save a dataset to NetCDF file.
         :param ds: The dataset
         :param file: File path
-        :param compression_level: the file compression level, 0 - 9, default is 5
+        :param compression_level: the file compression level, 0 - 9, default is 5, overrides the level of the compression profile
         :param overwrite: set true to overwrite existing files
+        :param compression_profile: "fast", "balanced" or "archive" to set deflate level, shuffle filter and quantization per
+        variable class, default is the compression level for all variables
          """
         if os.path.isfile(file):
             if overwrite is True:
@@ -28,15 +31,7 @@ class CDRWriter:
 
         # set up compression parameter for ALL variables. Unfortunately, xarray does not allow
         # one set of compression params per file, only per variable. tb 2018-06-27
-        if compression_level is None:
-            compression_level = 5
-
-        comp = dict(zlib=True, complevel=compression_level)
-        encoding = dict()
-        for var_name in ds.data_vars:
-            var_encoding = dict(comp)
-            var_encoding.update(ds[var_name].encoding)
-            encoding.update({var_name: var_encoding})
+        encoding = CompressionProfile.create_encoding(ds, compression_level, compression_profile)
 
         ds.to_netcdf(file, format='netCDF4', engine='netcdf4', encoding=encoding)
 
@@ -0,0 +1,55 @@
+import re
+from datetime import datetime
+
+DATE_PATTERN = "%Y%m%d%H%M%S"
+
+FCDR_FILE_NAME = re.compile(
+    r"^FIDUCEO_FCDR_(?P<data_type>L1C)_(?P<sensor>.+?)_(?P<platform>[^_]+)_(?P<start>\d{14})_(?P<end>\d{14})_(?P<type>[^_]+)_v(?P<version>.+)_fv(?P<format_version>[^_]+)\.nc$")
+CDR_FILE_NAME = re.compile(
+    r"^FIDUCEO_CDR_(?P<data_type>[^_]+)_(?P<sensor>.+?)_(?P<platform>[^_]+)_(?P<start>\d{14})_(?P<end>\d{14})_(?P<type>[^_]+)_v(?P<version>.+)_fv(?P<format_version>[^_]+)\.nc$")
+
+
+class Granule:
+    """
+    The properties of a product file as encoded in its name.
+    """
+
+    def __init__(self, file_name, product, data_type, sensor, platform, start, end, type, version, format_version):
+        self.file_name = file_name
+        self.product = product
+        self.data_type = data_type
+        self.sensor = sensor
+        self.platform = platform
+        self.start = start
+        self.end = end
+        self.type = type
+        self.version = version
+        self.format_version = format_version
+
+
+class FileNameParser:
+
+    @staticmethod
+    def parse(file_name):
+        """
+        Parse a file name as created by FCDRWriter.create_file_name_FCDR_easy()/create_file_name_FCDR_full() or CDRWriter.create_file_name_CDR().
+        :param file_name: the file name, directories are ignored
+        :return the Granule, or None if the name does not follow the FIDUCEO conventions
+        """
+        file_name = file_name.replace("\\", "/").split("/")[-1]
+
+        for product, pattern in (("FCDR", FCDR_FILE_NAME), ("CDR", CDR_FILE_NAME)):
+            match = pattern.match(file_name)
+            if match is None:
+                continue
+
+            try:
+                start = datetime.strptime(match.group("start"), DATE_PATTERN)
+                end = datetime.strptime(match.group("end"), DATE_PATTERN)
+            except ValueError:
+                return None
+
+            return Granule(file_name, product, match.group("data_type"), match.group("sensor"), match.group("platform"), start, end, match.group("type"),
+                           match.group("version"), match.group("format_version"))
+
+        return None
@@ -0,0 +1,188 @@
+import calendar
+import os
+import sqlite3
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.common.catalogue.file_name_parser import FileNameParser
+
+DEFAULT_BLOCK_SIZE = 512
+
+LAT_NAME = "latitude"
+LON_NAME = "longitude"
+TIME_NAMES = ["time", "Time"]
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)",
+    "CREATE TABLE IF NOT EXISTS footprints (path TEXT NOT NULL, y_start INTEGER, y_stop INTEGER, lat_min REAL, lat_max REAL, lon_min REAL, lon_max REAL, "
+    "start_time INTEGER, end_time INTEGER)",
+    "CREATE INDEX IF NOT EXISTS footprints_path ON footprints (path)",
+    "CREATE INDEX IF NOT EXISTS footprints_lat ON footprints (lat_min, lat_max)",
+]
+
+
+class FootprintIndex:
+    """
+    Geographic bounding boxes of blocks of scanlines of product files, stored in a local SQLite database. Queries return the files and scanline
+    ranges intersecting a region, which can then be read selectively, e.g. FCDRReader.read(path).isel(y=slice(y_start, y_stop)).
+    """
+
+    def __init__(self, database_path):
+        """
+        Open or create a footprint index.
+        :param database_path: the SQLite database file, created if not existing
+        """
+        self.connection = sqlite3.connect(database_path)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add_files(self, paths, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Index the footprints of files, files unchanged since they have been indexed are skipped.
+        :param paths: the file paths
+        :param block_size: the number of scanlines per footprint
+        :return the number of files indexed
+        """
+        num_indexed = 0
+        for path in paths:
+            if self.add_file(path, block_size=block_size):
+                num_indexed += 1
+        return num_indexed
+
+    def add_file(self, path, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Index the footprints of a file. The variables latitude and longitude are read block by block, the times of each block are taken from the
+        variable "time" or "Time" along y if present, otherwise from the file name.
+        :param path: the file path
+        :param block_size: the number of scanlines per footprint
+        :return False if the file is unchanged since it has been indexed
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return False
+
+        footprints = list()
+        with xr.open_dataset(path) as ds:
+            file_times = FootprintIndex._get_file_times(path)
+            height = ds[LAT_NAME].shape[0]
+            for y_start in range(0, height, block_size):
+                y_stop = min(y_start + block_size, height)
+                start_time, end_time = FootprintIndex._get_block_times(ds, y_start, y_stop, file_times)
+                for lat_min, lat_max, lon_min, lon_max in FootprintIndex._get_block_boxes(ds, y_start, y_stop):
+                    footprints.append((path, y_start, y_stop, lat_min, lat_max, lon_min, lon_max, start_time, end_time))
+
+        self.connection.execute("DELETE FROM footprints WHERE path = ?", (path,))
+        self.connection.executemany("INSERT INTO footprints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", footprints)
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, stat.st_size, stat.st_mtime))
+        self.connection.commit()
+        return True
+
+    def remove_file(self, path):
+        path = os.path.abspath(path)
+        self.connection.execute("DELETE FROM footprints WHERE path = ?", (path,))
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.commit()
+
+    def query(self, lat_min, lat_max, lon_min, lon_max, start=None, end=None):
+        """
+        Find the scanline ranges intersecting a region. Blocks without time information match any time window.
+        :param lat_min: southern bound in degrees
+        :param lat_max: northern bound in degrees
+        :param lon_min: western bound in degrees, regions crossing the date line have lon_min > lon_max
+        :param lon_max: eastern bound in degrees
+        :param start: the start of the time window, type datetime
+        :param end: the end of the time window, type datetime
+        :return list of (path, y_start, y_stop), adjacent blocks merged, sorted by path and y_start
+        """
+        lon_min = float(FootprintIndex._normalize_longitude(lon_min))
+        lon_max = float(FootprintIndex._normalize_longitude(lon_max))
+        if lon_min <= lon_max:
+            lon_ranges = [(lon_min, lon_max)]
+        else:
+            lon_ranges = [(lon_min, 180.0), (-180.0, lon_max)]
+
+        conditions = ["lat_max >= ?", "lat_min <= ?", "(" + " OR ".join(["(lon_max >= ? AND lon_min <= ?)"] * len(lon_ranges)) + ")"]
+        parameters = [lat_min, lat_max]
+        for lon_range in lon_ranges:
+            parameters.extend(lon_range)
+
+        if end is not None:
+            conditions.append("(start_time IS NULL OR start_time <= ?)")
+            parameters.append(calendar.timegm(end.timetuple()))
+
+        if start is not None:
+            conditions.append("(end_time IS NULL OR end_time >= ?)")
+            parameters.append(calendar.timegm(start.timetuple()))
+
+        sql = "SELECT DISTINCT path, y_start, y_stop FROM footprints WHERE " + " AND ".join(conditions) + " ORDER BY path, y_start"
+
+        hits = list()
+        for path, y_start, y_stop in self.connection.execute(sql, parameters):
+            if len(hits) > 0 and hits[-1][0] == path and hits[-1][2] == y_start:
+                hits[-1] = (path, hits[-1][1], y_stop)
+            else:
+                hits.append((path, y_start, y_stop))
+        return hits
+
+    @staticmethod
+    def _get_block_boxes(ds, y_start, y_stop):
+        latitude = ds[LAT_NAME]
+        longitude = ds[LON_NAME]
+        lat = latitude[y_start:y_stop].values
+        if longitude.dims[0] == latitude.dims[0]:
+            lon = longitude[y_start:y_stop].values
+        else:
+            lon = longitude.values
+
+        lat = lat[np.isfinite(lat)]
+        lon = FootprintIndex._normalize_longitude(lon[np.isfinite(lon)])
+        if len(lat) == 0 or len(lon) == 0:
+            return []
+
+        lat_min = float(np.min(lat))
+        lat_max = float(np.max(lat))
+        east = lon[lon >= 0.0]
+        west = lon[lon < 0.0]
+        if len(east) > 0 and len(west) > 0 and np.max(lon) - np.min(lon) > 180.0:
+            # the block crosses the date line, one box on each side
+            return [(lat_min, lat_max, float(np.min(east)), 180.0), (lat_min, lat_max, -180.0, float(np.max(west)))]
+
+        return [(lat_min, lat_max, float(np.min(lon)), float(np.max(lon)))]
+
+    @staticmethod
+    def _get_block_times(ds, y_start, y_stop, file_times):
+        for name in TIME_NAMES:
+            if name in ds.variables and ds[name].dims == (ds[LAT_NAME].dims[0],) and np.issubdtype(ds[name].dtype, np.datetime64):
+                times = ds[name][y_start:y_stop].values
+                times = times[~np.isnat(times)]
+                if len(times) > 0:
+                    seconds = times.astype("datetime64[s]").astype(np.int64)
+                    return int(np.min(seconds)), int(np.max(seconds))
+
+        return file_times
+
+    @staticmethod
+    def _get_file_times(path):
+        granule = FileNameParser.parse(path)
+        if granule is None:
+            return None, None
+
+        return calendar.timegm(granule.start.timetuple()), calendar.timegm(granule.end.timetuple())
+
+    @staticmethod
+    def _normalize_longitude(lon):
+        lon = np.asarray(lon, dtype=np.float64)
+        return np.where((lon < -180.0) | (lon > 180.0), (lon + 180.0) % 360.0 - 180.0, lon)
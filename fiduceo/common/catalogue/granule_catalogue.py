@@ -0,0 +1,169 @@
+import calendar
+import os
+import sqlite3
+
+from fiduceo.common.catalogue.file_name_parser import FileNameParser
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, parent TEXT, mtime REAL)",
+    "CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent)",
+    "CREATE TABLE IF NOT EXISTS granules (path TEXT PRIMARY KEY, directory TEXT NOT NULL, product TEXT, data_type TEXT, sensor TEXT COLLATE NOCASE, "
+    "platform TEXT COLLATE NOCASE, start_time INTEGER, end_time INTEGER, type TEXT COLLATE NOCASE, version TEXT, format_version TEXT)",
+    "CREATE INDEX IF NOT EXISTS granules_directory ON granules (directory)",
+    "CREATE INDEX IF NOT EXISTS granules_sensor_platform_start ON granules (sensor, platform, start_time)",
+    "CREATE INDEX IF NOT EXISTS granules_sensor_start ON granules (sensor, start_time)",
+    "CREATE INDEX IF NOT EXISTS granules_start ON granules (start_time)",
+    "CREATE TABLE IF NOT EXISTS properties (name TEXT PRIMARY KEY, value INTEGER)",
+]
+
+MAX_DURATION = "max_duration"
+
+
+class GranuleCatalogue:
+    """
+    Index of FIDUCEO product files, stored in a local SQLite database and built from the file names only.
+    """
+
+    def __init__(self, database_path):
+        """
+        Open or create a catalogue.
+        :param database_path: the SQLite database file, created if not existing
+        """
+        self.connection = sqlite3.connect(database_path)
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def update(self, root_dir):
+        """
+        Index all product files below a directory. Directories whose modification time is unchanged since the last update are not listed again,
+        the files of directories removed meanwhile are dropped from the catalogue.
+        :param root_dir: the directory to index recursively
+        :return the number of directories listed
+        """
+        root_dir = os.path.abspath(root_dir)
+        num_listed = 0
+
+        to_visit = [(root_dir, None)]
+        while len(to_visit) > 0:
+            directory, parent = to_visit.pop()
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                self._remove_directory(directory)
+                continue
+
+            row = self.connection.execute("SELECT mtime FROM directories WHERE path = ?", (directory,)).fetchone()
+            if row is not None and row[0] == mtime:
+                sub_directories = [r[0] for r in self.connection.execute("SELECT path FROM directories WHERE parent = ?", (directory,))]
+            else:
+                sub_directories = self._list_directory(directory, parent, mtime)
+                num_listed += 1
+
+            to_visit.extend((sub_directory, directory) for sub_directory in sub_directories)
+
+        self.connection.commit()
+        return num_listed
+
+    def query(self, sensor=None, platform=None, start=None, end=None, type=None, version=None, product=None, data_type=None):
+        """
+        Find the product files matching all given criteria, sensor, platform and type are compared case-insensitive.
+        :param sensor: the sensor name, e.g. "AVHRR"
+        :param platform: the platform name, e.g. "NOAA18"
+        :param start: the start of the time window, files ending before are excluded, type datetime
+        :param end: the end of the time window, files starting after are excluded, type datetime
+        :param type: the product type, e.g. "EASY", "FULL", "L2", "ENSEMBLE"
+        :param version: the processor version string
+        :param product: "FCDR" or "CDR"
+        :param data_type: the data type, "L1C" for FCDRs, e.g. "UTH", "AOT" for CDRs
+        :return the paths of the matching files, sorted by start time
+        """
+        conditions = list()
+        parameters = list()
+        for column, value in (("sensor", sensor), ("platform", platform), ("type", type), ("version", version), ("product", product), ("data_type", data_type)):
+            if value is not None:
+                conditions.append(column + " = ?")
+                parameters.append(value)
+
+        if end is not None:
+            conditions.append("start_time <= ?")
+            parameters.append(GranuleCatalogue._to_seconds(end))
+
+        if start is not None:
+            start_seconds = GranuleCatalogue._to_seconds(start)
+            # the lower bound on start_time lets SQLite use the index for the window
+            conditions.append("start_time >= ?")
+            parameters.append(start_seconds - self._get_max_duration())
+            conditions.append("end_time >= ?")
+            parameters.append(start_seconds)
+
+        sql = "SELECT path FROM granules"
+        if len(conditions) > 0:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY start_time, path"
+
+        return [row[0] for row in self.connection.execute(sql, parameters)]
+
+    def get_size(self):
+        """
+        :return the number of files in the catalogue
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM granules").fetchone()[0]
+
+    def _list_directory(self, directory, parent, mtime):
+        sub_directories = list()
+        granules = list()
+        max_duration = 0
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if os.path.isdir(path):
+                sub_directories.append(path)
+                continue
+
+            granule = FileNameParser.parse(entry)
+            if granule is None:
+                continue
+
+            start_time = GranuleCatalogue._to_seconds(granule.start)
+            end_time = GranuleCatalogue._to_seconds(granule.end)
+            max_duration = max(max_duration, end_time - start_time)
+            granules.append((path, directory, granule.product, granule.data_type, granule.sensor, granule.platform, start_time, end_time, granule.type,
+                             granule.version, granule.format_version))
+
+        self.connection.execute("DELETE FROM granules WHERE directory = ?", (directory,))
+        self.connection.executemany("INSERT OR REPLACE INTO granules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", granules)
+        self.connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)", (directory, parent, mtime))
+        if max_duration > self._get_max_duration():
+            self.connection.execute("INSERT OR REPLACE INTO properties VALUES (?, ?)", (MAX_DURATION, max_duration))
+
+        for row in self.connection.execute("SELECT path FROM directories WHERE parent = ?", (directory,)).fetchall():
+            if row[0] not in sub_directories:
+                self._remove_directory(row[0])
+
+        return sub_directories
+
+    def _remove_directory(self, directory):
+        for row in self.connection.execute("SELECT path FROM directories WHERE parent = ?", (directory,)).fetchall():
+            self._remove_directory(row[0])
+
+        self.connection.execute("DELETE FROM granules WHERE directory = ?", (directory,))
+        self.connection.execute("DELETE FROM directories WHERE path = ?", (directory,))
+
+    def _get_max_duration(self):
+        row = self.connection.execute("SELECT value FROM properties WHERE name = ?", (MAX_DURATION,)).fetchone()
+        if row is None:
+            return 0
+        return row[0]
+
+    @staticmethod
+    def _to_seconds(date_time):
+        return calendar.timegm(date_time.timetuple())
@@ -0,0 +1,62 @@
+import unittest
+from datetime import datetime
+
+from fiduceo.cdr.writer.cdr_writer import CDRWriter
+from fiduceo.common.catalogue.file_name_parser import FileNameParser
+from fiduceo.common.version import __version__
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+
+class FileNameParserTest(unittest.TestCase):
+
+    def test_parse_fcdr_easy(self):
+        start = datetime(2016, 11, 22, 13, 24, 52)
+        end = datetime(2016, 11, 22, 14, 25, 53)
+        file_name = FCDRWriter.create_file_name_FCDR_easy("HIRS4", "METOPA", start, end, "04.5")
+
+        granule = FileNameParser.parse(file_name)
+
+        self.assertEqual(file_name, granule.file_name)
+        self.assertEqual("FCDR", granule.product)
+        self.assertEqual("L1C", granule.data_type)
+        self.assertEqual("HIRS4", granule.sensor)
+        self.assertEqual("METOPA", granule.platform)
+        self.assertEqual(start, granule.start)
+        self.assertEqual(end, granule.end)
+        self.assertEqual("EASY", granule.type)
+        self.assertEqual("04.5", granule.version)
+        self.assertEqual(__version__, granule.format_version)
+
+    def test_parse_fcdr_full_with_directory(self):
+        start = datetime(2003, 1, 2, 3, 4, 5)
+        end = datetime(2003, 1, 2, 3, 34, 5)
+        file_name = FCDRWriter.create_file_name_FCDR_full("MVIRI", "MET7-0.00", start, end, "02.3")
+
+        granule = FileNameParser.parse("/archive/mviri/2003/" + file_name)
+
+        self.assertEqual(file_name, granule.file_name)
+        self.assertEqual("MVIRI", granule.sensor)
+        self.assertEqual("MET7-0.00", granule.platform)
+        self.assertEqual("FULL", granule.type)
+        self.assertEqual("02.3", granule.version)
+
+    def test_parse_cdr(self):
+        start = datetime(2016, 11, 22, 13, 24, 52)
+        end = datetime(2016, 11, 22, 14, 25, 53)
+        file_name = CDRWriter.create_file_name_CDR("SST", "AVHRR", "NOAA18", start, end, "ENSEMBLE", "03.3")
+
+        granule = FileNameParser.parse(file_name)
+
+        self.assertEqual("CDR", granule.product)
+        self.assertEqual("SST", granule.data_type)
+        self.assertEqual("AVHRR", granule.sensor)
+        self.assertEqual("NOAA18", granule.platform)
+        self.assertEqual(start, granule.start)
+        self.assertEqual(end, granule.end)
+        self.assertEqual("ENSEMBLE", granule.type)
+        self.assertEqual("03.3", granule.version)
+
+    def test_parse_invalid(self):
+        self.assertIsNone(FileNameParser.parse("NSS.GHRR.NL.D16327.S1324.E1425.B5923637.GC.nc"))
+        self.assertIsNone(FileNameParser.parse("FIDUCEO_FCDR_L1C_AVHRR_NOAA18_20161322132452_20161122142553_EASY_v1.0_fv2.0.0.nc"))
+        self.assertIsNone(FileNameParser.parse("FIDUCEO_FCDR_L1C_AVHRR_NOAA18_20161122132452_20161122142553_EASY_v1.0_fv2.0.0.nc.tmp"))
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.common.catalogue.footprint_index import FootprintIndex
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+
+class FootprintIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index = FootprintIndex(os.path.join(self.temp_dir, "footprints.sqlite"))
+
+        # descending orbit, one degree latitude per 10 lines
+        latitude = np.repeat(np.linspace(60.0, -59.9, 1200), 5).reshape(1200, 5)
+        longitude = np.tile(np.linspace(10.0, 20.0, 5), (1200, 1))
+        times = np.datetime64("2016-01-01T00:00:00") + np.arange(0, 1200).astype("timedelta64[s]")
+        self.swath_path = self._write_file("swath.nc", latitude, longitude, times)
+
+        latitude = np.repeat(np.linspace(-5.0, 5.0, 100), 4).reshape(100, 4)
+        longitude = np.tile(np.array([175.0, 179.0, -179.0, -175.0]), (100, 1))
+        file_name = FCDRWriter.create_file_name_FCDR_easy("AVHRR", "NOAA18", datetime(2016, 1, 2, 10), datetime(2016, 1, 2, 11), "1.0")
+        self.date_line_path = self._write_file(file_name, latitude, longitude, None)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_query_returns_scanline_ranges(self):
+        self.assertEqual(2, self.index.add_files([self.swath_path, self.date_line_path], block_size=100))
+
+        hits = self.index.query(0.0, 5.0, 12.0, 14.0)
+        self.assertEqual([(self.swath_path, 500, 700)], hits)
+
+        hits = self.index.query(30.0, 40.0, 0.0, 30.0, start=datetime(2016, 1, 1, 0, 3), end=datetime(2016, 1, 1, 0, 4))
+        self.assertEqual([(self.swath_path, 200, 300)], hits)
+
+        self.assertEqual([], self.index.query(30.0, 40.0, 0.0, 30.0, start=datetime(2016, 1, 1, 1)))
+        self.assertEqual([], self.index.query(0.0, 5.0, 21.0, 30.0))
+
+    def test_query_date_line(self):
+        self.index.add_file(self.date_line_path)
+
+        self.assertEqual([(self.date_line_path, 0, 100)], self.index.query(-1.0, 1.0, 178.0, -178.0))
+        self.assertEqual([(self.date_line_path, 0, 100)], self.index.query(-1.0, 1.0, -177.0, -170.0, start=datetime(2016, 1, 2, 10, 30)))
+        self.assertEqual([(self.date_line_path, 0, 100)], self.index.query(-1.0, 1.0, 176.0, 180.0))
+        self.assertEqual([], self.index.query(-1.0, 1.0, 0.0, 170.0))
+        self.assertEqual([], self.index.query(-1.0, 1.0, -180.0, 180.0, end=datetime(2016, 1, 2, 9)))
+
+    def test_add_file_skips_unchanged(self):
+        self.assertTrue(self.index.add_file(self.swath_path, block_size=600))
+        self.assertFalse(self.index.add_file(self.swath_path, block_size=600))
+
+        os.utime(self.swath_path, (time.time() + 10, time.time() + 10))
+        self.assertTrue(self.index.add_file(self.swath_path, block_size=600))
+        self.assertEqual([(self.swath_path, 0, 600)], self.index.query(10.0, 20.0, 15.0, 16.0))
+
+        self.index.remove_file(self.swath_path)
+        self.assertEqual([], self.index.query(10.0, 20.0, 15.0, 16.0))
+
+    def _write_file(self, file_name, latitude, longitude, times):
+        ds = xr.Dataset()
+        ds["latitude"] = xr.Variable(["y", "x"], latitude.astype(np.float32))
+        ds["longitude"] = xr.Variable(["y", "x"], longitude.astype(np.float32))
+        if times is not None:
+            ds["time"] = xr.Variable(["y"], times)
+
+        path = os.path.join(self.temp_dir, file_name)
+        ds.to_netcdf(path)
+        return path
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from fiduceo.cdr.writer.cdr_writer import CDRWriter
+from fiduceo.common.catalogue.granule_catalogue import GranuleCatalogue
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+
+class GranuleCatalogueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.temp_dir, "archive")
+        os.makedirs(os.path.join(self.archive_dir, "avhrr", "2016"))
+        os.makedirs(os.path.join(self.archive_dir, "hirs", "2016"))
+        os.makedirs(os.path.join(self.archive_dir, "sst"))
+
+        self.catalogue = GranuleCatalogue(os.path.join(self.temp_dir, "catalogue.sqlite"))
+
+    def tearDown(self):
+        self.catalogue.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_query(self):
+        self._create_orbit_files("avhrr/2016", "AVHRR", "NOAA18", 10)
+        self._create_orbit_files("hirs/2016", "HIRS4", "NOAA18", 10)
+        self._touch("sst", CDRWriter.create_file_name_CDR("SST", "AVHRR", "NOAA18", datetime(2016, 1, 1, 2), datetime(2016, 1, 1, 4), "L2", "03.3"))
+        self._touch("sst", "README.txt")
+
+        self.assertEqual(6, self.catalogue.update(self.archive_dir))
+        self.assertEqual(21, self.catalogue.get_size())
+
+        paths = self.catalogue.query(sensor="avhrr", platform="NOAA18", start=datetime(2016, 1, 1, 3, 10), end=datetime(2016, 1, 1, 5, 0))
+        self.assertEqual(3, len(paths))
+        self.assertTrue(paths[0].endswith("FIDUCEO_FCDR_L1C_AVHRR_NOAA18_20160101020000_20160101034000_EASY_v1.0_fv2.0.0.nc"))
+        self.assertTrue(paths[1].endswith("FIDUCEO_CDR_SST_AVHRR_NOAA18_20160101020000_20160101040000_L2_v03.3_fv2.0.0.nc"))
+        self.assertTrue(paths[2].endswith("FIDUCEO_FCDR_L1C_AVHRR_NOAA18_20160101040000_20160101054000_EASY_v1.0_fv2.0.0.nc"))
+
+        self.assertEqual(2, len(self.catalogue.query(start=datetime(2016, 1, 1, 0, 30), end=datetime(2016, 1, 1, 0, 40))))
+        self.assertEqual(1, len(self.catalogue.query(product="CDR", data_type="SST", type="L2", version="03.3")))
+        self.assertEqual(20, len(self.catalogue.query(type="easy", version="1.0")))
+        self.assertEqual(0, len(self.catalogue.query(sensor="MVIRI")))
+
+    def test_update_lists_changed_directories_only(self):
+        self._create_orbit_files("avhrr/2016", "AVHRR", "NOAA18", 3)
+        self.assertEqual(6, self.catalogue.update(self.archive_dir))
+
+        self.assertEqual(0, self.catalogue.update(self.archive_dir))
+
+        file_name = FCDRWriter.create_file_name_FCDR_easy("HIRS4", "NOAA18", datetime(2016, 2, 1), datetime(2016, 2, 1, 1), "1.0")
+        self._touch("hirs/2016", file_name)
+        os.remove(os.path.join(self.archive_dir, "avhrr", "2016", os.listdir(os.path.join(self.archive_dir, "avhrr", "2016"))[0]))
+        self._set_mtime("hirs/2016", 1000)
+        self._set_mtime("avhrr/2016", 2000)
+
+        self.assertEqual(2, self.catalogue.update(self.archive_dir))
+        self.assertEqual(3, self.catalogue.get_size())
+        self.assertEqual(1, len(self.catalogue.query(sensor="HIRS4")))
+
+        shutil.rmtree(os.path.join(self.archive_dir, "avhrr"))
+        self._set_mtime("", 3000)
+
+        self.assertEqual(1, self.catalogue.update(self.archive_dir))
+        self.assertEqual(1, self.catalogue.get_size())
+
+    def _create_orbit_files(self, directory, sensor, platform, num_orbits):
+        start = datetime(2016, 1, 1)
+        for orbit in range(0, num_orbits):
+            end = start + timedelta(minutes=100)
+            self._touch(directory, FCDRWriter.create_file_name_FCDR_easy(sensor, platform, start, end, "1.0"))
+            start = start + timedelta(minutes=120)
+
+    def _touch(self, directory, file_name):
+        with open(os.path.join(self.archive_dir, directory, file_name), "w"):
+            pass
+
+    def _set_mtime(self, directory, mtime):
+        # directory modification times may not change within the resolution of the file system
+        os.utime(os.path.join(self.archive_dir, directory), (mtime, mtime))
@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.common.writer.compression_profile import CompressionProfile
+
+
+class CompressionProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = xr.Dataset()
+        self.dataset["btemps"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.float32), {"units": "K"})
+        self.dataset["btemps"].encoding = dict([('dtype', np.int32), ('scale_factor', 0.01), ('_FillValue', -999999)])
+        self.dataset["u_independent_btemps"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.float32), {"units": "K"})
+        self.dataset["latitude"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.float32), {"units": "degrees_north"})
+        self.dataset["u_solar_zenith_angle"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.float32), {"units": "degree"})
+        self.dataset["u_sea_surface_temperature"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.float32), {"scale_factor": 0.0025})
+        self.dataset["count_ir"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.uint8), {"units": "count"})
+        self.dataset["quality_pixel_bitmask"] = xr.Variable(["y", "x"], np.zeros((3, 4), dtype=np.uint8), {"flag_masks": "1, 2"})
+
+    def test_get_variable_class(self):
+        self.assertEqual("uncertainties", self._get_variable_class("u_independent_btemps"))
+        self.assertEqual("uncertainties", self._get_variable_class("u_solar_zenith_angle"))
+        self.assertEqual("counts", self._get_variable_class("count_ir"))
+        self.assertEqual("flags", self._get_variable_class("quality_pixel_bitmask"))
+        self.assertEqual("angles", self._get_variable_class("latitude"))
+        self.assertEqual("other", self._get_variable_class("btemps"))
+
+        variable = xr.Variable(["y"], np.zeros(3, dtype=np.float32))
+        self.assertEqual("uncertainties", CompressionProfile.get_variable_class("Ch4_ur_Bt", variable))
+        self.assertEqual("uncertainties", CompressionProfile.get_variable_class("Ch1_u_Csp", variable))
+        self.assertEqual("counts", CompressionProfile.get_variable_class("Ch1_Csp", xr.Variable(["y"], np.zeros(3), {"units": "count"})))
+        self.assertEqual("angles", CompressionProfile.get_variable_class("solar_zenith_angle", variable))
+        self.assertEqual("other", CompressionProfile.get_variable_class("sub_satellite_latitude_start", variable))
+
+    def test_get_least_significant_digit(self):
+        self.assertEqual(2, CompressionProfile.get_least_significant_digit(self.dataset, "u_independent_btemps"))
+        self.assertEqual(3, CompressionProfile.get_least_significant_digit(self.dataset, "u_sea_surface_temperature"))
+
+        # packed
+        self.assertIsNone(CompressionProfile.get_least_significant_digit(self.dataset, "btemps"))
+        # no scale_factor
+        self.assertIsNone(CompressionProfile.get_least_significant_digit(self.dataset, "u_solar_zenith_angle"))
+        # integer
+        self.assertIsNone(CompressionProfile.get_least_significant_digit(self.dataset, "count_ir"))
+
+    def test_create_encoding_default(self):
+        encoding = CompressionProfile.create_encoding(self.dataset)
+
+        self.assertEqual(dict(zlib=True, complevel=5), encoding["latitude"])
+        self.assertEqual(dict([('zlib', True), ('complevel', 5), ('dtype', np.int32), ('scale_factor', 0.01), ('_FillValue', -999999)]), encoding["btemps"])
+
+        encoding = CompressionProfile.create_encoding(self.dataset, compression_level=2)
+        self.assertEqual(dict(zlib=True, complevel=2), encoding["u_independent_btemps"])
+
+    def test_create_encoding_profiles(self):
+        encoding = CompressionProfile.create_encoding(self.dataset, profile="fast")
+        self.assertEqual(dict(zlib=True, complevel=1, shuffle=True), encoding["u_independent_btemps"])
+        self.assertEqual(dict(zlib=True, complevel=1, shuffle=False), encoding["quality_pixel_bitmask"])
+
+        encoding = CompressionProfile.create_encoding(self.dataset, profile="balanced")
+        self.assertEqual(dict(zlib=True, complevel=5, shuffle=True, least_significant_digit=2), encoding["u_independent_btemps"])
+        self.assertEqual(dict(zlib=True, complevel=5, shuffle=True), encoding["latitude"])
+
+        encoding = CompressionProfile.create_encoding(self.dataset, profile="archive")
+        self.assertEqual(dict(zlib=True, complevel=9, shuffle=True, least_significant_digit=3), encoding["u_sea_surface_temperature"])
+        self.assertEqual(9, encoding["btemps"]["complevel"])
+        self.assertEqual(0.01, encoding["btemps"]["scale_factor"])
+        self.assertEqual(dict(zlib=True, complevel=9, shuffle=True), encoding["count_ir"])
+
+    def test_create_encoding_profile_level_and_variable_encoding(self):
+        self.dataset["u_independent_btemps"].encoding = dict(least_significant_digit=1)
+
+        encoding = CompressionProfile.create_encoding(self.dataset, compression_level=0, profile="archive")
+
+        self.assertEqual(dict(zlib=False, complevel=0, shuffle=True, least_significant_digit=1), encoding["u_independent_btemps"])
+
+    def test_create_encoding_invalid_profile(self):
+        with self.assertRaises(ValueError):
+            CompressionProfile.create_encoding(self.dataset, profile="smallest")
+
+    def _get_variable_class(self, var_name):
+        return CompressionProfile.get_variable_class(var_name, self.dataset[var_name])
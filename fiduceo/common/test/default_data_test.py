@@ -3,6 +3,7 @@ import unittest
 import numpy as np
 
 from fiduceo.common.writer.default_data import DefaultData
+from fiduceo.common.writer.fill_value_array import FillValueArray
 
 
 class DefaultDataTest(unittest.TestCase):
@@ -16,6 +17,20 @@ class DefaultDataTest(unittest.TestCase):
         self.assertEqual((15,), default_array.shape)
         self.assertEqual(108, default_array.data[3])
 
+    def test_create_default_array_lazy(self):
+        with DefaultData.lazy_allocation():
+            self.assertTrue(DefaultData.is_lazy_allocation())
+            default_array = DefaultData.create_default_array_3d(5, 4, 3, np.int16)
+
+            with DefaultData.lazy_allocation(False):
+                self.assertIsInstance(DefaultData.create_default_vector(4, np.int16).data, np.ndarray)
+
+        self.assertFalse(DefaultData.is_lazy_allocation())
+        self.assertIsInstance(default_array.data, FillValueArray)
+        self.assertEqual((3, 4, 5), default_array.shape)
+        self.assertEqual(('channel', 'y', 'x'), default_array.dims)
+        self.assertEqual(-32767, default_array.data[2, 3, 4])
+
     def test_get_default_fill_value(self):
         self.assertEqual(-127, DefaultData.get_default_fill_value(np.int8))
         self.assertEqual(-32767, DefaultData.get_default_fill_value(np.int16))
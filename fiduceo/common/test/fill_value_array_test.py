@@ -0,0 +1,109 @@
+import copy
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.common.writer.fill_value_array import FillValueArray
+
+
+class FillValueArrayTest(unittest.TestCase):
+
+    def test_read_untouched(self):
+        array = FillValueArray((4, 3), np.float32, np.NaN)
+
+        self.assertEqual((4, 3), array.shape)
+        self.assertEqual(np.float32, array.dtype)
+        self.assertEqual(2, array.ndim)
+        self.assertEqual(12, array.size)
+        self.assertEqual(48, array.nbytes)
+        self.assertTrue(np.isnan(array[2, 1]))
+        self.assertEqual((2,), array[[0, 3], 1].shape)
+        self.assertTrue(np.all(np.isnan(array + 1.0)))
+        self.assertTrue(np.isnan(np.nanmax(array)))
+        self.assertFalse(array.is_materialized())
+
+    def test_asarray_allocates(self):
+        array = FillValueArray((2, 3), np.int16, -32767)
+
+        values = np.asarray(array)
+        values[1, 2] = 12
+
+        self.assertTrue(array.is_materialized())
+        self.assertEqual(12, array[1, 2])
+        np.testing.assert_array_equal(np.full((2, 3), -32767.0), np.asarray(FillValueArray((2, 3), np.int16, -32767), dtype=np.float64))
+
+    def test_copyto_destination(self):
+        array = FillValueArray((2, 2), np.float32, np.NaN)
+        source = FillValueArray((2, 2), np.float32, 1.5)
+
+        np.copyto(array, source)
+        np.copyto(array, 2.5, where=np.array([[True, False], [False, False]]))
+
+        self.assertTrue(array.is_materialized())
+        self.assertFalse(source.is_materialized())
+        np.testing.assert_array_equal([[2.5, 1.5], [1.5, 1.5]], np.asarray(array))
+
+    def test_write_allocates(self):
+        array = FillValueArray((3, 2), np.int16, -32767)
+
+        array[1, 1] = 12
+
+        self.assertTrue(array.is_materialized())
+        np.testing.assert_array_equal([[-32767, -32767], [-32767, 12], [-32767, -32767]], np.asarray(array))
+        self.assertEqual(12, array[1, 1])
+
+    def test_write_through_view(self):
+        array = FillValueArray((2, 2), np.float32, np.NaN)
+
+        array[0][1] = 5.0
+
+        self.assertEqual(5.0, array[0, 1])
+        self.assertTrue(np.isnan(array[0, 0]))
+
+    def test_ufunc_output(self):
+        array = FillValueArray((2, 3), np.uint8, 0)
+
+        np.bitwise_or(array, np.uint8(4), out=array)
+        array |= np.uint8(1)
+
+        np.testing.assert_array_equal(np.full((2, 3), 5), np.asarray(array))
+
+    def test_operators_and_functions(self):
+        array = FillValueArray((2, 2), np.int32, 3)
+
+        np.testing.assert_array_equal(np.full((2, 2), 6), array * 2)
+        self.assertEqual(12, np.sum(array))
+        self.assertEqual((4, 2), np.concatenate([array, array]).shape)
+        self.assertEqual(np.float64, array.astype(np.float64).dtype)
+        self.assertFalse(array.is_materialized())
+
+    def test_copy(self):
+        array = FillValueArray((2,), np.float64, 1.0)
+        array[0] = 2.0
+
+        copied = copy.deepcopy(array)
+        copied[1] = 3.0
+
+        np.testing.assert_array_equal([2.0, 1.0], np.asarray(array))
+        np.testing.assert_array_equal([2.0, 1.0], np.asarray(array.copy()))
+        np.testing.assert_array_equal([2.0, 3.0], np.asarray(copied))
+
+    def test_as_xarray_variable_data(self):
+        array = FillValueArray((3, 4), np.float32, np.NaN)
+        variable = xr.Variable(["y", "x"], array)
+
+        self.assertIs(array, variable.data)
+        variable.data[1, :] = 7.0
+
+        self.assertEqual(28.0, float(variable.sum()))
+        self.assertEqual((2, 4), variable[1:].shape)
+        np.testing.assert_array_equal(np.full(4, 7.0), variable.values[1])
+
+    def test_write_through_xarray_values(self):
+        variable = xr.Variable(["y", "x"], FillValueArray((3, 4), np.float32, np.NaN))
+
+        variable.values[2, 3] = 4.0
+
+        self.assertTrue(variable.data.is_materialized())
+        self.assertEqual(4.0, float(variable[2, 3]))
@@ -0,0 +1,154 @@
+import math
+import re
+
+import numpy as np
+
+FAST = "fast"
+BALANCED = "balanced"
+ARCHIVE = "archive"
+
+COUNTS = "counts"
+UNCERTAINTIES = "uncertainties"
+ANGLES = "angles"
+FLAGS = "flags"
+OTHER = "other"
+
+DEFAULT_COMPRESSION_LEVEL = 5
+
+# deflate level, HDF5 shuffle filter and precision based quantization per variable class. Quantization applies to
+# variables stored as floating point only, packed variables are already quantized by their scale_factor.
+PROFILES = {
+    FAST: {
+        COUNTS: dict(complevel=1, shuffle=True, quantize=False),
+        UNCERTAINTIES: dict(complevel=1, shuffle=True, quantize=False),
+        ANGLES: dict(complevel=1, shuffle=True, quantize=False),
+        FLAGS: dict(complevel=1, shuffle=False, quantize=False),
+        OTHER: dict(complevel=1, shuffle=True, quantize=False),
+    },
+    BALANCED: {
+        COUNTS: dict(complevel=5, shuffle=True, quantize=False),
+        UNCERTAINTIES: dict(complevel=5, shuffle=True, quantize=True),
+        ANGLES: dict(complevel=5, shuffle=True, quantize=False),
+        FLAGS: dict(complevel=5, shuffle=True, quantize=False),
+        OTHER: dict(complevel=5, shuffle=True, quantize=False),
+    },
+    ARCHIVE: {
+        COUNTS: dict(complevel=9, shuffle=True, quantize=False),
+        UNCERTAINTIES: dict(complevel=9, shuffle=True, quantize=True),
+        ANGLES: dict(complevel=9, shuffle=True, quantize=True),
+        FLAGS: dict(complevel=9, shuffle=True, quantize=False),
+        OTHER: dict(complevel=9, shuffle=True, quantize=False),
+    },
+}
+
+UNCERTAINTY_NAME = re.compile(r"(^|_)u[rs]?_")
+# qualifiers of uncertainty variable names, e.g. u_independent_Ch1 is the uncertainty of Ch1
+UNCERTAINTY_QUALIFIERS = ["independent_", "structured_", "common_", "syst_", "random_"]
+
+
+class CompressionProfile:
+
+    @staticmethod
+    def create_encoding(ds, compression_level=None, profile=None):
+        """
+        Create the NetCDF encoding of all data variables of a dataset. Without profile, all variables are deflated with
+        the compression level given. With a named profile, deflate level, shuffle filter and quantization are set per
+        variable class. The encoding of each variable in the dataset takes precedence.
+        :param ds: the dataset
+        :param compression_level: the file compression level, 0 - 9, overrides the level of the profile, default is 5
+        :param profile: the compression profile, "fast", "balanced", "archive" or None
+        :return: dictionary of the encoding per variable name
+        """
+        if profile is not None and profile not in PROFILES:
+            raise ValueError("Invalid compression profile: " + str(profile))
+
+        encoding = dict()
+        for var_name in ds.data_vars:
+            if profile is None:
+                level = DEFAULT_COMPRESSION_LEVEL if compression_level is None else compression_level
+                var_encoding = dict(zlib=True, complevel=level)
+            else:
+                var_encoding = CompressionProfile.get_profile_encoding(ds, var_name, profile)
+                if compression_level is not None:
+                    var_encoding["complevel"] = compression_level
+                var_encoding["zlib"] = var_encoding["complevel"] > 0
+
+            var_encoding.update(ds[var_name].encoding)
+            encoding.update({var_name: var_encoding})
+
+        return encoding
+
+    @staticmethod
+    def get_profile_encoding(ds, var_name, profile):
+        """
+        Get the compression settings of a profile for a variable.
+        :param ds: the dataset
+        :param var_name: the variable name
+        :param profile: the compression profile
+        :return: dictionary with "complevel", "shuffle" and, if the variable is quantized, "least_significant_digit"
+        """
+        settings = PROFILES[profile][CompressionProfile.get_variable_class(var_name, ds[var_name])]
+        encoding = dict(complevel=settings["complevel"], shuffle=settings["shuffle"])
+        if settings["quantize"]:
+            digits = CompressionProfile.get_least_significant_digit(ds, var_name)
+            if digits is not None:
+                encoding["least_significant_digit"] = digits
+        return encoding
+
+    @staticmethod
+    def get_variable_class(var_name, variable):
+        """
+        Classify a variable by name and metadata.
+        :param var_name: the variable name
+        :param variable: the variable
+        :return: one of "counts", "uncertainties", "angles", "flags" or "other"
+        """
+        attrs = variable.attrs
+        if "flag_masks" in attrs or "flag_meanings" in attrs or "flag_values" in attrs:
+            return FLAGS
+
+        if UNCERTAINTY_NAME.search(var_name) is not None:
+            return UNCERTAINTIES
+
+        units = str(attrs.get("units", ""))
+        if units == "count" or "count" in var_name:
+            return COUNTS
+
+        if "angle" in var_name or units.startswith("degree"):
+            return ANGLES
+
+        return OTHER
+
+    @staticmethod
+    def get_least_significant_digit(ds, var_name):
+        """
+        Derive the decimal precision retained when quantizing a floating point variable from the scale_factor of the
+        variable, or for uncertainties of the variable measured. The quantization error is then at most the packing
+        error of the scale_factor.
+        :param ds: the dataset
+        :param var_name: the variable name
+        :return: the number of decimal digits, None if the variable is not stored as floating point or no scale_factor is found
+        """
+        variable = ds[var_name]
+        data_type = np.dtype(variable.encoding.get("dtype", variable.dtype))
+        if data_type.kind != "f" or variable.dtype.kind != "f":
+            return None
+
+        for name in CompressionProfile._get_precision_sources(ds, var_name):
+            scale_factor = ds[name].encoding.get("scale_factor", ds[name].attrs.get("scale_factor"))
+            if scale_factor is not None and scale_factor > 0:
+                return int(math.ceil(-math.log10(scale_factor)))
+
+        return None
+
+    @staticmethod
+    def _get_precision_sources(ds, var_name):
+        sources = [var_name]
+        if var_name.startswith("u_"):
+            measured = var_name[2:]
+            sources.append(measured)
+            for qualifier in UNCERTAINTY_QUALIFIERS:
+                if measured.startswith(qualifier):
+                    sources.append(measured[len(qualifier):])
+
+        return [name for name in sources if name in ds.variables]
@@ -1,14 +1,39 @@
+import threading
+from contextlib import contextmanager
+
 import numpy as np
 import xarray as xr
 
+from fiduceo.common.writer.fill_value_array import FillValueArray
+
+_allocation = threading.local()
+
 
 class DefaultData:
+    @staticmethod
+    @contextmanager
+    def lazy_allocation(lazy=True):
+        """
+        Context in which the default arrays created by this thread are FillValueArrays, allocated on first write only.
+        :param lazy: set false to allocate eagerly
+        """
+        previous = DefaultData.is_lazy_allocation()
+        _allocation.lazy = lazy
+        try:
+            yield
+        finally:
+            _allocation.lazy = previous
+
+    @staticmethod
+    def is_lazy_allocation():
+        return getattr(_allocation, "lazy", False)
+
     @staticmethod
     def create_default_vector(size, dtype, fill_value=None):
         if fill_value is None:
             fill_value = DefaultData.get_default_fill_value(dtype)
 
-        empty_array = np.full([size], fill_value, dtype)
+        empty_array = DefaultData._create_filled([size], fill_value, dtype)
 
         default_array = xr.DataArray(empty_array, dims=['y'])
         return default_array
@@ -18,7 +43,7 @@ class DefaultData:
         if fill_value is None:
             fill_value = DefaultData.get_default_fill_value(dtype)
 
-        empty_array = np.full([height, width], fill_value, dtype)
+        empty_array = DefaultData._create_filled([height, width], fill_value, dtype)
 
         if dims_names is not None:
             default_array = xr.DataArray(empty_array, dims=dims_names)
@@ -32,7 +57,7 @@ class DefaultData:
         if fill_value is None:
             fill_value = DefaultData.get_default_fill_value(dtype)
 
-        empty_array = np.full([num_channels, height, width], fill_value, dtype)
+        empty_array = DefaultData._create_filled([num_channels, height, width], fill_value, dtype)
 
         if dims_names is not None:
             default_array = xr.DataArray(empty_array, dims=dims_names)
@@ -46,7 +71,7 @@ class DefaultData:
         if fill_value is None:
             fill_value = DefaultData.get_default_fill_value(dtype)
 
-        empty_array = np.full([z2, z1, height, width], fill_value, dtype)
+        empty_array = DefaultData._create_filled([z2, z1, height, width], fill_value, dtype)
 
         if dims_names is not None:
             default_array = xr.DataArray(empty_array, dims=dims_names)
@@ -55,6 +80,13 @@ class DefaultData:
 
         return default_array
 
+    @staticmethod
+    def _create_filled(shape, fill_value, dtype):
+        if DefaultData.is_lazy_allocation():
+            return FillValueArray(shape, dtype, fill_value)
+
+        return np.full(shape, fill_value, dtype)
+
     @staticmethod
     def get_default_fill_value(dtype):
         """
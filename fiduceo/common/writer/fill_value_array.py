@@ -0,0 +1,127 @@
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+# numpy functions writing into their first argument
+WRITING_FUNCTIONS = {np.copyto, np.place, np.put, np.putmask, np.put_along_axis, np.fill_diagonal}
+
+
+class FillValueArray(NDArrayOperatorsMixin):
+    """
+    Array of a constant fill value that allocates its data buffer on the first write only.
+
+    Item reads of an untouched array are served from the fill value, numpy functions and operators work on a
+    temporary filled array. Any write, by item assignment, through a slice or as output of a numpy function,
+    allocates the buffer which is used from then on. Conversion by np.asarray(), e.g. by xarray's values, allocates
+    the buffer as well, as the array returned may be written to.
+    """
+
+    def __init__(self, shape, dtype, fill_value):
+        """
+        Create the array, no data is allocated.
+        :param shape: the array shape
+        :param dtype: the numpy data type
+        :param fill_value: the fill value
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.fill_value = fill_value
+        self._buffer = None
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def is_materialized(self):
+        """
+        Check if the data buffer is allocated, i.e. the array has been written to.
+        :return: True if allocated
+        """
+        return self._buffer is not None
+
+    def materialize(self):
+        """
+        Allocate the data buffer filled with the fill value, if not yet done.
+        :return: the data buffer
+        """
+        if self._buffer is None:
+            self._buffer = np.full(self.shape, self.fill_value, self.dtype)
+        return self._buffer
+
+    def astype(self, dtype, **kwargs):
+        return self._filled().astype(dtype, **kwargs)
+
+    def copy(self):
+        array = FillValueArray(self.shape, self.dtype, self.fill_value)
+        if self._buffer is not None:
+            array._buffer = self._buffer.copy()
+        return array
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if self._buffer is None:
+            fill = np.array(self.fill_value, dtype=self.dtype)
+            values = np.broadcast_to(fill, self.shape)[key]
+            if not np.may_share_memory(values, fill):
+                # scalars and copies made by advanced indexing
+                return values
+
+        # views have to write through like numpy views, e.g. array[0][1] = value
+        return self.materialize()[key]
+
+    def __setitem__(self, key, value):
+        self.materialize()[key] = value
+
+    def __array__(self, dtype=None):
+        array = self.materialize()
+        if dtype is not None:
+            return array.astype(dtype, copy=False)
+        return array
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        out = kwargs.get("out")
+        if out is not None:
+            kwargs["out"] = tuple(array.materialize() if isinstance(array, FillValueArray) else array for array in out)
+
+        inputs = tuple(FillValueArray._to_numpy(array) for array in inputs)
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        out = kwargs.get("out")
+        if func in WRITING_FUNCTIONS and len(args) > 0 and isinstance(args[0], FillValueArray):
+            args = (args[0].materialize(),) + FillValueArray._to_numpy(tuple(args[1:]))
+        else:
+            args = FillValueArray._to_numpy(args)
+        kwargs = dict((key, FillValueArray._to_numpy(value)) for key, value in kwargs.items())
+        if isinstance(out, FillValueArray):
+            kwargs["out"] = out.materialize()
+        elif isinstance(out, tuple):
+            kwargs["out"] = tuple(array.materialize() if isinstance(array, FillValueArray) else array for array in out)
+        return func(*args, **kwargs)
+
+    def __repr__(self):
+        state = "allocated" if self._buffer is not None else "fill value " + str(self.fill_value)
+        return "FillValueArray(shape=" + str(self.shape) + ", dtype=" + str(self.dtype) + ", " + state + ")"
+
+    def _filled(self):
+        # read only inputs of untouched arrays are temporary
+        if self._buffer is not None:
+            return self._buffer
+        return np.full(self.shape, self.fill_value, self.dtype)
+
+    @staticmethod
+    def _to_numpy(value):
+        if isinstance(value, FillValueArray):
+            return value._filled()
+        if isinstance(value, (list, tuple)):
+            return type(value)(FillValueArray._to_numpy(item) for item in value)
+        return value
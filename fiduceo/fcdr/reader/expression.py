@@ -0,0 +1,287 @@
+import ast
+from math import pi
+
+import numexpr as ne
+
+CONSTANTS = {"pi": repr(pi)}
+
+_EXPRESSION_CACHE = dict()
+
+
+class Expression:
+    """Parsed form of a virtual variable expression.
+
+    The expression is parsed once into a Python AST. Identifiers are matched exactly, so a variable
+    ``a1_vis`` is not detected inside ``u_a1_vis``. Use ``Expression.compile()`` to obtain instances,
+    these are cached process-wide per distinct expression string.
+
+    Attributes
+    ----------
+    expression_string: str
+        The expression as given in the ``expression`` attribute.
+    dependencies: tuple of str
+        Names of the variables used, in the order of first appearance.
+    constants: tuple of str
+        Names of the constants used (e.g. ``PI``), as written in the expression.
+    numexpr_string: str
+        The expression with all constants replaced by their values, ready to be passed to numexpr.
+    """
+
+    def __init__(self, expression_string):
+        self.expression_string = expression_string
+
+        source = expression_string.strip()
+        name_nodes = Expression._find_name_nodes(ast.parse(source, mode="eval"))
+
+        dependencies = list()
+        constants = list()
+        for node in name_nodes:
+            if Expression._is_constant(node.id):
+                target = constants
+            else:
+                target = dependencies
+
+            if node.id not in target:
+                target.append(node.id)
+
+        self.dependencies = tuple(dependencies)
+        self.constants = tuple(constants)
+        self.numexpr_string = Expression._replace_constants(source, name_nodes)
+
+    @classmethod
+    def compile(cls, expression_string):
+        """Return the parsed expression for the string, parsing it only on first use.
+
+        Parameters
+        ----------
+        expression_string: str
+            The expression, e.g. the ``expression`` attribute of a virtual variable.
+
+        Return
+        ------
+        Expression
+        """
+        expression = _EXPRESSION_CACHE.get(expression_string)
+        if expression is None:
+            expression = cls(expression_string)
+            _EXPRESSION_CACHE[expression_string] = expression
+        return expression
+
+    @staticmethod
+    def clear_cache():
+        _EXPRESSION_CACHE.clear()
+
+    @staticmethod
+    def _find_name_nodes(tree):
+        function_nodes = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                function_nodes.add(id(node.func))
+
+        name_nodes = list()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and id(node) not in function_nodes:
+                name_nodes.append(node)
+
+        return sorted(name_nodes, key=lambda n: (n.lineno, n.col_offset))
+
+    @staticmethod
+    def _is_constant(name):
+        return name.lower() in CONSTANTS
+
+    @staticmethod
+    def _replace_constants(source, name_nodes):
+        line_offsets = [0]
+        for line in source.splitlines(True):
+            line_offsets.append(line_offsets[-1] + len(line))
+
+        replaced = source
+        for node in reversed(name_nodes):
+            if Expression._is_constant(node.id):
+                start = line_offsets[node.lineno - 1] + node.col_offset
+                end = start + len(node.id)
+                replaced = replaced[:start] + CONSTANTS[node.id.lower()] + replaced[end:]
+
+        return replaced
+
+
+TEMPORARY_PREFIX = "_cse_"
+
+_BATCH_CACHE = dict()
+
+_BINARY_OPERATORS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Mod: "%", ast.Pow: "**", ast.BitAnd: "&", ast.BitOr: "|", ast.BitXor: "^",
+                     ast.LShift: "<<", ast.RShift: ">>"}
+_UNARY_OPERATORS = {ast.USub: "-", ast.UAdd: "+", ast.Invert: "~"}
+_COMPARE_OPERATORS = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!="}
+
+
+class ExpressionBatch:
+    """A set of expressions evaluated together, sharing their common subexpressions.
+
+    Every subexpression occurring more than once in the batch is moved to a temporary, largest first, until no
+    repeated subexpression is left. Evaluation computes each temporary once and then the result expressions.
+    Use ``ExpressionBatch.compile()`` to obtain instances, these are cached process-wide.
+
+    Attributes
+    ----------
+    dependencies: tuple of str
+        Names of the variables used by any of the expressions.
+    temporaries: list of (str, str)
+        Name and numexpr string of the shared subexpressions, in evaluation order.
+    result_strings: list of str
+        One numexpr string per expression, referencing variables and temporaries.
+    """
+
+    def __init__(self, expressions):
+        dependencies = list()
+        for expression in expressions:
+            for name in expression.dependencies:
+                if name not in dependencies:
+                    dependencies.append(name)
+        self.dependencies = tuple(dependencies)
+
+        trees = [ast.parse(expression.numexpr_string, mode="eval").body for expression in expressions]
+        definitions = dict()
+        while True:
+            candidate = ExpressionBatch._find_largest_repeated_subtree(trees + list(definitions.values()))
+            if candidate is None:
+                break
+
+            name = TEMPORARY_PREFIX + str(len(definitions))
+            key = ast.dump(candidate)
+            trees = [ExpressionBatch._replace_subtree(tree, key, name) for tree in trees]
+            for temp_name in definitions:
+                definitions[temp_name] = ExpressionBatch._replace_subtree(definitions[temp_name], key, name)
+            definitions[name] = candidate
+
+        self.temporaries = [(name, ExpressionBatch._to_source(definitions[name])) for name in ExpressionBatch._get_evaluation_order(definitions)]
+        self.result_strings = [ExpressionBatch._to_source(tree) for tree in trees]
+
+    @classmethod
+    def compile(cls, expression_strings):
+        """Return the batch for the expression strings, building it only on first use.
+
+        Parameters
+        ----------
+        expression_strings: iterable of str
+            The expressions, e.g. the ``expression`` attributes of a set of virtual variables.
+
+        Return
+        ------
+        ExpressionBatch
+        """
+        key = tuple(expression_strings)
+        batch = _BATCH_CACHE.get(key)
+        if batch is None:
+            batch = cls([Expression.compile(expression_string) for expression_string in key])
+            _BATCH_CACHE[key] = batch
+        return batch
+
+    @staticmethod
+    def clear_cache():
+        _BATCH_CACHE.clear()
+
+    def evaluate(self, local_dict):
+        """Evaluate all expressions of the batch.
+
+        Parameters
+        ----------
+        local_dict: dict
+            Maps the variable names to the values, arrays or scalars.
+
+        Return
+        ------
+        list of numpy.ndarray, one per expression
+        """
+        values = dict(local_dict)
+        for name, source in self.temporaries:
+            values[name] = ne.evaluate(source, values)
+
+        return [ne.evaluate(source, values) for source in self.result_strings]
+
+    @staticmethod
+    def _find_largest_repeated_subtree(trees):
+        counts = dict()
+        nodes = dict()
+        for tree in trees:
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call, ast.Compare)):
+                    key = ast.dump(node)
+                    counts[key] = counts.get(key, 0) + 1
+                    nodes[key] = node
+
+        largest = None
+        largest_size = 0
+        for key, count in counts.items():
+            if count > 1:
+                size = len(list(ast.walk(nodes[key])))
+                if size > largest_size:
+                    largest = nodes[key]
+                    largest_size = size
+
+        return largest
+
+    @staticmethod
+    def _replace_subtree(tree, key, name):
+        if ast.dump(tree) == key:
+            return ast.Name(id=name, ctx=ast.Load())
+
+        return _SubtreeReplacer(key, name).visit(tree)
+
+    @staticmethod
+    def _get_evaluation_order(definitions):
+        ordered = list()
+
+        def visit(name):
+            if name in ordered:
+                return
+            for node in ast.walk(definitions[name]):
+                if isinstance(node, ast.Name) and node.id in definitions:
+                    visit(node.id)
+            ordered.append(name)
+
+        for temp_name in definitions:
+            visit(temp_name)
+
+        return ordered
+
+    @staticmethod
+    def _to_source(node):
+        if isinstance(node, ast.Name):
+            return node.id
+
+        if isinstance(node, ast.BinOp):
+            return "(" + ExpressionBatch._to_source(node.left) + " " + _BINARY_OPERATORS[type(node.op)] + " " + ExpressionBatch._to_source(node.right) + ")"
+
+        if isinstance(node, ast.UnaryOp):
+            return "(" + _UNARY_OPERATORS[type(node.op)] + ExpressionBatch._to_source(node.operand) + ")"
+
+        if isinstance(node, ast.Compare):
+            source = ExpressionBatch._to_source(node.left)
+            for operator, comparator in zip(node.ops, node.comparators):
+                source += " " + _COMPARE_OPERATORS[type(operator)] + " " + ExpressionBatch._to_source(comparator)
+            return "(" + source + ")"
+
+        if isinstance(node, ast.Call):
+            arguments = ", ".join(ExpressionBatch._to_source(argument) for argument in node.args)
+            return ExpressionBatch._to_source(node.func) + "(" + arguments + ")"
+
+        if hasattr(node, "value"):
+            return repr(node.value)
+
+        if hasattr(node, "n"):
+            return repr(node.n)
+
+        raise ValueError("unsupported expression element: " + ast.dump(node))
+
+
+class _SubtreeReplacer(ast.NodeTransformer):
+
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+
+    def generic_visit(self, node):
+        if ast.dump(node) == self.key:
+            return ast.Name(id=self.name, ctx=ast.Load())
+        return ast.NodeTransformer.generic_visit(self, node)
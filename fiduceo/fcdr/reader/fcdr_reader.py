@@ -1,16 +1,42 @@
-import re
-from math import pi
+import glob
+import os
+from collections import OrderedDict
 
+import dask.array as da
 import numexpr as ne
 import numpy as np
 import xarray as xr
-from gridtools.resampling import resample_2d
+from dask.base import tokenize
+
+from fiduceo.fcdr.reader.expression import Expression, ExpressionBatch
+from fiduceo.fcdr.reader.pixel_locator import PixelLocatorCache, LAT_NAME, LON_NAME
+from fiduceo.fcdr.reader.tie_point_interpolator import TiePointInterpolator
+from fiduceo.fcdr.reader.virtual_variable_cache import VirtualVariableCache, DEFAULT_MAX_SIZE
+
+ALIGNED_CHUNKS = "aligned"
+DEFAULT_MEMORY_TARGET = 128 * 1024 * 1024
+
+# float32 resolves one scale step up to this ratio of add_offset and scale_factor
+FLOAT32_MAX_OFFSET_STEPS = 2 ** 23
+# float32 represents packed integers up to this magnitude exactly, the 24 bit mantissa
+FLOAT32_MAX_PACKED = 2 ** 24
+
+
+FILE_MAP_VARIABLE = "scanline_map_to_fcdr_file"
+L1B_FILE_MAP_VARIABLE = "scanline_map_to_origl1bfile"
 
 
 class FCDRReader:
+    tie_point_interpolator = TiePointInterpolator()
+    virtual_variable_cache = None
+    pixel_locator_cache = PixelLocatorCache()
+
+    # dask chunks replacing the aligned chunking, per template_key and variable name, e.g. {"HIRS3": {"bt": (19, 512, 56)}}
+    chunk_overrides = dict()
 
     @classmethod
-    def read(cls, file_str, drop_variables_str=None, decode_cf=True, decode_times=True, engine_str=None):
+    def read(cls, file_str, drop_variables_str=None, decode_cf=True, decode_times=True, engine_str=None, variables=None, chunks=1000000,
+             memory_target=DEFAULT_MEMORY_TARGET, compact=False):
         """Read a dataset from a netCDF 3/4 or HDF file.
 
         Parameters
@@ -25,59 +51,708 @@ class FCDRReader:
             Whether to decode time information (convert time coordinates to ``datetime`` objects).
         engine_str: str, optional
             Optional netCDF engine name.
+        variables: iterable of str, optional
+            Variables to read, virtual or not. The variables used in the expressions of virtual variables are
+            read as well, together with the coordinate variables of all dimensions used; all other variables are
+            dropped. All variables are read when None.
+        chunks: int, dict or str, optional
+            The dask chunks passed to xarray, or "aligned" to chunk each variable in whole multiples of its on-disk
+            chunk shape, as big as fits into the memory target. Entries of ``FCDRReader.chunk_overrides`` for the
+            template_key of the file take precedence.
+        memory_target: int, optional
+            The maximal size of a chunk in bytes for "aligned" chunking.
+        compact: bool, optional
+            Whether to decode scaled integer variables to float32 instead of float64, halving their memory, where
+            float32 keeps the precision of the packed data. The conversion is done lazily per chunk. Integers of up
+            to 16 bits are represented exactly; 32 bit integers only if their valid_min, valid_max or valid_range
+            attributes limit them to the 24 bit float32 mantissa. Variables with an add_offset float32 can not
+            resolve at the scale_factor step stay float64.
+
+        Return
+        ------
+        xarray.Dataset
+        """
+        # the dask names must differ between reads decoding the file differently
+        read_options = (decode_cf, decode_times, engine_str)
+        if chunks == ALIGNED_CHUNKS or variables is not None:
+            ds = xr.open_dataset(file_str, drop_variables=drop_variables_str, decode_cf=decode_cf, decode_times=decode_times, engine=engine_str)
+        else:
+            ds = xr.open_dataset(file_str, drop_variables=drop_variables_str, decode_cf=decode_cf, decode_times=decode_times, engine=engine_str, chunks=chunks)
+
+        if variables is not None:
+            # the file is opened once, the variables not required are dropped before chunking
+            ds = cls._select_variables(ds, variables, drop_variables_str)
+            if chunks is not None and chunks != ALIGNED_CHUNKS:
+                ds = cls._chunk_selection(ds, file_str, chunks, read_options)
+
+        if chunks == ALIGNED_CHUNKS:
+            cls._chunk_aligned(ds, file_str, memory_target, read_options)
+
+        if compact:
+            cls._decode_compact(ds)
+        return ds
+
+    @classmethod
+    def read_multiple(cls, files, concat_dim="y", drop_variables_str=None, decode_cf=True, decode_times=True, engine_str=None, variables=None,
+                      chunks=1000000, memory_target=DEFAULT_MEMORY_TARGET, compact=False):
+        """Read a sequence of files as one dataset, lazily concatenated along the scanline dimension.
+
+        Variables with the concatenation dimension are concatenated, all others are taken from the first file, except
+        scalars with differing values which are expanded to one value per scanline, so virtual variables evaluate
+        correctly across file boundaries. The variable "scanline_map_to_fcdr_file" maps each scanline to its file
+        in the global attribute "fcdr_files". When all files list their level 1b files in the global attribute
+        "source", these lists are merged and "scanline_map_to_origl1bfile" is remapped to the merged list.
+
+        The files are opened one after another: the netCDF-C and HDF5 libraries are not thread safe, opening in
+        threads would be serialized anyway. Each file is opened once, reading the metadata only, the data is read lazily.
+        With ``variables`` given, only the variables required are chunked; for wide products, chunking all variables
+        costs more than opening the file.
+
+        Parameters
+        ----------
+        files: str or iterable of str
+            File paths or glob patterns, the matches of each pattern are sorted by name.
+        concat_dim: str, optional
+            The dimension to concatenate along.
+
+        The other parameters are passed to ``read()`` for each file.
 
         Return
         ------
         xarray.Dataset
         """
-        ds = xr.open_dataset(file_str, drop_variables=drop_variables_str, decode_cf=decode_cf, decode_times=decode_times, engine=engine_str, chunks=1000000)
+        file_paths = cls._expand_file_patterns(files)
+        if len(file_paths) == 0:
+            raise IOError("no files found: " + str(files))
+
+        datasets = [cls.read(file_path, drop_variables_str=drop_variables_str, decode_cf=decode_cf, decode_times=decode_times, engine_str=engine_str,
+                             variables=variables, chunks=chunks, memory_target=memory_target, compact=compact) for file_path in file_paths]
+
+        cls._add_file_map(datasets, concat_dim)
+        cls._remap_l1b_file_indices(datasets)
+        cls._expand_differing_scalars(datasets, concat_dim)
+
+        ds = xr.concat(datasets, dim=concat_dim, data_vars="minimal", coords="minimal", compat="override", combine_attrs="override")
+        ds.attrs["fcdr_files"] = file_paths
         return ds
 
     @classmethod
-    def _load_virtual_variable(cls, ds, var_name):
+    def _expand_file_patterns(cls, files):
+        if isinstance(files, str):
+            files = [files]
+
+        file_paths = list()
+        for pattern in files:
+            if glob.has_magic(pattern):
+                file_paths.extend(sorted(glob.glob(pattern)))
+            else:
+                file_paths.append(pattern)
+        return file_paths
+
+    @classmethod
+    def _add_file_map(cls, datasets, concat_dim):
+        for index, ds in enumerate(datasets):
+            size = ds.dims[concat_dim]
+            variable = xr.Variable([concat_dim], da.full((size,), index, dtype=np.int32, chunks=(size,)))
+            variable.attrs["long_name"] = "Indicator of FCDR file"
+            variable.attrs["description"] = "Index of the file each line has been read from, see global attribute 'fcdr_files'."
+            ds[FILE_MAP_VARIABLE] = variable
+
+    @classmethod
+    def _remap_l1b_file_indices(cls, datasets):
+        sources = [cls._parse_source_attribute(ds.attrs.get("source")) for ds in datasets]
+        if any(source is None for source in sources):
+            return
+
+        merged = list()
+        for source in sources:
+            merged.extend(name for name in source if name not in merged)
+
+        for ds, source in zip(datasets, sources):
+            if L1B_FILE_MAP_VARIABLE in ds.variables:
+                lookup = np.array([merged.index(name) for name in source], dtype=np.int64)
+                variable = ds.variables[L1B_FILE_MAP_VARIABLE]
+                data = variable.data
+                if not isinstance(data, da.Array):
+                    data = da.from_array(data, chunks=data.shape)
+                remapped = data.map_blocks(FCDRReader._remap_indices, lookup, dtype=data.dtype)
+                ds[L1B_FILE_MAP_VARIABLE] = xr.Variable(variable.dims, remapped, variable.attrs, variable.encoding)
+
+            ds.attrs["source"] = ", ".join(merged)
+
+    @staticmethod
+    def _parse_source_attribute(source):
+        if source is None:
+            return None
+
+        if isinstance(source, str):
+            return [name.strip() for name in source.split(",") if len(name.strip()) > 0]
+
+        return [str(name) for name in source]
+
+    @staticmethod
+    def _remap_indices(block, lookup):
+        # fill values and indices outside of the source list are kept as they are
+        values = np.where(np.isfinite(block), block, -1).astype(np.int64)
+        valid = (values >= 0) & (values < len(lookup))
+        result = block.copy()
+        result[valid] = lookup[values[valid]]
+        return result
+
+    @classmethod
+    def _expand_differing_scalars(cls, datasets, concat_dim):
+        first = datasets[0]
+        for name in list(first.variables):
+            variable = first.variables[name]
+            if len(variable.dims) > 0 or "virtual" in variable.attrs or not all(name in ds.variables for ds in datasets):
+                continue
+
+            values = [ds.variables[name].values for ds in datasets]
+            if all(cls._scalars_equal(values[0], value) for value in values[1:]):
+                continue
+
+            for ds, value in zip(datasets, values):
+                size = ds.dims[concat_dim]
+                scalar = ds.variables[name]
+                expanded = da.full((size,), value[()], dtype=value.dtype, chunks=(size,))
+                ds[name] = xr.Variable([concat_dim], expanded, scalar.attrs, scalar.encoding)
+
+    @staticmethod
+    def _scalars_equal(first, second):
+        if first == second:
+            return True
+
+        try:
+            return bool(np.isnan(first) and np.isnan(second))
+        except TypeError:
+            return False
+
+    @classmethod
+    def _decode_compact(cls, ds):
+        for name in list(ds.variables):
+            variable = ds.variables[name]
+            if isinstance(variable, xr.IndexVariable) or variable.dtype != np.float64 or not cls._fits_float32(variable.encoding, variable.attrs):
+                continue
+
+            if variable.chunks is None:
+                variable = variable.chunk()
+
+            ds._variables[name] = xr.Variable(variable.dims, variable.data.astype(np.float32), variable.attrs, variable.encoding)
+
+    @classmethod
+    def _fits_float32(cls, encoding, attrs=None):
+        dtype = encoding.get("dtype")
+        scale_factor = encoding.get("scale_factor")
+        if dtype is None or scale_factor is None:
+            return False
+
+        dtype = np.dtype(dtype)
+        if not np.issubdtype(dtype, np.integer) or dtype.itemsize > 4 or scale_factor == 0:
+            return False
+
+        if dtype.itemsize > 2 and cls._get_max_packed_value(dtype, attrs) > FLOAT32_MAX_PACKED:
+            return False
+
+        add_offset = encoding.get("add_offset", 0.0)
+        return abs(add_offset) / abs(scale_factor) < FLOAT32_MAX_OFFSET_STEPS
+
+    @classmethod
+    def _get_max_packed_value(cls, dtype, attrs):
+        """Return the largest magnitude of the packed values allowed by the valid range attributes and the data type."""
+        info = np.iinfo(dtype)
+        if attrs is None:
+            attrs = dict()
+
+        if "valid_range" in attrs:
+            limits = list(np.ravel(attrs["valid_range"]))
+        else:
+            limits = [attrs.get("valid_min", info.min), attrs.get("valid_max", info.max)]
+
+        try:
+            limits = [float(limit) for limit in limits]
+        except (TypeError, ValueError):
+            limits = [info.min, info.max]
+
+        if len(limits) != 2:
+            limits = [info.min, info.max]
+        return max(abs(max(limits[0], info.min)), abs(min(limits[1], info.max)))
+
+    @classmethod
+    def _chunk_selection(cls, ds, file_str, chunks, read_options):
+        if isinstance(chunks, dict):
+            chunks = dict((dim, size) for dim, size in chunks.items() if dim in ds.dims)
+
+        chunked = ds.chunk(chunks, token=cls._create_file_token(file_str, read_options))
+        chunked.set_close(ds.close)
+        return chunked
+
+    @classmethod
+    def _chunk_aligned(cls, ds, file_str, memory_target, read_options):
+        overrides = cls.chunk_overrides.get(ds.attrs.get("template_key"), dict())
+        file_token = cls._create_file_token(file_str, read_options)
+
+        for name in list(ds.variables):
+            variable = ds.variables[name]
+            if isinstance(variable, xr.IndexVariable):
+                continue
+
+            if name in overrides:
+                chunks = tuple(overrides[name])
+            else:
+                chunks = cls._get_aligned_chunks(variable, memory_target)
+
+            ds._variables[name] = variable.chunk(chunks, name="fcdr-" + name + "-" + tokenize(file_token, name, chunks))
+
+    @classmethod
+    def _create_file_token(cls, file_str, read_options):
+        return tokenize(os.path.abspath(file_str), os.path.getmtime(file_str), read_options)
+
+    @classmethod
+    def _get_aligned_chunks(cls, variable, memory_target):
+        """Whole multiples of the on-disk chunk shape, growing the innermost dimension first.
+
+        Contiguous variables are treated as chunked by single rows.
+        """
+        shape = variable.shape
+        if len(shape) == 0:
+            return ()
+
+        disk_chunks = variable.encoding.get("chunksizes")
+        if disk_chunks is None or len(disk_chunks) != len(shape):
+            disk_chunks = (1,) + tuple(shape[1:])
+
+        chunks = [max(1, min(chunk, size)) for chunk, size in zip(disk_chunks, shape)]
+        block_size = variable.dtype.itemsize * int(np.prod(chunks))
+        for index in reversed(range(len(shape))):
+            disk_chunk = chunks[index]
+            other_size = block_size // disk_chunk
+            multiples = max(1, memory_target // block_size)
+            chunks[index] = max(1, min(disk_chunk * multiples, shape[index]))
+            block_size = other_size * chunks[index]
+
+        return tuple(chunks)
+
+    @classmethod
+    def _select_variables(cls, ds, variables, drop_variables_str):
+        if drop_variables_str is None:
+            drop_variables_str = []
+        elif isinstance(drop_variables_str, str):
+            drop_variables_str = [drop_variables_str]
+
+        try:
+            required = cls._resolve_dependencies(ds, [name for name in variables if name not in drop_variables_str])
+        except IOError:
+            ds.close()
+            raise
+
+        selected = ds.drop_vars([name for name in ds.variables if name not in required])
+        selected.set_close(ds.close)
+        return selected
+
+    @classmethod
+    def _resolve_dependencies(cls, ds, variables):
+        required = set()
+        to_visit = list(variables)
+        while len(to_visit) > 0:
+            name = to_visit.pop()
+            if name in required:
+                continue
+
+            if name not in ds.variables:
+                raise IOError('no such variable: "' + name + '"')
+
+            required.add(name)
+            variable = ds.variables[name]
+            if "virtual" in variable.attrs and "expression" in variable.attrs:
+                dependencies = Expression.compile(variable.attrs["expression"]).dependencies
+                to_visit.extend(dependency for dependency in dependencies if dependency in ds.variables)
+
+        for name in list(required):
+            for dim in ds.variables[name].dims:
+                if dim in ds.variables:
+                    required.add(dim)
+
+        return required
+
+    @classmethod
+    def enable_cache(cls, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        """Store evaluated virtual variables and interpolated tie point rasters of datasets read from file on disk.
+
+        Later evaluations for the same, unchanged file reopen the stored arrays as memory maps. Only eager
+        evaluations are stored, lazy evaluations read stored arrays but never compute them for storage.
+
+        Parameters
+        ----------
+        cache_dir: str, optional
+            The directory of the store. Defaults to ``~/.fiduceo/cache``.
+        max_size: int, optional
+            The maximal size of the store in bytes, least recently used arrays are deleted beyond.
+        """
+        cls.virtual_variable_cache = VirtualVariableCache(cache_dir, max_size)
+
+    @classmethod
+    def disable_cache(cls):
+        """Stop using the on-disk store, the stored arrays are kept."""
+        cls.virtual_variable_cache = None
+
+    @classmethod
+    def get_pixel_locator(cls, ds, lat_name=LAT_NAME, lon_name=LON_NAME):
+        """Return the nearest pixel lookup of the dataset geolocation.
+
+        The lookup tree is built once per dataset and kept for the most recently used datasets, reopening an unchanged
+        file reuses it.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset, e.g. as returned by ``read()``.
+        lat_name: str, optional
+            Name of the latitude variable.
+        lon_name: str, optional
+            Name of the longitude variable.
+
+        Return
+        ------
+        PixelLocator
+        """
+        return cls.pixel_locator_cache.get(ds, lat_name, lon_name)
+
+    @classmethod
+    def load_virtual_variables(cls, ds, var_names, lazy=False):
+        """Evaluate a set of virtual variables of a dataset in one pass.
+
+        Subexpressions shared by the expressions are computed only once (per block in lazy mode), tie point
+        variables are interpolated and one-dimensional variables extended once for all expressions using them.
+        In lazy mode, compute the results together (e.g. ``dask.compute()``) to share the work between them.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the virtual variables, the variables are replaced in place.
+        var_names: iterable of str
+            Names of the virtual variables to evaluate.
+        lazy: bool, optional
+            Whether to build a dask graph aligned to the on-disk chunking instead of computing the values.
+        """
+        dic = cls._create_dictionary_of_non_virtuals(ds)
+        operand_tokens = dict()
+
+        groups = OrderedDict()
+        for var_name in var_names:
+            v_var = ds.variables[var_name]
+            if "virtual" not in v_var.attrs:
+                raise IOError('no such virtual variable: "' + var_name + '"')
+
+            if cls._is_already_loaded(v_var):
+                continue
+
+            biggest_variable = cls._get_biggest_variable(dic, v_var.attrs["expression"])
+            key = (biggest_variable.dims, biggest_variable.shape)
+            if key not in groups:
+                groups[key] = (biggest_variable, list())
+            groups[key][1].append(var_name)
+
+        for biggest_variable, group_names in groups.values():
+            to_evaluate = list()
+            keys = dict()
+            for var_name in group_names:
+                keys[var_name] = cls._create_virtual_variable_key(ds, var_name, operand_tokens)
+                values = cls._get_cached_virtual_variable(keys[var_name], biggest_variable, lazy)
+                if values is None:
+                    to_evaluate.append(var_name)
+                else:
+                    cls._replace_virtual_variable(ds, var_name, biggest_variable.dims, values)
+
+            if len(to_evaluate) == 0:
+                continue
+
+            expressions = [ds.variables[var_name].attrs["expression"] for var_name in to_evaluate]
+            values = cls._evaluate_batch(ds, dic, expressions, biggest_variable, lazy, operand_tokens)
+
+            for var_name, var_values in zip(to_evaluate, values):
+                if not lazy:
+                    var_values = cls._put_cached_virtual_variable(keys[var_name], var_values)
+                cls._replace_virtual_variable(ds, var_name, biggest_variable.dims, var_values)
+
+    @classmethod
+    def evaluate_virtual_variable(cls, ds, var_name, indexers=None):
+        """Evaluate a virtual variable for a selection of pixels only, the dataset is not modified.
+
+        The operands are sliced before the evaluation: tie point variables are interpolated at the selected pixels
+        only and one-dimensional variables are taken for the selected rows only.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the virtual variable.
+        var_name: str
+            Name of the virtual variable.
+        indexers: dict, optional
+            ``isel``-style selection keyed by dimension names of the evaluated variable. Values are integers, slices,
+            integer arrays or, for pointwise selection, xarray.Variable index arrays sharing a dimension.
+            Everything is selected when None.
+
+        Return
+        ------
+        xarray.Variable
+        """
+        if indexers is None:
+            indexers = dict()
+
+        v_var = ds.variables[var_name]
+        if "virtual" not in v_var.attrs:
+            raise IOError('no such virtual variable: "' + var_name + '"')
+
+        if cls._is_already_loaded(v_var):
+            return cls._select(v_var, cls._check_indexers(indexers, v_var.dims))
+
+        dic = cls._create_dictionary_of_non_virtuals(ds)
+        expression = Expression.compile(v_var.attrs["expression"])
+        expression_ = expression.expression_string
+        biggest_variable = cls._get_biggest_variable(dic, expression_)
+        dims = biggest_variable.dims
+        indexers = cls._check_indexers(indexers, dims)
+
+        to_interpolate = cls._find_used_tie_point_variables_to_extend(dic, expression_)
+
+        selected = cls._select(biggest_variable, indexers)
+        target_dims = OrderedDict(zip(selected.dims, selected.shape))
+
+        local_dict = dict()
+        for name in cls._get_used_variable_names(dic, expression_):
+            variable = dic[name]
+            if name in to_interpolate:
+                operand = cls._interpolate_selection(variable, biggest_variable, indexers)
+            elif len(variable.dims) > 0 and set(variable.dims).issubset(dims):
+                operand = cls._select(variable, indexers)
+            else:
+                local_dict[name] = np.asarray(variable.values)
+                continue
+
+            local_dict[name] = operand.set_dims(target_dims).data
+
+        values = ne.evaluate(expression.numexpr_string, local_dict)
+
+        result = xr.Variable(selected.dims, values)
+        result.attrs = dict(v_var.attrs)
+        return result
+
+    @classmethod
+    def evaluate_virtual_variable_at_points(cls, ds, var_name, y, x):
+        """Evaluate a virtual variable at a list of pixels, the dataset is not modified.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the virtual variable.
+        var_name: str
+            Name of the virtual variable.
+        y: array_like of int
+            Row indices of the pixels.
+        x: array_like of int
+            Column indices of the pixels, same length as y.
+
+        Return
+        ------
+        xarray.Variable with the last two dimensions replaced by dimension "points"
+        """
+        y_dim, x_dim = cls._get_raster_dims(ds, var_name)
+        indexers = {y_dim: xr.Variable("points", np.asarray(y, dtype=np.int64)), x_dim: xr.Variable("points", np.asarray(x, dtype=np.int64))}
+        return cls.evaluate_virtual_variable(ds, var_name, indexers)
+
+    @classmethod
+    def evaluate_virtual_variable_in_box(cls, ds, var_name, y_min, y_max, x_min, x_max):
+        """Evaluate a virtual variable within a pixel bounding box, the dataset is not modified.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the virtual variable.
+        var_name: str
+            Name of the virtual variable.
+        y_min, y_max: int
+            First and last row of the box, inclusive.
+        x_min, x_max: int
+            First and last column of the box, inclusive.
+
+        Return
+        ------
+        xarray.Variable
+        """
+        y_dim, x_dim = cls._get_raster_dims(ds, var_name)
+        indexers = {y_dim: slice(y_min, y_max + 1), x_dim: slice(x_min, x_max + 1)}
+        return cls.evaluate_virtual_variable(ds, var_name, indexers)
+
+    @classmethod
+    def _load_virtual_variable(cls, ds, var_name, lazy=False):
 
         v_var = ds.variables[var_name]
         if v_var is not None and "virtual" in v_var.attrs:
             if not cls._is_already_loaded(v_var):
                 dic = cls._create_dictionary_of_non_virtuals(ds)
-                expression_ = v_var.attrs["expression"]
+                expression = Expression.compile(v_var.attrs["expression"])
+                expression_ = expression.expression_string
                 biggest_variable = cls._get_biggest_variable(dic, expression_)
                 dims = biggest_variable.dims
 
                 to_extend = cls._find_used_one_dimensional_variables_to_extend(dic, dims, expression_)
-                for name in to_extend:
-                    dic[name] = cls._extend_1d_vertical_to_2d(dic[name], biggest_variable)
-
                 to_interpolate = cls._find_used_tie_point_variables_to_extend(dic, expression_)
-                for name in to_interpolate:
-                    dic[name] = cls._interpolate_to_raster(dic[name], biggest_variable)
-
-                expression_ = cls._replace_constants(expression_)
-                values = ne.evaluate(expression_, dic)
-                tmp_var = xr.Variable(dims, values)
-                tmp_var.attrs = v_var.attrs
-                ds._variables[var_name] = tmp_var
+
+                operand_tokens = dict()
+                key = cls._create_virtual_variable_key(ds, var_name, operand_tokens)
+                values = cls._get_cached_virtual_variable(key, biggest_variable, lazy)
+                if values is None and lazy:
+                    values = cls._evaluate_lazy(dic, expression, biggest_variable, to_extend, to_interpolate)
+                elif values is None:
+                    for name in to_extend:
+                        dic[name] = cls._extend_1d_vertical_to_2d(dic[name], biggest_variable)
+
+                    for name in to_interpolate:
+                        dic[name] = cls._get_interpolated_raster(ds, name, biggest_variable, operand_tokens)
+
+                    values = ne.evaluate(expression.numexpr_string, dic)
+                    values = cls._put_cached_virtual_variable(key, values)
+
+                cls._replace_virtual_variable(ds, var_name, dims, values)
         else:
             raise IOError('no such virtual variable: "' + var_name + '"')
 
     @classmethod
-    def _replace_constants(cls, expression_):
-        _pattern_to_detect_pi = "\\b[Pp][Ii]\\b"
-        return re.sub(_pattern_to_detect_pi, str(pi), expression_)
+    def _evaluate_lazy(cls, dic, expression, biggest_variable, to_extend, to_interpolate):
+        """Build a dask graph evaluating the expression with one numexpr call per block.
+
+        The blocks are aligned to the on-disk chunking of the biggest variable used in the expression,
+        nothing is computed until the result is sliced or reduced.
+        """
+        used_names = cls._get_used_variable_names(dic, expression.expression_string)
+        names, operands = cls._prepare_lazy_operands(dic, used_names, biggest_variable, to_extend, to_interpolate)
+
+        numexpr_string = expression.numexpr_string
+        if not any(isinstance(operand, da.Array) for operand in operands):
+            values = ne.evaluate(numexpr_string, dict(zip(names, operands)))
+            return da.from_array(values, chunks=values.shape)
+
+        def evaluate_block(*blocks):
+            return ne.evaluate(numexpr_string, dict(zip(names, blocks)))
+
+        dtype = cls._get_result_dtype(numexpr_string, names, operands)
+        return da.map_blocks(evaluate_block, *operands, dtype=dtype)
+
+    @classmethod
+    def _evaluate_batch(cls, ds, dic, expressions, biggest_variable, lazy, operand_tokens=None):
+        batch = ExpressionBatch.compile(expressions)
+        dims = biggest_variable.dims
+
+        to_extend = list()
+        to_interpolate = list()
+        for expression_ in expressions:
+            to_extend.extend(cls._find_used_one_dimensional_variables_to_extend(dic, dims, expression_))
+            to_interpolate.extend(cls._find_used_tie_point_variables_to_extend(dic, expression_))
+
+        if not lazy:
+            local_dict = dict(dic)
+            for name in set(to_extend):
+                local_dict[name] = cls._extend_1d_vertical_to_2d(dic[name], biggest_variable)
+
+            for name in set(to_interpolate):
+                local_dict[name] = cls._get_interpolated_raster(ds, name, biggest_variable, operand_tokens)
+
+            return batch.evaluate(local_dict)
+
+        used_names = [name for name in batch.dependencies if name in dic]
+        names, operands = cls._prepare_lazy_operands(dic, used_names, biggest_variable, to_extend, to_interpolate)
+        if not any(isinstance(operand, da.Array) for operand in operands):
+            return [da.from_array(values, chunks=values.shape) for values in batch.evaluate(dict(zip(names, operands)))]
+
+        samples = cls._create_samples(names, operands)
+        dtypes = [values.dtype for values in batch.evaluate(samples)]
+
+        def evaluate_block(*blocks):
+            return np.stack(np.broadcast_arrays(*batch.evaluate(dict(zip(names, blocks)))))
+
+        chunks = da.core.normalize_chunks(cls._get_block_chunks(biggest_variable), biggest_variable.shape)
+        stacked = da.map_blocks(evaluate_block, *operands, dtype=np.result_type(*dtypes), new_axis=0, chunks=((len(dtypes),),) + chunks)
+        return [stacked[index].astype(dtype) for index, dtype in enumerate(dtypes)]
+
+    @classmethod
+    def _prepare_lazy_operands(cls, dic, used_names, biggest_variable, to_extend, to_interpolate):
+        dims = biggest_variable.dims
+        chunks = da.core.normalize_chunks(cls._get_block_chunks(biggest_variable), biggest_variable.shape)
+
+        names = list()
+        operands = list()
+        for name in used_names:
+            variable = dic[name]
+            if name in to_interpolate:
+                operand = cls._interpolate_to_raster_lazy(variable, biggest_variable, chunks)
+            elif name in to_extend:
+                operand = cls._to_dask_array(variable, dims, chunks)[:, np.newaxis]
+            elif len(variable.dims) > 0 and set(variable.dims).issubset(dims):
+                operand = cls._to_dask_array(variable, dims, chunks)
+            else:
+                operand = np.asarray(variable.values)
+
+            names.append(name)
+            operands.append(operand)
+
+        return names, operands
+
+    @classmethod
+    def _get_block_chunks(cls, variable):
+        chunk_sizes = variable.encoding.get("chunksizes")
+        if chunk_sizes is not None and len(chunk_sizes) == len(variable.shape):
+            return tuple(chunk_sizes)
+
+        if isinstance(variable.data, da.Array):
+            return variable.chunks
+
+        return variable.shape
+
+    @classmethod
+    def _to_dask_array(cls, variable, dims, chunks):
+        variable_chunks = list()
+        for dim, size in zip(variable.dims, variable.shape):
+            dim_chunks = chunks[dims.index(dim)]
+            if sum(dim_chunks) != size:
+                dim_chunks = (size,)
+            variable_chunks.append(dim_chunks)
+        variable_chunks = tuple(variable_chunks)
+
+        data = variable.data
+        if isinstance(data, da.Array):
+            return data.rechunk(variable_chunks)
+
+        return da.from_array(data, chunks=variable_chunks)
+
+    @classmethod
+    def _interpolate_to_raster_lazy(cls, variable, biggest_variable, chunks):
+        shape = biggest_variable.shape
+        if variable.shape == shape:
+            return cls._to_dask_array(variable, biggest_variable.dims, chunks)
+
+        return cls.tie_point_interpolator.interpolate_lazy(variable, shape, chunks)
+
+    @classmethod
+    def _get_result_dtype(cls, expression, names, operands):
+        return ne.evaluate(expression, cls._create_samples(names, operands)).dtype
+
+    @classmethod
+    def _create_samples(cls, names, operands):
+        samples = dict()
+        for name, operand in zip(names, operands):
+            samples[name] = np.ones((1,) * operand.ndim, dtype=operand.dtype)
+        return samples
 
     @classmethod
     def _get_biggest_variable(cls, dic, expression):
         biggest_shape_product = 0
         biggest_var = None
-        sorted_keys = cls._get_keys_sorted__longest_first(dic)
-        for key in sorted_keys:
-            if key in expression:
-                expression = expression.replace(str(key), '')
-                variable = dic[key]
-                shape_product = cls._get_num_data_elements(variable)
-                if shape_product > biggest_shape_product:
-                    biggest_shape_product = shape_product
-                    biggest_var = variable
+        for key in cls._get_used_variable_names(dic, expression):
+            variable = dic[key]
+            shape_product = cls._get_num_data_elements(variable)
+            if shape_product > biggest_shape_product:
+                biggest_shape_product = shape_product
+                biggest_var = variable
         return biggest_var
 
     @classmethod
@@ -109,46 +784,133 @@ class FCDRReader:
             return one_dimensional_variables
 
         dim_of_interest = biggest_dims[dim_len - 2]
-        sorted_keys = cls._get_keys_sorted__longest_first(dic)
-        for key in sorted_keys:
-            if key in expression:
-                expression = expression.replace(str(key), '')
-                variable = dic[key]
-                if len(variable.shape) == 1 and variable.dims[0] == dim_of_interest:
-                    one_dimensional_variables.append(key)
+        for key in cls._get_used_variable_names(dic, expression):
+            variable = dic[key]
+            if len(variable.shape) == 1 and variable.dims[0] == dim_of_interest:
+                one_dimensional_variables.append(key)
         return one_dimensional_variables
 
     @classmethod
     def _find_used_tie_point_variables_to_extend(cls, dic, expression):
         tie_point_variables = list()
-
-        sorted_keys = cls._get_keys_sorted__longest_first(dic)
-        for key in sorted_keys:
-            if key in expression:
-                expression = expression.replace(str(key), '')
-                variable = dic[key]
-                if "tie_points" in variable.attrs:
-                    tie_point_variables.append(key)
+        for key in cls._get_used_variable_names(dic, expression):
+            if "tie_points" in dic[key].attrs:
+                tie_point_variables.append(key)
 
         return tie_point_variables
 
     @classmethod
-    def _get_keys_sorted__longest_first(cls, dic):
-        dic_keys = dic.keys()
-        return sorted(dic_keys, key=len, reverse=True)
+    def _get_used_variable_names(cls, dic, expression):
+        dependencies = Expression.compile(expression).dependencies
+        return [name for name in dependencies if name in dic]
 
     @classmethod
     def _extend_1d_vertical_to_2d(cls, vertical_variable, reference_var):
         shape = reference_var.shape[-2:]
-        var_reshaped = np.resize(vertical_variable, shape[::-1])
-        var_reshaped = np.moveaxis(var_reshaped, 0, 1)
-        return xr.Variable(reference_var.dims[-2:], var_reshaped)
+        # read-only view with zero stride along x, numexpr broadcasts it without allocating the full raster
+        var_extended = np.broadcast_to(np.asarray(vertical_variable)[:, np.newaxis], shape)
+        return xr.Variable(reference_var.dims[-2:], var_extended)
 
     @classmethod
     def _interpolate_to_raster(cls, variable, biggest_variable):
-        shape = biggest_variable.shape
-        full_size_array = resample_2d(variable.values, shape[1], shape[0])
-        return xr.Variable(shape, full_size_array)
+        full_size_array = cls.tie_point_interpolator.interpolate(variable, biggest_variable.shape)
+        return xr.Variable(biggest_variable.dims[-2:], full_size_array)
+
+    @classmethod
+    def _get_interpolated_raster(cls, ds, var_name, biggest_variable, operand_tokens=None):
+        shape = biggest_variable.shape[-2:]
+        cache = cls.virtual_variable_cache
+        key = None
+        if cache is not None:
+            key = cache.create_key(ds, "tie_points:" + var_name + ":" + str(tuple(shape)), {var_name: ds.variables[var_name]}, operand_tokens)
+            if key is not None:
+                full_size_array = cache.get(key)
+                if full_size_array is not None:
+                    return xr.Variable(biggest_variable.dims[-2:], full_size_array)
+
+        full_size_array = cls.tie_point_interpolator.get_raster(ds, var_name, shape)
+        if key is not None:
+            full_size_array = cache.put(key, full_size_array)
+
+        return xr.Variable(biggest_variable.dims[-2:], full_size_array)
+
+    @classmethod
+    def _get_cached_virtual_variable(cls, key, biggest_variable, lazy):
+        if key is None:
+            return None
+
+        values = cls.virtual_variable_cache.get(key)
+        if values is None or values.shape != biggest_variable.shape:
+            return None
+
+        if lazy:
+            chunks = da.core.normalize_chunks(cls._get_block_chunks(biggest_variable), biggest_variable.shape)
+            return da.from_array(values, chunks=chunks)
+
+        return values
+
+    @classmethod
+    def _put_cached_virtual_variable(cls, key, values):
+        if key is None:
+            return values
+
+        return cls.virtual_variable_cache.put(key, values)
+
+    @classmethod
+    def _create_virtual_variable_key(cls, ds, var_name, operand_tokens=None):
+        cache = cls.virtual_variable_cache
+        if cache is None:
+            return None
+
+        expression = ds.variables[var_name].attrs["expression"]
+        dic = cls._create_dictionary_of_non_virtuals(ds)
+        operands = dict((name, dic[name]) for name in cls._get_used_variable_names(dic, expression))
+        return cache.create_key(ds, "virtual:" + var_name + ":" + expression, operands, operand_tokens)
+
+    @classmethod
+    def _replace_virtual_variable(cls, ds, var_name, dims, values):
+        tmp_var = xr.Variable(dims, values)
+        tmp_var.attrs = ds.variables[var_name].attrs
+        ds._variables[var_name] = tmp_var
+
+    @classmethod
+    def _get_raster_dims(cls, ds, var_name):
+        v_var = ds.variables[var_name]
+        if "virtual" not in v_var.attrs:
+            raise IOError('no such virtual variable: "' + var_name + '"')
+
+        if cls._is_already_loaded(v_var):
+            return v_var.dims[-2:]
+
+        dic = cls._create_dictionary_of_non_virtuals(ds)
+        return cls._get_biggest_variable(dic, v_var.attrs["expression"]).dims[-2:]
+
+    @classmethod
+    def _check_indexers(cls, indexers, dims):
+        for dim in indexers:
+            if dim not in dims:
+                raise ValueError("dimension " + str(dim) + " does not exist, expected one of " + str(dims))
+        return indexers
+
+    @classmethod
+    def _select(cls, variable, indexers):
+        variable_indexers = dict((dim, index) for dim, index in indexers.items() if dim in variable.dims)
+        return variable.isel(**variable_indexers).load()
+
+    @classmethod
+    def _interpolate_selection(cls, variable, biggest_variable, indexers):
+        y_dim, x_dim = biggest_variable.dims[-2:]
+        height, width = biggest_variable.shape[-2:]
+        rows = cls._select(xr.Variable(y_dim, np.arange(height)), indexers)
+        columns = cls._select(xr.Variable(x_dim, np.arange(width)), indexers)
+
+        pixel_dims = OrderedDict(zip(rows.dims, rows.shape))
+        pixel_dims.update(zip(columns.dims, columns.shape))
+        rows = rows.set_dims(pixel_dims).data
+        columns = columns.set_dims(pixel_dims).data
+
+        values = cls.tie_point_interpolator.interpolate_points(variable, (height, width), rows, columns)
+        return xr.Variable(tuple(pixel_dims), values)
 
     @classmethod
     def _create_dictionary_of_non_virtuals(cls, ds):
@@ -0,0 +1,258 @@
+import numpy as np
+import xarray as xr
+
+OR = "or"
+AND = "and"
+
+_DEFINITION_CACHE = dict()
+
+
+class FlagDefinition:
+    """Parsed form of the CF flag attributes of a variable.
+
+    Following CF, a meaning with a mask only is set when any of its mask bits is set, a meaning with a value only when the
+    variable equals the value and a meaning with both when the masked variable equals the value. Use
+    ``FlagDefinition.from_attributes()`` to obtain instances, these are cached process-wide per distinct attribute set.
+
+    Attributes
+    ----------
+    meanings: tuple of str
+        The flag meanings in the order of the attributes.
+    masks: dict
+        Maps meanings to their mask, None if the variable has no ``flag_masks``.
+    values: dict
+        Maps meanings to their value, None if the variable has no ``flag_values``.
+    """
+
+    def __init__(self, flag_meanings, flag_masks=None, flag_values=None):
+        self.meanings = tuple(flag_meanings.split())
+        if flag_masks is None and flag_values is None:
+            raise ValueError("neither flag_masks nor flag_values given for flag meanings: " + flag_meanings)
+
+        self.masks = FlagDefinition._parse_numbers(flag_masks, self.meanings, "flag_masks")
+        self.values = FlagDefinition._parse_numbers(flag_values, self.meanings, "flag_values")
+
+    @classmethod
+    def from_attributes(cls, attrs):
+        """Return the parsed flag definition for the attributes, parsing them only on first use.
+
+        Parameters
+        ----------
+        attrs: dict
+            The attributes of a flag variable, containing "flag_meanings" and "flag_masks" and/or "flag_values".
+
+        Return
+        ------
+        FlagDefinition
+        """
+        if "flag_meanings" not in attrs:
+            raise ValueError("not a flag variable, attribute flag_meanings is missing")
+
+        flag_meanings = attrs["flag_meanings"]
+        flag_masks = attrs.get("flag_masks")
+        flag_values = attrs.get("flag_values")
+        key = (flag_meanings, FlagDefinition._to_key(flag_masks), FlagDefinition._to_key(flag_values))
+        definition = _DEFINITION_CACHE.get(key)
+        if definition is None:
+            definition = cls(flag_meanings, flag_masks, flag_values)
+            _DEFINITION_CACHE[key] = definition
+        return definition
+
+    @staticmethod
+    def clear_cache():
+        _DEFINITION_CACHE.clear()
+
+    def is_single_bit(self, meaning):
+        """Whether the meaning is a mask of exactly one bit without value."""
+        if self.masks is None or self.values is not None:
+            return False
+        mask = self.masks[meaning]
+        return mask > 0 and mask & (mask - 1) == 0
+
+    def check_meaning(self, meaning):
+        if meaning not in self.meanings:
+            raise ValueError('no such flag meaning: "' + meaning + '", expected one of ' + ", ".join(self.meanings))
+
+    @staticmethod
+    def _parse_numbers(numbers, meanings, name):
+        if numbers is None:
+            return None
+
+        if isinstance(numbers, str):
+            numbers = [int(number) for number in numbers.replace(",", " ").split()]
+        else:
+            numbers = [int(number) for number in np.atleast_1d(numbers)]
+
+        if len(numbers) != len(meanings):
+            raise ValueError(name + " and flag_meanings differ in length: " + str(len(numbers)) + ", " + str(len(meanings)))
+
+        # integer attributes read back from file may be signed, the masks are kept as the unsigned bit pattern
+        return dict((meaning, number & 0xFFFFFFFFFFFFFFFF) for meaning, number in zip(meanings, numbers))
+
+    @staticmethod
+    def _to_key(numbers):
+        if numbers is None or isinstance(numbers, str):
+            return numbers
+        return tuple(int(number) for number in np.atleast_1d(numbers))
+
+
+class FlagDecoder:
+    """Boolean masks by flag meaning, evaluated with xarray operations and therefore lazily and chunkwise on dask backed
+    datasets. Scanline and channel flags broadcast by dimension name onto the pixel grid when combined with pixel flags.
+    """
+
+    @classmethod
+    def get_meanings(cls, ds, var_name):
+        """Return the flag meanings of a variable.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the flag variable.
+        var_name: str
+            Name of the flag variable.
+
+        Return
+        ------
+        tuple of str
+        """
+        return FlagDefinition.from_attributes(ds.variables[var_name].attrs).meanings
+
+    @classmethod
+    def get_mask(cls, ds, var_name, meanings, combine=OR):
+        """Return the mask of pixels having the flags set.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the flag variable.
+        var_name: str
+            Name of the flag variable.
+        meanings: str or iterable of str
+            One or more flag meanings.
+        combine: str, optional
+            "or" for pixels with any of the flags set, "and" for pixels with all flags set.
+
+        Return
+        ------
+        xarray.DataArray of bool with the dimensions of the flag variable
+        """
+        FlagDecoder._check_combine(combine)
+        if isinstance(meanings, str):
+            meanings = [meanings]
+        if len(meanings) == 0:
+            raise ValueError("no flag meanings given")
+
+        definition = FlagDefinition.from_attributes(ds.variables[var_name].attrs)
+        for meaning in meanings:
+            definition.check_meaning(meaning)
+
+        flags = FlagDecoder._get_integer_flags(ds[var_name])
+
+        if all(definition.is_single_bit(meaning) for meaning in meanings):
+            # all flags in one pass over the data
+            bits = 0
+            for meaning in meanings:
+                bits |= definition.masks[meaning]
+            masked = flags & FlagDecoder._to_dtype(bits, flags.dtype)
+            if combine == OR:
+                mask = masked != 0
+            else:
+                mask = masked == FlagDecoder._to_dtype(bits, flags.dtype)
+        else:
+            mask = FlagDecoder.combine([FlagDecoder._get_meaning_mask(flags, definition, meaning) for meaning in meanings], combine)
+
+        mask.name = var_name
+        return mask
+
+    @classmethod
+    def get_combined_mask(cls, ds, flags, combine=OR, like=None):
+        """Return the mask combining the flags of several variables.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the flag variables.
+        flags: dict
+            Maps flag variable names to one or more of their flag meanings.
+        combine: str, optional
+            "or" for pixels with any of the flags set, "and" for pixels with all flags set; applies within and across
+            the variables.
+        like: xarray.DataArray or str, optional
+            A variable or its name, the mask is broadcast to its dimensions.
+
+        Return
+        ------
+        xarray.DataArray of bool
+        """
+        masks = [cls.get_mask(ds, var_name, meanings, combine) for var_name, meanings in flags.items()]
+        if isinstance(like, str):
+            like = ds[like]
+        return cls.combine(masks, combine, like)
+
+    @classmethod
+    def combine(cls, masks, combine=OR, like=None):
+        """Combine masks, broadcasting them by dimension name.
+
+        Masks along the scanlines or channels only are combined as broadcast views, no full size copies are made
+        before the result is computed.
+
+        Parameters
+        ----------
+        masks: iterable of xarray.DataArray
+            The boolean masks.
+        combine: str, optional
+            "or" or "and".
+        like: xarray.DataArray, optional
+            The result is broadcast to the dimensions of this array, in its order, followed by the dimensions of the
+            masks not in the array.
+
+        Return
+        ------
+        xarray.DataArray of bool
+        """
+        FlagDecoder._check_combine(combine)
+        masks = list(masks)
+        if len(masks) == 0:
+            raise ValueError("no masks given")
+
+        result = masks[0]
+        for mask in masks[1:]:
+            if combine == OR:
+                result = result | mask
+            else:
+                result = result & mask
+
+        if like is not None:
+            result, _ = xr.broadcast(result, like)
+            result = result.transpose(*(list(like.dims) + [dim for dim in result.dims if dim not in like.dims]))
+
+        return result
+
+    @staticmethod
+    def _get_meaning_mask(flags, definition, meaning):
+        if definition.masks is not None:
+            masked = flags & FlagDecoder._to_dtype(definition.masks[meaning], flags.dtype)
+            if definition.values is None:
+                return masked != 0
+            return masked == FlagDecoder._to_dtype(definition.values[meaning], flags.dtype)
+
+        return flags == FlagDecoder._to_dtype(definition.values[meaning], flags.dtype)
+
+    @staticmethod
+    def _get_integer_flags(flags):
+        if np.issubdtype(flags.dtype, np.integer):
+            return flags
+
+        # flag variables decoded with a fill value are float, fill means no flag set
+        return flags.fillna(0).astype(np.int64)
+
+    @staticmethod
+    def _to_dtype(number, dtype):
+        # wraps masks of the highest bit to the signed representation, e.g. 2147483648 for int32
+        return np.array(number, dtype=np.uint64).astype(dtype)
+
+    @staticmethod
+    def _check_combine(combine):
+        if combine not in (OR, AND):
+            raise ValueError('combine must be "or" or "and": ' + str(combine))
@@ -0,0 +1,268 @@
+import threading
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+from fiduceo.fcdr.reader.flag_decoder import FlagDefinition
+
+DEFAULT_BLOCK_SIZE = 2048
+MEANING_DIM = "flag_meaning"
+
+_TABLES = dict()
+_TABLES_LOCK = threading.Lock()
+
+
+class FlagCounts:
+    """Number of pixels per flag meaning of one flag variable, optionally per scanline or channel.
+
+    Counts of files or blocks with the same kept dimensions and sizes are merged by ``merge()``, which makes them
+    suitable as partial results of a process pool.
+
+    Attributes
+    ----------
+    var_name: str
+        Name of the flag variable.
+    meanings: tuple of str
+        The flag meanings.
+    dims: tuple of str
+        The dimensions kept, e.g. ("y",) for counts per scanline.
+    counts: numpy.ndarray
+        The number of pixels with each flag set, shape (number of meanings,) followed by the sizes of the kept
+        dimensions.
+    num_pixels: numpy.ndarray
+        The number of pixels counted, shape of the kept dimensions.
+    num_files: int
+        The number of files merged.
+    """
+
+    def __init__(self, var_name, meanings, dims, counts, num_pixels, num_files=1):
+        self.var_name = var_name
+        self.meanings = tuple(meanings)
+        self.dims = tuple(dims)
+        self.counts = counts
+        self.num_pixels = num_pixels
+        self.num_files = num_files
+
+    def merge(self, other):
+        """Return the sum of both counts.
+
+        Parameters
+        ----------
+        other: FlagCounts
+            Counts of the same flag variable with the same kept dimensions.
+
+        Return
+        ------
+        FlagCounts
+        """
+        if self.meanings != other.meanings or self.dims != other.dims or self.counts.shape != other.counts.shape:
+            raise ValueError("flag counts differ in meanings or dimensions: " + str(self.meanings) + str(self.dims) + str(self.counts.shape) + ", " +
+                             str(other.meanings) + str(other.dims) + str(other.counts.shape))
+
+        return FlagCounts(self.var_name, self.meanings, self.dims, self.counts + other.counts, self.num_pixels + other.num_pixels,
+                          self.num_files + other.num_files)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    @staticmethod
+    def merge_all(partials):
+        """Merge a sequence of counts.
+
+        Parameters
+        ----------
+        partials: iterable of FlagCounts
+
+        Return
+        ------
+        FlagCounts, None if the sequence is empty
+        """
+        result = None
+        for partial in partials:
+            if result is None:
+                result = partial
+            else:
+                result = result.merge(partial)
+        return result
+
+    def to_data_array(self):
+        """Return the counts with dimension "flag_meaning" labelled by the meanings, followed by the kept dimensions.
+
+        Return
+        ------
+        xarray.DataArray
+        """
+        data_array = xr.DataArray(self.counts, dims=(MEANING_DIM,) + self.dims, coords={MEANING_DIM: list(self.meanings)}, name=self.var_name)
+        data_array.attrs["num_files"] = self.num_files
+        return data_array
+
+
+class FlagStatistics:
+    """Counts flag meanings of flag variables.
+
+    The variable is read in blocks of scanlines. Every byte value of a block is counted once with ``numpy.bincount``
+    and the histogram is multiplied with a table holding, for each of the 256 byte values, which meanings it sets.
+    Multi-byte flags use one table per byte for single bit masks. Other meanings of multi-byte flags are counted
+    directly. The tables are built once per flag definition and data type.
+    """
+
+    @classmethod
+    def count(cls, ds, var_name, keep_dims=(), block_size=DEFAULT_BLOCK_SIZE):
+        """Count the pixels per flag meaning of a flag variable.
+
+        Parameters
+        ----------
+        ds: xarray.Dataset
+            The dataset containing the flag variable.
+        var_name: str
+            Name of the flag variable.
+        keep_dims: iterable of str, optional
+            Dimensions not summed over, e.g. ("y",) for counts per scanline or ("channel",) for counts per channel.
+        block_size: int, optional
+            Number of elements along the first dimension read at once.
+
+        Return
+        ------
+        FlagCounts
+        """
+        variable = ds.variables[var_name]
+        definition = FlagDefinition.from_attributes(variable.attrs)
+        keep_dims = tuple(keep_dims)
+        for dim in keep_dims:
+            if dim not in variable.dims:
+                raise ValueError("dimension " + str(dim) + " does not exist, expected one of " + str(variable.dims))
+
+        sizes = dict(zip(variable.dims, variable.shape))
+        kept_shape = tuple(sizes[dim] for dim in keep_dims)
+        counts = np.zeros((len(definition.meanings),) + kept_shape, dtype=np.int64)
+        num_pixels = np.zeros(kept_shape, dtype=np.int64)
+
+        if variable.ndim == 0:
+            block_dim = None
+            blocks = [(0, 1)]
+        else:
+            block_dim = variable.dims[0]
+            blocks = [(start, min(start + block_size, sizes[block_dim])) for start in range(0, sizes[block_dim], block_size)]
+
+        other_dims = [dim for dim in variable.dims if dim not in keep_dims]
+        for start, stop in blocks:
+            if block_dim is None:
+                block = variable
+            else:
+                block = variable[{block_dim: slice(start, stop)}]
+            block = block.transpose(*(keep_dims + tuple(other_dims)))
+            block_kept_shape = block.shape[:len(keep_dims)]
+
+            values = FlagStatistics._get_integer_values(block)
+            values = values.reshape((int(np.prod(block_kept_shape, dtype=np.int64)), -1))
+
+            index = tuple(slice(start, stop) if dim == block_dim else slice(None) for dim in keep_dims)
+            counts[(slice(None),) + index] += FlagStatistics._count_block(values, definition).reshape((len(definition.meanings),) + block_kept_shape)
+            num_pixels[index] += values.shape[1]
+
+        return FlagCounts(var_name, definition.meanings, keep_dims, counts, num_pixels)
+
+    @classmethod
+    def count_file(cls, file_path, var_name, keep_dims=(), block_size=DEFAULT_BLOCK_SIZE):
+        """Count the pixels per flag meaning of a flag variable in a file, reading the flag variable only.
+
+        Parameters
+        ----------
+        file_path: str
+            The product file.
+        var_name: str
+            Name of the flag variable.
+        keep_dims: iterable of str, optional
+            Dimensions not summed over.
+        block_size: int, optional
+            Number of elements along the first dimension read at once.
+
+        Return
+        ------
+        FlagCounts
+        """
+        ds = FCDRReader.read(file_path, variables=[var_name])
+        try:
+            return cls.count(ds, var_name, keep_dims, block_size)
+        finally:
+            ds.close()
+
+    @staticmethod
+    def _count_block(values, definition):
+        """Return the counts per meaning and row of a two-dimensional integer array."""
+        num_rows = values.shape[0]
+        counts = np.zeros((len(definition.meanings), num_rows), dtype=np.int64)
+        if values.size == 0:
+            return counts
+
+        itemsize = values.dtype.itemsize
+        if itemsize == 1:
+            table = FlagStatistics._get_table(definition, values.dtype, 0)
+            return np.dot(FlagStatistics._histogram(values.view(np.uint8)), table).T
+
+        byte_values = values.astype(values.dtype.newbyteorder("<"), copy=False).view(np.uint8).reshape(num_rows, values.shape[1], itemsize)
+        for byte_index in range(itemsize):
+            table = FlagStatistics._get_table(definition, values.dtype, byte_index)
+            if np.any(table):
+                counts += np.dot(FlagStatistics._histogram(byte_values[:, :, byte_index]), table).T
+
+        for index, meaning in enumerate(definition.meanings):
+            if not definition.is_single_bit(meaning):
+                counts[index] = np.count_nonzero(FlagStatistics._is_set(values, definition, meaning, values.dtype), axis=1)
+
+        return counts
+
+    @staticmethod
+    def _histogram(byte_values):
+        num_rows = byte_values.shape[0]
+        offsets = (np.arange(num_rows, dtype=np.int64) * 256)[:, np.newaxis]
+        histogram = np.bincount((byte_values + offsets).ravel(), minlength=num_rows * 256)
+        return histogram.reshape(num_rows, 256)
+
+    @staticmethod
+    def _get_table(definition, dtype, byte_index):
+        """Return the (256, number of meanings) table of the meanings set by each value of a byte of the flags.
+
+        For one byte flags all meanings are evaluated, for multi-byte flags only the single bit masks within the byte.
+        """
+        key = (id(definition), np.dtype(dtype).str, byte_index)
+        with _TABLES_LOCK:
+            table = _TABLES.get(key)
+            if table is not None and table[0] is definition:
+                return table[1]
+
+        byte_range = np.arange(256, dtype=np.uint64)
+        table = np.zeros((256, len(definition.meanings)), dtype=np.int64)
+        for index, meaning in enumerate(definition.meanings):
+            if np.dtype(dtype).itemsize == 1:
+                table[:, index] = FlagStatistics._is_set(byte_range.astype(np.uint8).view(np.dtype(dtype)), definition, meaning, np.dtype(dtype))
+            elif definition.is_single_bit(meaning):
+                bit = definition.masks[meaning].bit_length() - 1
+                if bit // 8 == byte_index:
+                    table[:, index] = (byte_range >> np.uint64(bit % 8)) & np.uint64(1)
+
+        table.flags.writeable = False
+        with _TABLES_LOCK:
+            # the definition is kept with the table, so its id cannot be reused while the entry exists
+            _TABLES[key] = (definition, table)
+        return table
+
+    @staticmethod
+    def _is_set(values, definition, meaning, dtype):
+        if definition.masks is not None:
+            masked = values & np.array(definition.masks[meaning], dtype=np.uint64).astype(dtype)
+            if definition.values is None:
+                return masked != 0
+            return masked == np.array(definition.values[meaning], dtype=np.uint64).astype(dtype)
+
+        return values == np.array(definition.values[meaning], dtype=np.uint64).astype(dtype)
+
+    @staticmethod
+    def _get_integer_values(variable):
+        values = np.asarray(variable.values)
+        if np.issubdtype(values.dtype, np.integer):
+            return np.ascontiguousarray(values)
+
+        # flag variables decoded with a fill value are float, fill means no flag set
+        return np.ascontiguousarray(np.where(np.isnan(values), 0, values).astype(np.int64))
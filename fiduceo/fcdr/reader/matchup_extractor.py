@@ -0,0 +1,291 @@
+import multiprocessing
+import os
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.common.catalogue.file_name_parser import FileNameParser
+from fiduceo.common.catalogue.granule_catalogue import GranuleCatalogue
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+from fiduceo.fcdr.reader.pixel_locator import LAT_NAME, LON_NAME
+
+MATCHUP_DIM = "matchup"
+WINDOW_Y_DIM = "window_y"
+WINDOW_X_DIM = "window_x"
+
+DEFAULT_WINDOW_SIZE = 5
+
+
+class MatchupExtractor:
+    """Extracts pixel windows around in-situ points from the product files of an archive.
+
+    The points are assigned to the granules covering their time, using a catalogue of the archive built from the file
+    names. Each granule is opened once per pass, the pixel nearest to each of its points is found on the geolocation and
+    the windows of all its points are read with one vectorized selection. Points not found in a granule are tried in the
+    next granule covering their time in a further pass. Granules are processed in parallel in a pool of processes.
+    """
+
+    def __init__(self, archive_dir, window_size=DEFAULT_WINDOW_SIZE, max_distance=None, sensor=None, platform=None, type=None, version=None,
+                 catalogue_path=None, lat_name=LAT_NAME, lon_name=LON_NAME, max_workers=None):
+        """Create an extractor.
+
+        Parameters
+        ----------
+        archive_dir: str
+            The root directory of the product files, searched recursively.
+        window_size: int, optional
+            Edge length of the square pixel window, odd, centred on the nearest pixel.
+        max_distance: float, optional
+            Maximal distance in km between a point and its nearest pixel, points further away are not matched. When
+            None, a point is matched if its distance is within the size of the nearest pixel, i.e. the largest distance
+            of the pixel to its direct neighbours.
+        sensor, platform, type, version: str, optional
+            Restrict the granules used, see ``GranuleCatalogue.query()``.
+        catalogue_path: str, optional
+            The SQLite file of the granule catalogue, kept in memory when None.
+        lat_name: str, optional
+            Name of the latitude variable.
+        lon_name: str, optional
+            Name of the longitude variable.
+        max_workers: int, optional
+            Number of worker processes, defaults to the number of CPUs. With 1, granules are processed in the calling
+            process.
+        """
+        if window_size < 1 or window_size % 2 == 0:
+            raise ValueError("window size must be odd and positive: " + str(window_size))
+
+        self.archive_dir = archive_dir
+        self.window_size = window_size
+        self.max_distance = max_distance
+        self.sensor = sensor
+        self.platform = platform
+        self.type = type
+        self.version = version
+        self.lat_name = lat_name
+        self.lon_name = lon_name
+        if max_workers is None:
+            max_workers = os.cpu_count()
+        self.max_workers = max_workers
+
+        if catalogue_path is None:
+            catalogue_path = ":memory:"
+        self.catalogue = GranuleCatalogue(catalogue_path)
+
+    def close(self):
+        self.catalogue.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def extract(self, lat, lon, time, variables):
+        """Extract the pixel windows of all points.
+
+        Parameters
+        ----------
+        lat: array_like
+            Latitudes of the points in degrees.
+        lon: array_like
+            Longitudes of the points in degrees.
+        time: array_like
+            Times of the points, datetime64 or datetime.
+        variables: list of str
+            Names of the variables to extract, virtual variables included. Each variable must have at least one of
+            the dimensions of the geolocation.
+
+        Return
+        ------
+        xarray.Dataset with dimension "matchup" along the points and "window_y", "window_x" along the window. Windows of
+        unmatched points and pixels outside of the granule are filled. "matchup_file" indexes the granule in the
+        global attribute "matchup_files", -1 if unmatched; "matchup_y" and "matchup_x" locate the centre pixel and
+        "matchup_distance" is its distance to the point in km.
+        """
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        time = np.asarray(time, dtype="datetime64[s]").ravel()
+        if not (len(lat) == len(lon) == len(time)):
+            raise ValueError("lat, lon and time differ in length: " + str(len(lat)) + ", " + str(len(lon)) + ", " + str(len(time)))
+
+        paths, covered = self._find_granules(time)
+
+        if self.max_workers > 1 and len(paths) > 1:
+            # forking a process holding dask or netCDF locks in other threads deadlocks, workers are started fresh
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(processes=min(self.max_workers, len(paths))) as pool:
+                results = self._extract_passes(covered, paths, lat, lon, variables, lambda tasks: pool.map(_extract_granule, tasks, chunksize=1))
+        else:
+            results = self._extract_passes(covered, paths, lat, lon, variables, lambda tasks: [_extract_granule(task) for task in tasks])
+
+        return MatchupExtractor._stack(results, paths, lat, lon, time, variables, self.window_size)
+
+    def _extract_passes(self, covered, paths, lat, lon, variables, run):
+        """Return a list of (granule index, result). Each pass assigns every point not matched yet to the first granule
+        covering its time that it has not been tried in, until no granule is left to try."""
+        matched = np.zeros(len(lat), dtype=bool)
+        tried = [np.zeros(len(indices), dtype=bool) for indices in covered]
+
+        results = list()
+        while True:
+            assigned = np.zeros(len(lat), dtype=bool)
+            granules = list()
+            for granule_index, indices in enumerate(covered):
+                candidates = indices[~tried[granule_index]]
+                candidates = candidates[~(matched[candidates] | assigned[candidates])]
+                if len(candidates) > 0:
+                    assigned[candidates] = True
+                    tried[granule_index][np.searchsorted(indices, candidates)] = True
+                    granules.append((granule_index, candidates))
+
+            if len(granules) == 0:
+                return results
+
+            tasks = [(paths[granule_index], indices, lat[indices], lon[indices], list(variables), self.window_size, self.max_distance,
+                      self.lat_name, self.lon_name) for granule_index, indices in granules]
+            for (granule_index, _), result in zip(granules, run(tasks)):
+                matched[result["points"][result["rows"] >= 0]] = True
+                results.append((granule_index, result))
+
+    def _find_granules(self, time):
+        """Return the list of granule paths covering any point and, per granule, the sorted indices of the points covered."""
+        if len(time) == 0:
+            return [], []
+
+        self.catalogue.update(self.archive_dir)
+        paths = self.catalogue.query(sensor=self.sensor, platform=self.platform, type=self.type, version=self.version,
+                                     start=np.min(time).astype(object), end=np.max(time).astype(object))
+
+        order = np.argsort(time, kind="stable")
+        sorted_time = time[order]
+
+        granule_paths = list()
+        covered = list()
+        for path in paths:
+            granule = FileNameParser.parse(os.path.basename(path))
+            first = np.searchsorted(sorted_time, np.datetime64(granule.start, "s"), side="left")
+            last = np.searchsorted(sorted_time, np.datetime64(granule.end, "s"), side="right")
+            if last > first:
+                granule_paths.append(path)
+                covered.append(np.sort(order[first:last]))
+
+        return granule_paths, covered
+
+    @staticmethod
+    def _stack(results, paths, lat, lon, time, variables, window_size):
+        num_points = len(lat)
+        file_index = np.full(num_points, -1, dtype=np.int32)
+        rows = np.full(num_points, -1, dtype=np.int64)
+        columns = np.full(num_points, -1, dtype=np.int64)
+        distances = np.full(num_points, np.nan)
+
+        stacked = dict()
+        # points are passed on to a later granule only while unmatched, so later results overwrite fill values only
+        for index, result in results:
+            points = result["points"]
+            found = result["rows"] >= 0
+            file_index[points[found]] = index
+            rows[points] = result["rows"]
+            columns[points] = result["columns"]
+            distances[points[found]] = result["distances"][found]
+
+            for name in variables:
+                dims, values, attrs, fill_value = result["variables"][name]
+                if name not in stacked:
+                    stacked[name] = (dims, np.full((num_points,) + values.shape[1:], fill_value, dtype=values.dtype), attrs)
+                stacked[name][1][points] = values
+
+        ds = xr.Dataset()
+        for name in variables:
+            if name in stacked:
+                dims, data, attrs = stacked[name]
+                ds[name] = xr.Variable(dims, data, attrs)
+            else:
+                ds[name] = xr.Variable((MATCHUP_DIM, WINDOW_Y_DIM, WINDOW_X_DIM), np.full((num_points, window_size, window_size), np.nan))
+
+        ds["matchup_lat"] = xr.Variable(MATCHUP_DIM, lat)
+        ds["matchup_lon"] = xr.Variable(MATCHUP_DIM, lon)
+        ds["matchup_time"] = xr.Variable(MATCHUP_DIM, time.astype("datetime64[ns]"))
+        ds["matchup_file"] = xr.Variable(MATCHUP_DIM, file_index)
+        ds["matchup_y"] = xr.Variable(MATCHUP_DIM, rows)
+        ds["matchup_x"] = xr.Variable(MATCHUP_DIM, columns)
+        ds["matchup_distance"] = xr.Variable(MATCHUP_DIM, distances, {"units": "km"})
+        ds.attrs["matchup_files"] = paths
+        return ds
+
+
+def _extract_granule(task):
+    """Extract the windows of the points of one granule, runs in the worker processes."""
+    path, points, lat, lon, variables, window_size, max_distance, lat_name, lon_name = task
+
+    ds = FCDRReader.read(path, variables=list(variables) + [lat_name, lon_name])
+    try:
+        locator = FCDRReader.get_pixel_locator(ds, lat_name, lon_name)
+        rows, columns, distances = locator.find_nearest(lat, lon, max_distance=max_distance)
+        if max_distance is None:
+            too_far = rows >= 0
+            too_far[too_far] = distances[too_far] > locator.get_pixel_size(rows[too_far], columns[too_far])
+            rows[too_far] = -1
+            columns[too_far] = -1
+            distances[too_far] = np.inf
+        found = rows >= 0
+
+        y_dim, x_dim = ds.variables[lat_name].dims[-2:]
+        height, width = locator.shape
+        offsets = np.arange(window_size) - window_size // 2
+        window_rows = rows[found][:, np.newaxis] + offsets
+        window_columns = columns[found][:, np.newaxis] + offsets
+        indexers = {y_dim: xr.Variable((MATCHUP_DIM, WINDOW_Y_DIM), np.clip(window_rows, 0, height - 1)),
+                    x_dim: xr.Variable((MATCHUP_DIM, WINDOW_X_DIM), np.clip(window_columns, 0, width - 1))}
+        outside = {WINDOW_Y_DIM: xr.Variable((MATCHUP_DIM, WINDOW_Y_DIM), (window_rows < 0) | (window_rows >= height)),
+                   WINDOW_X_DIM: xr.Variable((MATCHUP_DIM, WINDOW_X_DIM), (window_columns < 0) | (window_columns >= width))}
+
+        extracted = dict()
+        for name in variables:
+            extracted[name] = _extract_windows(ds, name, indexers, outside, found)
+    finally:
+        ds.close()
+
+    return {"points": points, "rows": rows, "columns": columns, "distances": distances, "variables": extracted}
+
+
+def _extract_windows(ds, name, indexers, outside, found):
+    variable = ds.variables[name]
+    variable_indexers = dict((dim, index) for dim, index in indexers.items() if dim in variable.dims)
+    if "virtual" in variable.attrs:
+        selected = FCDRReader.evaluate_virtual_variable(ds, name, indexers)
+    elif len(variable_indexers) > 0:
+        selected = variable.isel(**variable_indexers).load()
+    else:
+        raise ValueError('variable "' + name + '" is not located on the geolocation raster')
+
+    window_dims = [dim for dim in (WINDOW_Y_DIM, WINDOW_X_DIM) if dim in selected.dims]
+    other_dims = [dim for dim in selected.dims if dim != MATCHUP_DIM and dim not in window_dims]
+    selected = selected.transpose(MATCHUP_DIM, *(other_dims + window_dims))
+
+    dtype, fill_value = _get_fill_value(variable, selected.dtype)
+    values = np.asarray(selected.values, dtype=dtype)
+    mask = False
+    for dim in window_dims:
+        mask = mask | outside[dim]
+    if len(window_dims) > 0:
+        mask = mask.set_dims(dict(zip(selected.dims, selected.shape))).transpose(*selected.dims)
+        values[mask.values] = fill_value
+
+    result = np.full((len(found),) + values.shape[1:], fill_value, dtype=dtype)
+    result[found] = values
+    return selected.dims, result, dict(variable.attrs), fill_value
+
+
+def _get_fill_value(variable, dtype):
+    if np.issubdtype(dtype, np.floating):
+        return dtype, np.nan
+
+    if np.issubdtype(dtype, np.datetime64):
+        return dtype, np.datetime64("NaT")
+
+    fill_value = variable.encoding.get("_FillValue", variable.attrs.get("_FillValue"))
+    if fill_value is not None:
+        return dtype, fill_value
+
+    return np.float64, np.nan
@@ -0,0 +1,294 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import dask.array as da
+import numpy as np
+from dask.base import tokenize
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_MAX_LOCATORS = 8
+
+LAT_NAME = "latitude"
+LON_NAME = "longitude"
+
+
+class PixelLocator:
+    """Nearest pixel lookup on the geolocation of a swath or grid.
+
+    The pixel positions are converted to 3-D unit vectors and stored in a KD-tree, so the Euclidean distance of the tree is
+    the chord length on the unit sphere. Chords are monotonous in great circle distance, which makes the lookup correct
+    across the date line and at the poles. Pixels with invalid geolocation are not stored and never returned.
+    """
+
+    def __init__(self, latitude, longitude):
+        """Build the tree.
+
+        Parameters
+        ----------
+        latitude: array_like
+            Latitudes in degrees, two-dimensional (y, x) or, for regular grids, one-dimensional along y.
+        longitude: array_like
+            Longitudes in degrees, same shape as latitude or, for regular grids, one-dimensional along x.
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        if latitude.ndim == 1 and longitude.ndim == 1:
+            latitude, longitude = np.meshgrid(latitude, longitude, indexing="ij")
+
+        if latitude.shape != longitude.shape:
+            raise ValueError("latitude and longitude differ in shape: " + str(latitude.shape) + ", " + str(longitude.shape))
+
+        self.shape = latitude.shape
+
+        valid = np.isfinite(latitude) & np.isfinite(longitude)
+        if np.all(valid):
+            self._pixel_indices = None
+            vectors = PixelLocator._to_unit_vectors(latitude.ravel(), longitude.ravel())
+        else:
+            self._pixel_indices = np.flatnonzero(valid)
+            vectors = PixelLocator._to_unit_vectors(latitude[valid], longitude[valid])
+
+        self._tree = cKDTree(vectors, balanced_tree=False, compact_nodes=False)
+
+    @classmethod
+    def from_dataset(cls, dataset, lat_name=LAT_NAME, lon_name=LON_NAME):
+        """Build the locator of a dataset.
+
+        Parameters
+        ----------
+        dataset: xarray.Dataset
+            The dataset, e.g. as returned by ``FCDRReader.read()``.
+        lat_name: str, optional
+            Name of the latitude variable.
+        lon_name: str, optional
+            Name of the longitude variable.
+
+        Return
+        ------
+        PixelLocator
+        """
+        return cls(dataset.variables[lat_name].values, dataset.variables[lon_name].values)
+
+    def find_nearest(self, lat, lon, max_distance=None):
+        """Find the nearest pixel of each point.
+
+        Parameters
+        ----------
+        lat: array_like
+            Latitudes of the points in degrees.
+        lon: array_like
+            Longitudes of the points in degrees, same shape as lat.
+        max_distance: float, optional
+            Maximal great circle distance in km, points without pixel within are marked invalid.
+
+        Return
+        ------
+        (rows, columns, distances): numpy.ndarray each, with the shape of lat; rows and columns are -1 and distances are
+        inf for invalid points
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        vectors = PixelLocator._to_unit_vectors(lat.ravel(), lon.ravel())
+
+        if max_distance is None:
+            upper_bound = np.inf
+        else:
+            upper_bound = PixelLocator._to_chord(max_distance)
+
+        chords, indices = self._tree.query(vectors, k=1, distance_upper_bound=upper_bound)
+        found = np.isfinite(chords)
+        pixel_indices = self._to_pixel_indices(np.where(found, indices, 0))
+
+        rows = np.full(len(vectors), -1, dtype=np.int64)
+        columns = np.full(len(vectors), -1, dtype=np.int64)
+        rows[found], columns[found] = np.unravel_index(pixel_indices[found], self.shape)
+
+        distances = np.full(len(vectors), np.inf)
+        distances[found] = PixelLocator._to_distance(chords[found])
+
+        return rows.reshape(lat.shape), columns.reshape(lat.shape), distances.reshape(lat.shape)
+
+    def find_within(self, lat, lon, radius):
+        """Find all pixels within a great circle distance of each point.
+
+        Parameters
+        ----------
+        lat: array_like
+            Latitudes of the points in degrees.
+        lon: array_like
+            Longitudes of the points in degrees, same shape as lat.
+        radius: float
+            The great circle distance in km.
+
+        Return
+        ------
+        list of (rows, columns) with one pair of numpy.ndarray per point, in the order of the flattened points; pixels are
+        sorted by index
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        vectors = PixelLocator._to_unit_vectors(lat.ravel(), lon.ravel())
+
+        neighbours = self._tree.query_ball_point(vectors, PixelLocator._to_chord(radius))
+
+        result = list()
+        for indices in neighbours:
+            pixel_indices = np.sort(self._to_pixel_indices(np.asarray(indices, dtype=np.int64)))
+            rows, columns = np.unravel_index(pixel_indices, self.shape)
+            result.append((rows, columns))
+        return result
+
+    def get_pixel_size(self, rows, columns):
+        """Estimate the footprint of pixels as the largest great circle distance to their direct neighbours along y and x.
+
+        Parameters
+        ----------
+        rows: array_like
+            Row indices of valid pixels, e.g. as returned by ``find_nearest()``.
+        columns: array_like
+            Column indices, same shape as rows.
+
+        Return
+        ------
+        numpy.ndarray of distances in km with the shape of rows; neighbours with invalid geolocation are ignored
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        height, width = self.shape
+
+        vectors = self._get_vectors(rows, columns)
+        chords = np.zeros(rows.shape)
+        for row_offset, column_offset in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            neighbours = self._get_vectors(np.clip(rows + row_offset, 0, height - 1), np.clip(columns + column_offset, 0, width - 1))
+            chords = np.fmax(chords, np.linalg.norm(neighbours - vectors, axis=-1))
+
+        return PixelLocator._to_distance(chords)
+
+    def _get_vectors(self, rows, columns):
+        pixel_indices = np.ravel_multi_index((rows, columns), self.shape)
+        if self._pixel_indices is None:
+            return self._tree.data[pixel_indices]
+
+        tree_indices = np.minimum(np.searchsorted(self._pixel_indices, pixel_indices), len(self._pixel_indices) - 1)
+        valid = self._pixel_indices[tree_indices] == pixel_indices
+        return np.where(valid[..., np.newaxis], self._tree.data[tree_indices], np.nan)
+
+    def _to_pixel_indices(self, tree_indices):
+        if self._pixel_indices is None:
+            return tree_indices
+        return self._pixel_indices[tree_indices]
+
+    @staticmethod
+    def _to_unit_vectors(lat, lon):
+        lat = np.radians(lat)
+        lon = np.radians(lon)
+        cos_lat = np.cos(lat)
+        return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+    @staticmethod
+    def _to_chord(distance):
+        angle = min(distance / EARTH_RADIUS_KM, np.pi)
+        return 2.0 * np.sin(angle / 2.0)
+
+    @staticmethod
+    def _to_distance(chord):
+        return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2.0, 1.0))
+
+
+class PixelLocatorCache:
+    """Keeps the pixel locators of the most recently used datasets.
+
+    Datasets read from file are identified by path, size and modification time together with a token of the
+    geolocation, so reopening an unchanged file reuses its locator while a selection or concatenation of the dataset
+    gets its own. The token of dask backed geolocation is its graph name, which xarray derives from the file and the
+    selection; numpy geolocation is hashed by content. Other datasets are identified by object and their locators
+    dropped when they are garbage collected.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_LOCATORS):
+        """Create a cache.
+
+        Parameters
+        ----------
+        max_size: int, optional
+            The maximal number of locators kept, the least recently used is dropped beyond.
+        """
+        self.max_size = max_size
+        self._locators = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, dataset, lat_name=LAT_NAME, lon_name=LON_NAME):
+        """Return the locator of a dataset, building it on first use.
+
+        Parameters
+        ----------
+        dataset: xarray.Dataset
+            The dataset.
+        lat_name: str, optional
+            Name of the latitude variable.
+        lon_name: str, optional
+            Name of the longitude variable.
+
+        Return
+        ------
+        PixelLocator
+        """
+        key = self._create_key(dataset, lat_name, lon_name)
+        with self._lock:
+            locator = self._locators.get(key)
+            if locator is not None:
+                self._locators.move_to_end(key)
+                return locator
+
+        locator = PixelLocator.from_dataset(dataset, lat_name, lon_name)
+
+        with self._lock:
+            if key[0] == "id":
+                self._register_dataset(dataset, key)
+            self._locators[key] = locator
+            while len(self._locators) > self.max_size:
+                self._locators.popitem(last=False)
+        return locator
+
+    def clear(self):
+        with self._lock:
+            self._locators.clear()
+
+    def __len__(self):
+        return len(self._locators)
+
+    @staticmethod
+    def _create_key(dataset, lat_name, lon_name):
+        source = dataset.encoding.get("source")
+        if source is not None and os.path.isfile(source):
+            lat_token = PixelLocatorCache._tokenize_geolocation(dataset.variables[lat_name])
+            lon_token = PixelLocatorCache._tokenize_geolocation(dataset.variables[lon_name])
+            if lat_token is not None and lon_token is not None:
+                stat = os.stat(source)
+                return "file", os.path.abspath(source), stat.st_size, stat.st_mtime, lat_name, lon_name, lat_token, lon_token
+        return "id", id(dataset), lat_name, lon_name
+
+    @staticmethod
+    def _tokenize_geolocation(variable):
+        data = variable.data
+        if isinstance(data, da.Array):
+            data_token = data.name
+        elif isinstance(data, np.ndarray):
+            data_token = tokenize(data)
+        else:
+            return None
+        return tokenize(variable.dims, variable.shape, variable.dtype.str, data_token)
+
+    def _register_dataset(self, dataset, key):
+        self_ref = weakref.ref(self)
+
+        def on_collect():
+            cache = self_ref()
+            if cache is not None:
+                with cache._lock:
+                    cache._locators.pop(key, None)
+
+        weakref.finalize(dataset, on_collect)
@@ -0,0 +1,230 @@
+import threading
+import weakref
+
+import dask.array as da
+import numpy as np
+from gridtools.resampling import resample_2d
+
+
+class TiePointInterpolator:
+    """Bilinear interpolation of tie point variables to the full raster.
+
+    Full rasters are computed with ``gridtools.resample_2d``. Windows and dask blocks use the same
+    corner aligned bilinear scheme (target index ``i`` maps to tie point coordinate
+    ``i * (tie_size - 1) / (target_size - 1)``), but only evaluate the requested pixels.
+
+    Full rasters requested via ``get_raster()`` are memoized per (dataset, variable, target shape, dtype).
+    Entries are dropped when the dataset is garbage collected or when ``invalidate()`` is called, e.g. after
+    writing new values to a tie point variable.
+    """
+
+    def __init__(self):
+        self._rasters = dict()
+        self._dataset_refs = dict()
+        self._lock = threading.RLock()
+
+    def get_raster(self, dataset, var_name, target_shape, dtype=np.float64):
+        """Return the memoized full raster of a tie point variable of the dataset.
+
+        Parameters
+        ----------
+        dataset: xarray.Dataset
+            The dataset containing the tie point variable.
+        var_name: str
+            Name of the tie point variable.
+        target_shape: tuple of int
+            The (height, width) of the full raster.
+        dtype: numpy.dtype, optional
+            The data type of the raster, float64 or float32.
+
+        Return
+        ------
+        numpy.ndarray
+        """
+        target_shape = tuple(target_shape)
+        key = (id(dataset), var_name, target_shape, np.dtype(dtype).str)
+        with self._lock:
+            raster = self._rasters.get(key)
+        if raster is not None:
+            return raster
+
+        raster = self.interpolate(dataset.variables[var_name], target_shape, dtype=dtype)
+        raster.flags.writeable = False
+
+        with self._lock:
+            self._register_dataset(dataset)
+            self._rasters[key] = raster
+        return raster
+
+    def invalidate(self, dataset=None, var_name=None):
+        """Drop memoized rasters.
+
+        Parameters
+        ----------
+        dataset: xarray.Dataset, optional
+            Restrict to the rasters of this dataset, all datasets when None.
+        var_name: str, optional
+            Restrict to the rasters of this variable, all variables when None.
+        """
+        with self._lock:
+            self._invalidate(None if dataset is None else id(dataset), var_name)
+
+    def interpolate(self, variable, target_shape, dtype=np.float64):
+        """Interpolate a tie point variable or array to the full raster.
+
+        Parameters
+        ----------
+        variable: xarray.Variable or numpy.ndarray
+            The two-dimensional tie point data.
+        target_shape: tuple of int
+            The (height, width) of the full raster.
+        dtype: numpy.dtype, optional
+            The data type of the raster, float64 or float32.
+
+        Return
+        ------
+        numpy.ndarray
+        """
+        values = self._get_values(variable)
+        height, width = target_shape[-2:]
+        if values.shape == (height, width):
+            return np.array(values, dtype=dtype)
+
+        full_size_array = resample_2d(values, width, height)
+        return np.asarray(full_size_array, dtype=dtype)
+
+    def interpolate_window(self, variable, target_shape, y_slice, x_slice, dtype=np.float64):
+        """Interpolate a rectangular window of the full raster only.
+
+        Parameters
+        ----------
+        variable: xarray.Variable or numpy.ndarray
+            The two-dimensional tie point data.
+        target_shape: tuple of int
+            The (height, width) of the full raster.
+        y_slice: slice
+            The rows of the full raster to interpolate.
+        x_slice: slice
+            The columns of the full raster to interpolate.
+        dtype: numpy.dtype, optional
+            The data type of the result, float64 or float32.
+
+        Return
+        ------
+        numpy.ndarray
+        """
+        height, width = target_shape[-2:]
+        rows = np.arange(*y_slice.indices(height))
+        columns = np.arange(*x_slice.indices(width))
+        return self.interpolate_points(variable, target_shape, rows[:, np.newaxis], columns[np.newaxis, :], dtype)
+
+    def interpolate_points(self, variable, target_shape, rows, columns, dtype=np.float64):
+        """Interpolate the full raster at the given pixels only.
+
+        Parameters
+        ----------
+        variable: xarray.Variable or numpy.ndarray
+            The two-dimensional tie point data.
+        target_shape: tuple of int
+            The (height, width) of the full raster.
+        rows: numpy.ndarray
+            Row indices in the full raster, broadcast against the columns.
+        columns: numpy.ndarray
+            Column indices in the full raster, broadcast against the rows.
+        dtype: numpy.dtype, optional
+            The data type of the result, float64 or float32.
+
+        Return
+        ------
+        numpy.ndarray with the broadcast shape of rows and columns
+        """
+        return self._interpolate_at(self._get_values(variable), target_shape, np.asarray(rows), np.asarray(columns), dtype)
+
+    def interpolate_lazy(self, variable, target_shape, chunks, dtype=np.float64):
+        """Create a dask array interpolating each block of the full raster on demand.
+
+        Parameters
+        ----------
+        variable: xarray.Variable or numpy.ndarray
+            The two-dimensional tie point data.
+        target_shape: tuple of int
+            The (height, width) of the full raster.
+        chunks: tuple
+            The block shape or dask chunks of the full raster.
+        dtype: numpy.dtype, optional
+            The data type of the raster, float64 or float32.
+
+        Return
+        ------
+        dask.array.Array
+        """
+        values = self._get_values(variable)
+        target_shape = tuple(target_shape[-2:])
+        chunks = da.core.normalize_chunks(chunks, target_shape)
+
+        rows = da.arange(target_shape[0], chunks=(chunks[0],))[:, np.newaxis]
+        columns = da.arange(target_shape[1], chunks=(chunks[1],))[np.newaxis, :]
+
+        def interpolate_block(block_rows, block_columns):
+            return self._interpolate_at(values, target_shape, block_rows, block_columns, dtype)
+
+        return da.map_blocks(interpolate_block, rows, columns, dtype=dtype)
+
+    def _interpolate_at(self, values, target_shape, rows, columns, dtype):
+        if values.shape == tuple(target_shape[-2:]):
+            return np.asarray(values[rows, columns], dtype=dtype)
+
+        y0, y1, wy = self._get_coordinates(rows, values.shape[0], target_shape[-2])
+        x0, x1, wx = self._get_coordinates(columns, values.shape[1], target_shape[-1])
+
+        values = np.asarray(values, dtype=np.float64)
+        v00 = values[y0, x0]
+        v01 = values[y0, x1]
+        v10 = values[y1, x0]
+        v11 = values[y1, x1]
+        v0 = v00 + wx * (v01 - v00)
+        v1 = v10 + wx * (v11 - v10)
+        return np.asarray(v0 + wy * (v1 - v0), dtype=dtype)
+
+    @staticmethod
+    def _get_coordinates(indices, tie_size, target_size):
+        if target_size > 1:
+            scale = (tie_size - 1.0) / (target_size - 1.0)
+        else:
+            scale = tie_size - 1.0
+
+        position = indices * scale
+        lower = position.astype(np.int64)
+        weight = position - lower
+        upper = np.where(weight != 0.0, lower + 1, lower)
+        return lower, upper, weight
+
+    @staticmethod
+    def _get_values(variable):
+        if hasattr(variable, "values"):
+            return np.asarray(variable.values)
+        return np.asarray(variable)
+
+    def _register_dataset(self, dataset):
+        dataset_id = id(dataset)
+        if dataset_id not in self._dataset_refs:
+            self_ref = weakref.ref(self)
+
+            def on_collect(ref):
+                interpolator = self_ref()
+                if interpolator is not None:
+                    with interpolator._lock:
+                        interpolator._invalidate(dataset_id, None)
+
+            self._dataset_refs[dataset_id] = weakref.ref(dataset, on_collect)
+
+    def _invalidate(self, dataset_id, var_name):
+        for key in list(self._rasters.keys()):
+            if (dataset_id is None or key[0] == dataset_id) and (var_name is None or key[1] == var_name):
+                self._rasters.pop(key, None)
+
+        if var_name is None:
+            if dataset_id is None:
+                self._dataset_refs.clear()
+            else:
+                self._dataset_refs.pop(dataset_id, None)
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import dask.array as da
+import numpy as np
+from dask.base import tokenize
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".fiduceo", "cache")
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+CACHE_FILE_EXTENSION = ".npy"
+
+
+class VirtualVariableCache:
+    """Persistent store of evaluated virtual variables and interpolated tie point rasters.
+
+    Each array is kept as a .npy file in the cache directory and reopened as a read-only memory map. Keys are derived
+    from the identity of the source file (absolute path, size and modification time), a description of the
+    content, e.g. the expression of a virtual variable, and a token of each operand, so a rewritten file, a changed
+    expression, a selection of the dataset or differently decoded operands never hit a stale entry. The token of
+    a dask backed operand is its graph name, which xarray derives from the file, the decode options and the
+    selection; numpy operands are hashed by content. Datasets with operands of other kinds are not cached.
+
+    When the store grows beyond the maximal size, the least recently used files are deleted.
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        """Create a cache.
+
+        Parameters
+        ----------
+        cache_dir: str, optional
+            The directory of the store, created if necessary. Defaults to ``~/.fiduceo/cache``.
+        max_size: int, optional
+            The maximal size of the store in bytes.
+        """
+        if cache_dir is None:
+            cache_dir = DEFAULT_CACHE_DIR
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def create_key(self, dataset, description, operands=None, operand_tokens=None):
+        """Create the key of an array derived from a dataset read from file.
+
+        Parameters
+        ----------
+        dataset: xarray.Dataset
+            The dataset the array is derived from.
+        description: str
+            Identifies the array within the dataset, e.g. variable name and expression.
+        operands: dict of str to xarray.Variable, optional
+            The variables the array is computed from.
+        operand_tokens: dict of str to str, optional
+            Tokens of the operands by name, shared by the keys created within one evaluation so that numpy operands
+            are hashed once. Missing tokens are computed and added.
+
+        Return
+        ------
+        str, or None if the dataset has not been read from a file or an operand can not be identified
+        """
+        source = dataset.encoding.get("source")
+        if source is None or not os.path.isfile(source):
+            return None
+
+        source = os.path.abspath(source)
+        stat = os.stat(source)
+        identity = source + "|" + str(stat.st_size) + "|" + repr(stat.st_mtime) + "|" + description
+
+        if operands is not None:
+            if operand_tokens is None:
+                operand_tokens = dict()
+
+            for name in sorted(operands):
+                if name not in operand_tokens:
+                    operand_tokens[name] = self._tokenize_operand(operands[name])
+                token = operand_tokens[name]
+                if token is None:
+                    return None
+                identity += "|" + name + ":" + token
+
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the stored array as read-only memory map.
+
+        Parameters
+        ----------
+        key: str
+            The key as created by ``create_key()``.
+
+        Return
+        ------
+        numpy.memmap, or None if nothing is stored for the key
+        """
+        path = self._get_path(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+
+        return array
+
+    def put(self, key, array):
+        """Store an array and return it memory mapped from the store.
+
+        Parameters
+        ----------
+        key: str
+            The key as created by ``create_key()``.
+        array: numpy.ndarray
+            The array to store.
+
+        Return
+        ------
+        numpy.memmap
+        """
+        path = self._get_path(key)
+        handle, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                np.save(temp_file, np.asarray(array))
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._evict(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    def get_size(self):
+        """Return the size of all stored arrays in bytes.
+
+        Return
+        ------
+        int
+        """
+        return sum(size for _, _, size in self._list_entries())
+
+    def clear(self):
+        """Delete all stored arrays."""
+        with self._lock:
+            for path, _, _ in self._list_entries():
+                self._remove(path)
+
+    @staticmethod
+    def _tokenize_operand(variable):
+        data = variable.data
+        if isinstance(data, da.Array):
+            data_token = data.name
+        elif isinstance(data, np.ndarray):
+            data_token = tokenize(data)
+        else:
+            return None
+
+        # undecoded variables keep scale_factor, _FillValue etc. as attributes
+        return tokenize(variable.dims, variable.shape, variable.dtype.str, sorted(variable.attrs.items()), data_token)
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXTENSION)
+
+    def _evict(self, keep):
+        with self._lock:
+            entries = sorted(self._list_entries(), key=lambda entry: entry[1])
+            total_size = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if total_size <= self.max_size:
+                    break
+
+                if path != keep:
+                    self._remove(path)
+                    total_size -= size
+
+    def _list_entries(self):
+        entries = list()
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(CACHE_FILE_EXTENSION):
+                path = os.path.join(self.cache_dir, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,96 @@
+import math
+import unittest
+
+import numpy as np
+
+from fiduceo.fcdr.reader.expression import Expression, ExpressionBatch
+
+
+class ExpressionTest(unittest.TestCase):
+
+    def tearDown(self):
+        Expression.clear_cache()
+
+    def test_dependencies(self):
+        expression = Expression("(asd)*[lsmf + bottle] - ka")
+        self.assertEqual(("asd", "lsmf", "bottle", "ka"), expression.dependencies)
+        self.assertEqual((), expression.constants)
+
+    def test_dependencies_are_identifier_exact(self):
+        expression = Expression("u_a1_vis * a1_vis_2 + u_a1_vis")
+        self.assertEqual(("u_a1_vis", "a1_vis_2"), expression.dependencies)
+        self.assertFalse("a1_vis" in expression.dependencies)
+
+    def test_function_names_are_no_dependencies(self):
+        expression = Expression("arctan2(a, b) + cos(solar_zenith_angle * PI / 180.0)")
+        self.assertEqual(("a", "b", "solar_zenith_angle"), expression.dependencies)
+        self.assertEqual(("PI",), expression.constants)
+
+    def test_numexpr_string_replaces_pi(self):
+        expression = Expression(" a*pi + Pi")
+        self.assertEqual("a*" + repr(math.pi) + " + " + repr(math.pi), expression.numexpr_string)
+        self.assertEqual(("pi", "Pi"), expression.constants)
+        self.assertEqual(("a",), expression.dependencies)
+
+    def test_numexpr_string_keeps_names_containing_pi(self):
+        expression = Expression("lpit + pit + lpi")
+        self.assertEqual("lpit + pit + lpi", expression.numexpr_string)
+        self.assertEqual(("lpit", "pit", "lpi"), expression.dependencies)
+        self.assertEqual((), expression.constants)
+
+    def test_compile_is_cached(self):
+        expression = Expression.compile("a + b")
+        self.assertIs(expression, Expression.compile("a + b"))
+        self.assertIsNot(expression, Expression.compile("a - b"))
+
+    def test_invalid_expression(self):
+        try:
+            Expression.compile("a + * b")
+            self.fail("SyntaxError expected")
+        except SyntaxError:
+            pass
+
+
+class ExpressionBatchTest(unittest.TestCase):
+
+    def tearDown(self):
+        ExpressionBatch.clear_cache()
+        Expression.clear_cache()
+
+    def test_common_subexpressions_become_temporaries(self):
+        batch = ExpressionBatch.compile(["a * cos(b * PI) / c", "d + a * cos(b * PI)", "c * 2"])
+        self.assertEqual(1, len(batch.temporaries))
+        name, source = batch.temporaries[0]
+        self.assertEqual("(a * cos((b * " + repr(math.pi) + ")))", source)
+        self.assertEqual("(" + name + " / c)", batch.result_strings[0])
+        self.assertEqual("(d + " + name + ")", batch.result_strings[1])
+        self.assertEqual("(c * 2)", batch.result_strings[2])
+        self.assertEqual(("a", "b", "c", "d"), batch.dependencies)
+
+    def test_nested_temporaries_are_evaluated_in_dependency_order(self):
+        batch = ExpressionBatch.compile(["(a + b) * c + 1", "(a + b) * c - 1", "(a + b) / 2"])
+        temporary_names = [name for name, source in batch.temporaries]
+        self.assertEqual(2, len(temporary_names))
+        first_name, first_source = batch.temporaries[0]
+        self.assertEqual("(a + b)", first_source)
+        self.assertEqual("(" + first_name + " * c)", batch.temporaries[1][1])
+
+    def test_no_common_subexpressions(self):
+        batch = ExpressionBatch.compile(["a + b", "a - b"])
+        self.assertEqual([], batch.temporaries)
+        self.assertEqual(["(a + b)", "(a - b)"], batch.result_strings)
+
+    def test_evaluate(self):
+        a = np.asarray([[1.0, 2.0], [3.0, 4.0]])
+        b = np.asarray([0.5, 0.25])
+        batch = ExpressionBatch.compile(["-1.0 * (a * b + 1)", "(a * b + 1) / 2", "a > 2"])
+
+        results = batch.evaluate({"a": a, "b": b})
+
+        np.testing.assert_array_almost_equal(-1.0 * (a * b + 1), results[0])
+        np.testing.assert_array_almost_equal((a * b + 1) / 2, results[1])
+        np.testing.assert_array_equal(a > 2, results[2])
+
+    def test_compile_is_cached(self):
+        batch = ExpressionBatch.compile(["a + b", "a - b"])
+        self.assertIs(batch, ExpressionBatch.compile(("a + b", "a - b")))
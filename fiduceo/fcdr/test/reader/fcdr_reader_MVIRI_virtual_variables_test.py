@@ -1,5 +1,8 @@
 import unittest
 
+import dask
+import numpy as np
+
 from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
 from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
 
@@ -111,3 +114,103 @@ class FCDRReaderMviriVirtualVariablesTest(unittest.TestCase):
         self.assertEqual((5000, 5000), virtual_variable.shape)
 
         self.assertAlmostEqual(7.5649163778089505, virtual_variable.data[4, 4])
+
+    def testCalculate_sensitivitiy_a0_vis_lazy(self):
+        self.dataset["distance_sun_earth"].data = 1.0166579484939575
+        self.dataset["count_vis"].data[:, :] = 14
+        self.dataset["mean_count_space_vis"] = 4.961684375
+        self.dataset["solar_zenith_angle"].data[:, :] = 18.2038
+        self.dataset["solar_irradiance_vis"].data = 688.144781045
+
+        self.fcdr_reader._load_virtual_variable(self.dataset, "sensitivity_a0_vis", lazy=True)
+
+        virtual_variable = self.dataset["sensitivity_a0_vis"]
+        self.assertEqual((5000, 5000), virtual_variable.shape)
+        self.assertEqual((500,) * 10, virtual_variable.chunks[0])
+        self.assertEqual((500,) * 10, virtual_variable.chunks[1])
+
+        self.assertAlmostEqual(0.044895821172659549, virtual_variable[3, 3].values)
+
+    def testCalculate_all_sensitivities_in_one_pass(self):
+        self._set_sensitivity_inputs()
+        self.dataset["count_vis"].data[:100, :100] = np.arange(0, 100, dtype=np.uint8)
+
+        expected = self.dataset.copy(deep=True)
+        for name in SENSITIVITY_NAMES:
+            self.fcdr_reader._load_virtual_variable(expected, name)
+
+        self.fcdr_reader.load_virtual_variables(self.dataset, SENSITIVITY_NAMES)
+
+        for name in SENSITIVITY_NAMES:
+            self.assertEqual(expected[name].dims, self.dataset[name].dims)
+            self.assertEqual(expected[name].attrs, self.dataset[name].attrs)
+            np.testing.assert_array_equal(expected[name].values[:120, :120], self.dataset[name].values[:120, :120])
+
+        self.assertEqual((500, 500), self.dataset["sensitivity_count_vis"].shape)
+        self.assertEqual((5000, 5000), self.dataset["sensitivity_a2_vis"].shape)
+
+    def testCalculate_all_sensitivities_in_one_pass_lazy(self):
+        self._set_sensitivity_inputs()
+
+        expected = self.dataset.copy(deep=True)
+        for name in SENSITIVITY_NAMES:
+            self.fcdr_reader._load_virtual_variable(expected, name)
+
+        self.fcdr_reader.load_virtual_variables(self.dataset, SENSITIVITY_NAMES, lazy=True)
+
+        windows = [self.dataset[name][5:15, 495:505].data for name in SENSITIVITY_NAMES]
+        computed = dask.compute(*windows)
+        for name, values in zip(SENSITIVITY_NAMES, computed):
+            self.assertEqual(500, self.dataset[name].chunks[0][0])
+            np.testing.assert_array_almost_equal(expected[name].values[5:15, 495:505], values, 12)
+
+    def testCalculate_sensitivities_at_matchup_windows(self):
+        self._set_sensitivity_inputs()
+        self.dataset["count_vis"].data[:, :] = np.arange(0, 5000, dtype=np.uint8)
+        self.dataset["solar_zenith_angle"].data[:, :] = np.linspace(10.0, 60.0, 500, dtype=np.float32)
+
+        centers_y = np.linspace(2, 4997, 40).astype(np.int64)
+        centers_x = np.linspace(4997, 2, 40).astype(np.int64)
+        offsets_y, offsets_x = np.meshgrid(np.arange(-2, 3), np.arange(-2, 3), indexing="ij")
+        y = (centers_y[:, np.newaxis] + offsets_y.ravel()).ravel()
+        x = (centers_x[:, np.newaxis] + offsets_x.ravel()).ravel()
+
+        points = self.fcdr_reader.evaluate_virtual_variable_at_points(self.dataset, "sensitivity_a0_vis", y, x)
+        box = self.fcdr_reader.evaluate_virtual_variable_in_box(self.dataset, "sensitivity_a0_vis", 4990, 4994, 0, 4)
+
+        self.assertEqual(("points",), points.dims)
+        self.assertEqual(1000, points.shape[0])
+
+        self.fcdr_reader._load_virtual_variable(self.dataset, "sensitivity_a0_vis")
+        expected = self.dataset["sensitivity_a0_vis"].values
+        np.testing.assert_array_almost_equal(expected[y, x], points.values, 12)
+        np.testing.assert_array_almost_equal(expected[4990:4995, 0:5], box.values, 12)
+
+    def test_resolve_dependencies_of_vis_sensitivities(self):
+        required = self.fcdr_reader._resolve_dependencies(self.dataset, ["sensitivity_a0_vis", "sensitivity_count_vis"])
+
+        self.assertEqual(["a0_vis", "a1_vis", "a2_vis", "count_vis", "distance_sun_earth", "mean_count_space_vis", "sensitivity_a0_vis", "sensitivity_count_vis",
+                          "solar_irradiance_vis", "solar_zenith_angle", "years_since_launch"], sorted(required))
+
+    def test_load_virtual_variables_not_virtual(self):
+        try:
+            self.fcdr_reader.load_virtual_variables(self.dataset, ["sensitivity_a0_vis", "count_vis"])
+            self.fail("IOError expected")
+        except IOError:
+            pass
+
+    def _set_sensitivity_inputs(self):
+        self.dataset["distance_sun_earth"].data = 1.0166579484939575
+        self.dataset["count_vis"].data[:, :] = 24
+        self.dataset["mean_count_space_vis"] = 4.961684375
+        self.dataset["a0_vis"].data = 0.9800095200636486
+        self.dataset["a1_vis"].data = 0.01179638707394702
+        self.dataset["a2_vis"].data = 0.001179638707394702
+        self.dataset["years_since_launch"].data = 8.830136986301369
+        self.dataset["solar_zenith_angle"].data[:, :] = 22.1907
+        self.dataset["solar_zenith_angle"].data[:10, :10] = 45.0
+        self.dataset["solar_irradiance_vis"].data = 688.144781045
+
+
+SENSITIVITY_NAMES = ["sensitivity_solar_irradiance_vis", "sensitivity_count_vis", "sensitivity_count_space", "sensitivity_a0_vis", "sensitivity_a1_vis",
+                     "sensitivity_a2_vis"]
@@ -0,0 +1,66 @@
+import datetime
+import tracemalloc
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+
+PRODUCT_WIDTH = 409
+PRODUCT_HEIGHT = 13198
+
+
+class FCDRReaderMemoryIoTest(unittest.TestCase):
+
+    def test_extend_vertical_peak_memory(self):
+        legacy_extend = FCDRReader.__dict__["_extend_1d_vertical_to_2d"]
+
+        try:
+            FCDRReader._extend_1d_vertical_to_2d = classmethod(_extend_1d_vertical_to_2d_resize)
+            legacy_peak, legacy_data = self._measure_peak_memory("resize")
+        finally:
+            FCDRReader._extend_1d_vertical_to_2d = legacy_extend
+
+        peak, data = self._measure_peak_memory("broadcast")
+
+        np.testing.assert_array_equal(legacy_data, data)
+        # the result raster is allocated in both cases, the extended per-line operands only with np.resize
+        raster_size = PRODUCT_HEIGHT * PRODUCT_WIDTH * 8
+        self.assertTrue(peak < legacy_peak - raster_size)
+
+    def _measure_peak_memory(self, label):
+        ds = self.create_dataset()
+
+        tracemalloc.start()
+        start_time = datetime.datetime.now()
+        try:
+            FCDRReader._load_virtual_variable(ds, "corrected_Ch4")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        elapsed_time = datetime.datetime.now() - start_time
+        print("AVHRR extend vertical (" + label + ") time: " + str(elapsed_time.seconds) + "." + str(round(elapsed_time.microseconds / 1000)) + ", peak memory: " + str(
+            round(peak / (1024 * 1024), 1)) + " MB")
+        return peak, ds["corrected_Ch4"].data
+
+    @staticmethod
+    def create_dataset():
+        ds = xr.Dataset()
+        ds["Ch4_Bt"] = xr.Variable(["y", "x"], np.random.RandomState(13198).uniform(200.0, 300.0, (PRODUCT_HEIGHT, PRODUCT_WIDTH)))
+        ds["scan_offset"] = xr.Variable(["y"], np.linspace(-0.5, 0.5, PRODUCT_HEIGHT))
+        ds["scan_gain"] = xr.Variable(["y"], np.linspace(0.99, 1.01, PRODUCT_HEIGHT))
+
+        corrected = xr.Variable([], np.nan)
+        corrected.attrs["virtual"] = "true"
+        corrected.attrs["expression"] = "Ch4_Bt * scan_gain + scan_offset"
+        ds["corrected_Ch4"] = corrected
+        return ds
+
+
+def _extend_1d_vertical_to_2d_resize(cls, vertical_variable, reference_var):
+    shape = reference_var.shape[-2:]
+    var_reshaped = np.resize(vertical_variable, shape[::-1])
+    var_reshaped = np.moveaxis(var_reshaped, 0, 1)
+    return xr.Variable(reference_var.dims[-2:], var_reshaped)
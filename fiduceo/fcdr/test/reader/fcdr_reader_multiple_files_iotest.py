@@ -0,0 +1,55 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import xarray as xr
+
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+PRODUCT_HEIGHT = 1300
+NUM_FILES = 200
+
+
+class FCDRReaderMultipleFilesIoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        ds = FCDRWriter.createTemplateEasy("AVHRR", PRODUCT_HEIGHT, lazy=True)
+        for name, value in ds.attrs.items():
+            if value is None:
+                ds.attrs[name] = "FCDRReaderMultipleFilesIoTest"
+        first_path = os.path.join(self.temp_dir, "avhrr_0000.nc")
+        FCDRWriter.write(ds, first_path)
+
+        self.file_paths = [first_path]
+        for index in range(1, NUM_FILES):
+            file_path = os.path.join(self.temp_dir, "avhrr_" + str(index).zfill(4) + ".nc")
+            shutil.copyfile(first_path, file_path)
+            self.file_paths.append(file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_multiple_variables(self):
+        start_time = datetime.datetime.now()
+        for file_path in self.file_paths:
+            xr.open_dataset(file_path, chunks=1000000).close()
+        open_seconds = (datetime.datetime.now() - start_time).total_seconds()
+
+        start_time = datetime.datetime.now()
+        ds = FCDRReader.read_multiple(self.file_paths, variables=["Ch4", "latitude", "longitude"])
+        read_seconds = (datetime.datetime.now() - start_time).total_seconds()
+        try:
+            self.assertEqual(NUM_FILES * PRODUCT_HEIGHT, ds.dims["y"])
+        finally:
+            ds.close()
+
+        print("AVHRR EASY " + str(NUM_FILES) + " files, open: " + str(round(1000.0 * open_seconds / NUM_FILES, 1)) + " ms per file, read_multiple: " +
+              str(round(1000.0 * read_seconds / NUM_FILES, 1)) + " ms per file")
+
+        # each file is opened once, concatenating adds little
+        self.assertLess(read_seconds, 2.0 * open_seconds)
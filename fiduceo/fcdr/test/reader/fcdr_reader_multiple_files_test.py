@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+
+
+class FCDRReaderMultipleFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        self.file_paths = list()
+        self.file_paths.append(self._write_file("FIDUCEO_FCDR_L1C_AVHRR_NOAA18_20160101000000_20160101013000_EASY_v1.0_fv2.0.0.nc", 3, 0.5, "l1b_a.nc, l1b_b.nc", [0, 1, 1]))
+        self.file_paths.append(self._write_file("FIDUCEO_FCDR_L1C_AVHRR_NOAA18_20160101013000_20160101030000_EASY_v1.0_fv2.0.0.nc", 4, 2.0, "l1b_b.nc, l1b_c.nc", [0, 0, 1, 255]))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_multiple_glob(self):
+        ds = FCDRReader.read_multiple(os.path.join(self.temp_dir, "FIDUCEO_FCDR_*.nc"))
+        try:
+            self.assertEqual(7, ds.dims["y"])
+            self.assertEqual(5, ds.dims["x"])
+            self.assertIsInstance(ds["count"].data, da.Array)
+            self.assertEqual(self.file_paths, ds.attrs["fcdr_files"])
+
+            np.testing.assert_array_equal([0, 0, 0, 1, 1, 1, 1], ds["scanline_map_to_fcdr_file"].values)
+            np.testing.assert_array_equal([0, 1, 2, 0, 1, 2, 3], ds["scanline_origl1b"].values)
+            self.assertEqual("l1b_a.nc, l1b_b.nc, l1b_c.nc", ds.attrs["source"])
+            np.testing.assert_array_equal([0, 1, 1, 1, 1, 2], ds["scanline_map_to_origl1bfile"].values[:6])
+            self.assertTrue(np.isnan(ds["scanline_map_to_origl1bfile"].values[6]))
+
+            self.assertEqual(("y",), ds["gain"].dims)
+            self.assertEqual((), ds["offset"].dims)
+        finally:
+            ds.close()
+
+    def test_read_multiple_virtual_variable_across_files(self):
+        ds = FCDRReader.read_multiple(self.file_paths)
+        try:
+            FCDRReader._load_virtual_variable(ds, "radiance")
+
+            self.assertEqual(("y", "x"), ds["radiance"].dims)
+            self.assertAlmostEqual(0.5 * 24 + 1.5, ds["radiance"].values[2, 4], 8)
+            self.assertAlmostEqual(2.0 * 10 + 1.5, ds["radiance"].values[3, 0], 8)
+            self.assertAlmostEqual(2.0 * 29 + 1.5, ds["radiance"].values[6, 4], 8)
+        finally:
+            ds.close()
+
+    def test_read_multiple_no_files(self):
+        try:
+            FCDRReader.read_multiple(os.path.join(self.temp_dir, "*.hdf"))
+            self.fail("IOError expected")
+        except IOError:
+            pass
+
+    def _write_file(self, file_name, height, gain, source, l1b_file_map):
+        ds = xr.Dataset()
+        ds["count"] = xr.Variable(["y", "x"], np.arange(0, height * 5, dtype=np.int16).reshape(height, 5) + 10)
+        ds["gain"] = xr.Variable([], gain)
+        ds["offset"] = xr.Variable([], 1.5)
+        ds["scanline_map_to_origl1bfile"] = xr.Variable(["y"], np.array(l1b_file_map, dtype=np.uint8))
+        ds["scanline_origl1b"] = xr.Variable(["y"], np.arange(0, height, dtype=np.int16))
+        radiance = xr.Variable([], np.float32(1.0))
+        radiance.attrs["virtual"] = "true"
+        radiance.attrs["expression"] = "count * gain + offset"
+        ds["radiance"] = radiance
+        ds.attrs["source"] = source
+
+        file_path = os.path.join(self.temp_dir, file_name)
+        ds.to_netcdf(file_path, encoding={"scanline_map_to_origl1bfile": {"_FillValue": 255}})
+        return file_path
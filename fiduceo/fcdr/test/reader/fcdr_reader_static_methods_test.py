@@ -1,5 +1,6 @@
 import unittest as ut
 
+import dask.array as da
 import numpy as np
 import xarray as xr
 
@@ -25,6 +26,17 @@ class FCDRReaderStaticMethodsTest(ut.TestCase):
         self.ds = ds
         self.dic = R._create_dictionary_of_non_virtuals(ds)
 
+    def test_GetBiggestDimension_identifier_exact(self):
+        # 'ka' is part of 'kappa' but must not be considered as used variable
+        self.dic['kappa'] = xr.Variable(['x'], np.full([5], 16, np.int32))
+        expression = 'kappa * 2'
+        biggest_variable = R._get_biggest_variable(self.dic, expression)
+        self.assertEqual(("x",), biggest_variable.dims)
+
+        expression = 'lsmf * kappa'
+        biggest_variable = R._get_biggest_variable(self.dic, expression)
+        self.assertEqual(("y", "x"), biggest_variable.dims)
+
     def test_GetBiggestDimension(self):
         expression = '(asd)*[lsmf + bottle] - ka'
         biggest_variable = R._get_biggest_variable(self.dic, expression)
@@ -46,15 +58,6 @@ class FCDRReaderStaticMethodsTest(ut.TestCase):
         biggest_variable = R._get_biggest_variable(self.dic, expression)
         self.assertEqual(("x",), biggest_variable.dims)
 
-    def test_GetKeysSorted_LongestFirst(self):
-        dictionary = {"a": 1, "a2": 2, "b": 3, "bb3": 4, "c2": 5}
-        sorted_keys = R._get_keys_sorted__longest_first(dictionary)
-        self.assertEqual(0, sorted_keys.index('bb3'))
-        self.assertTrue(sorted_keys.index('c2') == 1 or sorted_keys.index('c2') == 2)
-        self.assertTrue(sorted_keys.index('a2') == 1 or sorted_keys.index('a2') == 2)
-        self.assertTrue(sorted_keys.index('a') == 3 or sorted_keys.index('a') == 4)
-        self.assertTrue(sorted_keys.index('b') == 3 or sorted_keys.index('b') == 4)
-
     # @todo 3 tb/se complete that test 2018-06-28
     # def test_ExpandOneDimensionalVariables(self):
     #     pass
@@ -107,6 +110,13 @@ class FCDRReaderStaticMethodsTest(ut.TestCase):
         to_extend = R._find_used_tie_point_variables_to_extend(self.dic, expression)
         self.assertEqual(0, len(to_extend))
 
+    def test_find_used_tie_point_variables_ignores_identifier_substrings(self):
+        expression = 'full * u_tie + tie_u'
+        self.dic['u_tie'] = self.ds['full']
+        self.dic['tie_u'] = self.ds['full']
+        to_extend = R._find_used_tie_point_variables_to_extend(self.dic, expression)
+        self.assertEqual(0, len(to_extend))
+
     def test_find_used_tie_point_variables_used(self):
         expression = 'full * tie'
         to_extend = R._find_used_tie_point_variables_to_extend(self.dic, expression)
@@ -116,6 +126,7 @@ class FCDRReaderStaticMethodsTest(ut.TestCase):
     def test_interpolate_to_raster(self):
         interpolated = R._interpolate_to_raster(self.ds["tie"], self.ds["full"])
         self.assertEqual((10, 10), interpolated.shape)
+        self.assertEqual(("y_f", "x_f"), interpolated.dims)
         self.assertAlmostEqual(20.0, interpolated.data[0, 0], 8)
         self.assertAlmostEqual(20.0, interpolated.data[4, 4], 8)
         self.assertAlmostEqual(20.0, interpolated.data[9, 9], 8)
@@ -128,3 +139,55 @@ class FCDRReaderStaticMethodsTest(ut.TestCase):
         self.assertEqual(('y', 'x'), extended.dims)
         expected = np.asarray([[5, 5, 5, 5], [6, 6, 6, 6], [7, 7, 7, 7], ])
         ftu.assert_array_equals_with_index_error_message(self, expected, extended.data)
+
+    def test_extend_vertical_1D_variable_to_2D_is_broadcast_view(self):
+        vertical_variable = xr.Variable('y', np.arange(0, 3, dtype=np.float32))
+        reference_variable = xr.Variable(('y', 'x'), np.zeros((3, 2000), dtype=np.float32))
+        extended = R._extend_1d_vertical_to_2d(vertical_variable, reference_variable)
+        self.assertEqual((3, 2000), extended.shape)
+        self.assertEqual(0, extended.data.strides[1])
+        self.assertFalse(extended.data.flags.writeable)
+        self.assertAlmostEqual(2.0, extended.data[2, 1999], 8)
+
+    def test_get_aligned_chunks_avhrr(self):
+        variable = create_chunked_variable(['y', 'x'], (13198, 409), np.float32, (1280, 409))
+        self.assertEqual((13198, 409), R._get_aligned_chunks(variable, 128 * 1024 * 1024))
+        self.assertEqual((6400, 409), R._get_aligned_chunks(variable, 10 * 1024 * 1024))
+        self.assertEqual((1280, 409), R._get_aligned_chunks(variable, 1024))
+
+    def test_get_aligned_chunks_hirs_bt(self):
+        variable = create_chunked_variable(['channel', 'y', 'x'], (19, 944, 56), np.float32, (10, 512, 56))
+        self.assertEqual((10, 944, 56), R._get_aligned_chunks(variable, 3 * 1024 * 1024))
+        self.assertEqual((19, 944, 56), R._get_aligned_chunks(variable, 128 * 1024 * 1024))
+
+    def test_get_aligned_chunks_mviri(self):
+        variable = create_chunked_variable(['y', 'x'], (5000, 5000), np.float32, (500, 500))
+        self.assertEqual((1500, 5000), R._get_aligned_chunks(variable, 32 * 1024 * 1024))
+
+    def test_get_aligned_chunks_contiguous(self):
+        variable = create_chunked_variable(['y', 'x'], (100, 50), np.float64, None)
+        self.assertEqual((20, 50), R._get_aligned_chunks(variable, 8000))
+        self.assertEqual((), R._get_aligned_chunks(xr.Variable([], 1.0), 8000))
+
+    def test_fits_float32(self):
+        self.assertTrue(R._fits_float32({'dtype': np.int16, 'scale_factor': 0.01, 'add_offset': 0.0}))
+        self.assertTrue(R._fits_float32({'dtype': np.uint8, 'scale_factor': 0.5}))
+        self.assertTrue(R._fits_float32({'dtype': np.dtype('uint32'), 'scale_factor': 0.01}, {'valid_min': 0, 'valid_max': 2 ** 24}))
+        self.assertTrue(R._fits_float32({'dtype': np.int32, 'scale_factor': 0.01}, {'valid_range': np.array([-50000, 50000])}))
+        self.assertFalse(R._fits_float32({'dtype': np.dtype('uint32'), 'scale_factor': 0.01}))
+        self.assertTrue(R._fits_float32({'dtype': np.dtype('uint32'), 'scale_factor': 0.01}, {'valid_max': 2 ** 24}))
+        self.assertFalse(R._fits_float32({'dtype': np.int32, 'scale_factor': 0.01}, {'valid_max': 2 ** 24}))
+        self.assertFalse(R._fits_float32({'dtype': np.int32, 'scale_factor': 0.01}, {'valid_min': -(2 ** 25), 'valid_max': 10}))
+        self.assertFalse(R._fits_float32({'dtype': np.int32, 'scale_factor': 0.01}, {'valid_min': 'TODO', 'valid_max': 10}))
+        self.assertFalse(R._fits_float32({'dtype': np.int16, 'scale_factor': 0.0001, 'add_offset': 1000.0}))
+        self.assertFalse(R._fits_float32({'dtype': np.int64, 'scale_factor': 0.01}))
+        self.assertFalse(R._fits_float32({'dtype': np.float32, 'scale_factor': 0.01}))
+        self.assertFalse(R._fits_float32({'dtype': np.int16}))
+        self.assertFalse(R._fits_float32(dict()))
+
+
+
+def create_chunked_variable(dims, shape, dtype, chunksizes):
+    variable = xr.Variable(dims, da.zeros(shape, dtype=dtype, chunks=shape))
+    variable.encoding["chunksizes"] = chunksizes
+    return variable
@@ -1,5 +1,10 @@
+import os
+import shutil
+import tempfile
 import unittest as ut
 
+import dask
+import dask.array as da
 import numpy as np
 import xarray as xr
 
@@ -126,6 +131,282 @@ class FCDRReaderTest(ut.TestCase):
 
         self.fcdr_reader._load_virtual_variable(ds, 'v_var')
 
+    def test_adding_1_three_dimensional_variable_and_1_vertical_one_dimensional_variable_lazy(self):
+        ds = xr.Dataset()
+        ds['a'] = create_three_dim_variable()
+        ds['b'] = create_vertical_one_dim_variable()
+        v_var = create_virtual_variable("a + b")
+        ds["v_var"] = v_var
+
+        self.fcdr_reader._load_virtual_variable(ds, 'v_var', lazy=True)
+
+        virtual_loaded = ds['v_var']
+        self.assertIsInstance(virtual_loaded.data, da.Array)
+        self.assertEqual(('z', 'y', 'x'), virtual_loaded.dims)
+        self.assertEqual((4, 2, 3), virtual_loaded.shape)
+        self.assertEqual(v_var.attrs, virtual_loaded.attrs)
+
+        expected = np.asarray([[[6, 7, 8], [7.1, 8.1, 9.1]], [[16, 17, 18], [17.1, 18.1, 19.1]], [[26, 27, 28], [27.1, 28.1, 29.1]], [[36, 37, 38], [37.1, 38.1, 39.1]]])
+        tu.assert_array_equals_with_index_error_message(self, expected, virtual_loaded.values)
+
+    def test_multiplying_1_three_dimensional_variable_and_1_scalar_variable_lazy(self):
+        ds = xr.Dataset()
+        ds['a'] = create_three_dim_variable()
+        ds['b'] = create_scalar_variable(2.7)
+        ds["v_var"] = create_virtual_variable("a * b")
+
+        self.fcdr_reader._load_virtual_variable(ds, 'v_var', lazy=True)
+
+        virtual_loaded = ds['v_var']
+        self.assertIsInstance(virtual_loaded.data, da.Array)
+        self.assertEqual((4, 2, 3), virtual_loaded.shape)
+        self.assertAlmostEqual(2.97, virtual_loaded.values[0, 1, 0])
+        self.assertAlmostEqual(89.37, virtual_loaded.values[3, 1, 2])
+
+    def test_lazy_evaluation_uses_on_disk_chunking(self):
+        ds = xr.Dataset()
+        variable = xr.Variable(['y', 'x'], np.arange(0, 120, dtype=np.float64).reshape(10, 12))
+        variable.encoding = dict([('chunksizes', (4, 5))])
+        ds['a'] = variable
+        ds['b'] = xr.Variable(['x'], np.arange(0, 12, dtype=np.float64))
+        ds["v_var"] = create_virtual_variable("a - b")
+
+        self.fcdr_reader._load_virtual_variable(ds, 'v_var', lazy=True)
+
+        virtual_loaded = ds['v_var']
+        self.assertEqual(((4, 4, 2), (5, 5, 2)), virtual_loaded.chunks)
+        self.assertAlmostEqual(0.0, virtual_loaded.values[0, 11])
+        self.assertAlmostEqual(108.0, virtual_loaded.values[9, 0])
+        self.assertAlmostEqual(60.0, virtual_loaded[5:6, 7:9].values[0, 1])
+
+    def test_multiplying_2d_array_and_tiepoint_array_lazy(self):
+        ds = xr.Dataset()
+        ds['a'] = create_two_dim_ones(10)
+        ds['b'] = create_two_dim_tie_points_variable()
+        ds["v_var"] = create_virtual_variable("a * b")
+
+        self.fcdr_reader._load_virtual_variable(ds, 'v_var', lazy=True)
+
+        virtual_loaded = ds['v_var']
+        self.assertIsInstance(virtual_loaded.data, da.Array)
+        self.assertEqual((10, 10), virtual_loaded.shape)
+        self.assertAlmostEqual(1.0, virtual_loaded.values[0, 0])
+
+    def test_evaluate_virtual_variable_selection(self):
+        ds = xr.Dataset()
+        ds['a'] = create_three_dim_variable()
+        ds['b'] = create_vertical_one_dim_variable()
+        ds['c'] = create_scalar_variable(2.0)
+        v_var = create_virtual_variable("(a + b) * c")
+        ds["v_var"] = v_var
+
+        subset = self.fcdr_reader.evaluate_virtual_variable(ds, 'v_var', {'z': slice(1, 3), 'y': 1, 'x': [0, 2]})
+
+        self.assertEqual(('z', 'x'), subset.dims)
+        self.assertEqual(v_var.attrs, subset.attrs)
+        expected = np.asarray([[34.2, 38.2], [54.2, 58.2]])
+        tu.assert_array_equals_with_index_error_message(self, expected, subset.values)
+        self.assertEqual((), ds['v_var'].shape)
+
+    def test_evaluate_virtual_variable_at_points_tiepoint_array(self):
+        ds = xr.Dataset()
+        ds['a'] = xr.Variable(['y', 'x'], np.arange(0, 100, dtype=np.float64).reshape(10, 10))
+        ds['b'] = create_two_dim_tie_points_variable()
+        ds["v_var"] = create_virtual_variable("a * b")
+
+        points = self.fcdr_reader.evaluate_virtual_variable_at_points(ds, 'v_var', [0, 9, 3], [0, 9, 7])
+
+        self.fcdr_reader._load_virtual_variable(ds, 'v_var')
+        self.assertEqual(('points',), points.dims)
+        tu.assert_array_equals_with_index_error_message(self, ds['v_var'].values[[0, 9, 3], [0, 9, 7]], points.values)
+
+    def test_evaluate_virtual_variable_in_box_lazy_dataset(self):
+        ds = xr.Dataset()
+        ds['a'] = xr.Variable(['y', 'x'], da.from_array(np.arange(0, 120, dtype=np.float64).reshape(10, 12), chunks=(4, 5)))
+        ds['b'] = create_two_dim_tie_points_variable()
+        ds['c'] = xr.Variable(['y'], np.arange(0, 10, dtype=np.float64))
+        ds["v_var"] = create_virtual_variable("a * b - c")
+
+        box = self.fcdr_reader.evaluate_virtual_variable_in_box(ds, 'v_var', 2, 5, 9, 11)
+
+        self.fcdr_reader._load_virtual_variable(ds, 'v_var')
+        self.assertEqual(('y', 'x'), box.dims)
+        self.assertEqual((4, 3), box.shape)
+        np.testing.assert_array_almost_equal(ds['v_var'].values[2:6, 9:12], box.values, 12)
+
+    def test_evaluate_virtual_variable_invalid_dimension(self):
+        ds = xr.Dataset()
+        ds['a'] = create_two_dim_variable()
+        ds["v_var"] = create_virtual_variable("a * 2")
+
+        try:
+            self.fcdr_reader.evaluate_virtual_variable(ds, 'v_var', {'z': 0})
+            self.fail("ValueError expected")
+        except ValueError:
+            pass
+
+    def test_read_variables_resolves_dependencies(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, "dependencies.nc")
+            ds = xr.Dataset()
+            ds['a'] = create_three_dim_variable()
+            ds['b'] = create_vertical_one_dim_variable()
+            ds['c'] = create_two_dim_variable()
+            ds['z'] = xr.Variable(['z'], np.arange(0, 4, dtype=np.int16))
+            ds['unused'] = xr.Variable(['t'], np.arange(0, 7, dtype=np.int16))
+            ds["v_var"] = create_virtual_variable("a + b")
+            ds["w_var"] = create_virtual_variable("c * 2")
+            ds.to_netcdf(file_path)
+
+            ds = self.fcdr_reader.read(file_path, variables=["v_var"])
+            try:
+                self.assertEqual(["a", "b", "v_var", "z"], sorted(ds.variables))
+
+                self.fcdr_reader._load_virtual_variable(ds, "v_var")
+                self.assertAlmostEqual(39.1, ds["v_var"].values[3, 1, 2], 8)
+            finally:
+                ds.close()
+
+            ds = self.fcdr_reader.read(file_path, drop_variables_str="c", variables=["c", "w_var", "unused"])
+            try:
+                self.assertEqual(["unused", "w_var"], sorted(ds.variables))
+            finally:
+                ds.close()
+
+            try:
+                self.fcdr_reader.read(file_path, variables=["v_var", "missing"])
+                self.fail("IOError expected")
+            except IOError:
+                pass
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_variables_chunks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, "chunks.nc")
+            ds = xr.Dataset()
+            ds['a'] = xr.Variable(['y', 'x'], np.arange(0, 120, dtype=np.float64).reshape(10, 12))
+            ds['b'] = xr.Variable(['y'], np.arange(0, 10, dtype=np.float64))
+            ds.to_netcdf(file_path)
+
+            first = self.fcdr_reader.read(file_path, variables=["a"], chunks={"y": 4, "z": 2})
+            second = self.fcdr_reader.read(file_path, variables=["a"], chunks={"y": 4})
+            raw = self.fcdr_reader.read(file_path, variables=["a"], chunks={"y": 4}, decode_cf=False)
+            try:
+                self.assertEqual(["a"], list(first.variables))
+                self.assertEqual(((4, 4, 2), (12,)), first['a'].chunks)
+                self.assertEqual(first['a'].data.name, second['a'].data.name)
+                self.assertNotEqual(first['a'].data.name, raw['a'].data.name)
+                self.assertAlmostEqual(119.0, first['a'].values[9, 11], 8)
+            finally:
+                first.close()
+                second.close()
+                raw.close()
+
+            ds = self.fcdr_reader.read(file_path, variables=["b"], chunks=None)
+            try:
+                self.assertNotIsInstance(ds['b'].variable._data, da.Array)
+            finally:
+                ds.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_aligned_chunks(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, "chunked.nc")
+            ds = xr.Dataset()
+            ds['a'] = xr.Variable(['y', 'x'], np.arange(0, 120, dtype=np.float64).reshape(10, 12))
+            ds['b'] = xr.Variable(['y'], np.arange(0, 10, dtype=np.float64))
+            ds['y'] = xr.Variable(['y'], np.arange(0, 10, dtype=np.int32))
+            ds.attrs["template_key"] = "TEST"
+            ds.to_netcdf(file_path, encoding={'a': {'chunksizes': (4, 5)}})
+
+            ds = self.fcdr_reader.read(file_path, chunks="aligned", memory_target=320)
+            try:
+                self.assertEqual(((4, 4, 2), (10, 2)), ds['a'].chunks)
+                self.assertEqual(((10,),), ds['b'].chunks)
+                self.assertNotIsInstance(ds['y'].variable._data, da.Array)
+                self.assertAlmostEqual(119.0, ds['a'].values[9, 11], 8)
+            finally:
+                ds.close()
+
+            FCDRReader.chunk_overrides = {"TEST": {"a": (5, 12)}}
+            ds = self.fcdr_reader.read(file_path, chunks="aligned", memory_target=320)
+            try:
+                self.assertEqual(((5, 5), (12,)), ds['a'].chunks)
+            finally:
+                ds.close()
+        finally:
+            FCDRReader.chunk_overrides = dict()
+            shutil.rmtree(temp_dir)
+
+    def test_read_aligned_chunks_of_decode_options(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, "scaled.nc")
+            ds = xr.Dataset()
+            ds['btemps'] = xr.Variable(['y', 'x'], np.full((3, 4), 234.56))
+            ds.to_netcdf(file_path, encoding={'btemps': {'dtype': np.int16, 'scale_factor': 0.01, 'add_offset': 0.0, '_FillValue': -32768}})
+
+            decoded = self.fcdr_reader.read(file_path, chunks="aligned")
+            raw = self.fcdr_reader.read(file_path, chunks="aligned", decode_cf=False)
+            try:
+                self.assertNotEqual(decoded['btemps'].data.name, raw['btemps'].data.name)
+
+                decoded_values, raw_values = dask.compute(decoded['btemps'].data, raw['btemps'].data)
+                np.testing.assert_allclose(234.56, decoded_values, rtol=1e-6)
+                np.testing.assert_array_equal(23456, raw_values)
+                self.assertEqual(np.int16, raw_values.dtype)
+            finally:
+                decoded.close()
+                raw.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_compact(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, "compact.nc")
+            ds = xr.Dataset()
+            ds['u_L'] = xr.Variable(['channel', 'y', 'x'], np.full((2, 3, 4), 123.45))
+            ds['u_L'].data[1, 2, 3] = np.nan
+            ds['u_L'].attrs['valid_max'] = 1000000
+            ds['btemps'] = xr.Variable(['y', 'x'], np.full((3, 4), 123456.78))
+            ds['angle'] = xr.Variable(['y', 'x'], np.full((3, 4), 12.34))
+            ds['shifted'] = xr.Variable(['y'], np.full(3, 1000000.01))
+            ds['counts'] = xr.Variable(['y'], np.arange(0, 3, dtype=np.int32))
+            encoding = {'u_L': {'dtype': np.uint32, 'scale_factor': 0.01, 'add_offset': 0.0, '_FillValue': 4294967295},
+                        'btemps': {'dtype': np.int32, 'scale_factor': 0.01, 'add_offset': 0.0},
+                        'angle': {'dtype': np.int16, 'scale_factor': 0.01, 'add_offset': 0.0, '_FillValue': -32768},
+                        'shifted': {'dtype': np.int16, 'scale_factor': 0.01, 'add_offset': 1000000.0}}
+            ds.to_netcdf(file_path, encoding=encoding)
+
+            ds = self.fcdr_reader.read(file_path, compact=True)
+            try:
+                self.assertEqual(np.float32, ds['u_L'].dtype)
+                self.assertEqual(96, ds['u_L'].nbytes)
+                self.assertAlmostEqual(123.45, ds['u_L'].values[0, 0, 0], 4)
+                self.assertTrue(np.isnan(ds['u_L'].values[1, 2, 3]))
+                self.assertEqual(0.01, ds['u_L'].encoding['scale_factor'])
+
+                # beyond the float32 mantissa without valid range
+                self.assertEqual(np.float64, ds['btemps'].dtype)
+                self.assertAlmostEqual(123456.78, ds['btemps'].values[1, 1], 8)
+
+                self.assertEqual(np.float32, ds['angle'].dtype)
+                self.assertAlmostEqual(12.34, ds['angle'].values[2, 3], 5)
+
+                self.assertEqual(np.float64, ds['shifted'].dtype)
+                self.assertAlmostEqual(1000000.01, ds['shifted'].values[0], 8)
+                self.assertEqual(np.int32, ds['counts'].dtype)
+            finally:
+                ds.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_prepare_virtual_variables(self):
         ds = xr.Dataset()
         ds['a'] = create_three_dim_variable()
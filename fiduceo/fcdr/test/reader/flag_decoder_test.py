@@ -0,0 +1,158 @@
+import unittest
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.flag_decoder import FlagDecoder, FlagDefinition
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+
+class FlagDefinitionTest(unittest.TestCase):
+
+    def test_from_attributes_string(self):
+        definition = FlagDefinition.from_attributes({"flag_masks": "1,2,4", "flag_meanings": "do_not_use bad_time bad_navigation"})
+
+        self.assertEqual(("do_not_use", "bad_time", "bad_navigation"), definition.meanings)
+        self.assertEqual({"do_not_use": 1, "bad_time": 2, "bad_navigation": 4}, definition.masks)
+        self.assertIsNone(definition.values)
+
+    def test_from_attributes_numeric(self):
+        definition = FlagDefinition.from_attributes({"flag_masks": np.array([16384, -32768], dtype=np.int16), "flag_meanings": "a b"})
+
+        self.assertEqual({"a": 16384, "b": 0xFFFFFFFFFFFF8000}, definition.masks)
+
+    def test_from_attributes_is_cached(self):
+        attrs = {"flag_values": "0, 1, 2, 3", "flag_meanings": "earth_view space_view cold_bb_view main_bb_view"}
+
+        self.assertIs(FlagDefinition.from_attributes(attrs), FlagDefinition.from_attributes(dict(attrs)))
+
+    def test_is_single_bit(self):
+        definition = FlagDefinition.from_attributes({"flag_masks": "1, 6, 0", "flag_meanings": "a b c"})
+
+        self.assertTrue(definition.is_single_bit("a"))
+        self.assertFalse(definition.is_single_bit("b"))
+        self.assertFalse(definition.is_single_bit("c"))
+
+    def test_invalid_attributes(self):
+        with self.assertRaises(ValueError):
+            FlagDefinition.from_attributes({"flag_masks": "1, 2"})
+
+        with self.assertRaises(ValueError):
+            FlagDefinition.from_attributes({"flag_masks": "1, 2", "flag_meanings": "a b c"})
+
+        with self.assertRaises(ValueError):
+            FlagDefinition.from_attributes({"flag_meanings": "a b"})
+
+
+class FlagDecoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ds = FCDRWriter.createTemplateEasy("AVHRR", 6)
+
+        quality = self.ds["quality_pixel_bitmask"].data
+        quality[0, 0] = 1
+        quality[0, 1] = 8
+        quality[0, 2] = 9
+        quality[1, 0] = 128
+
+        self.ds["quality_scanline_bitmask"].data[:] = [0, 2, 0, 0, 1, 3]
+        self.ds["quality_channel_bitmask"].data[2, :] = [0, 1, 0, 0, 0, 2]
+
+    def test_get_meanings(self):
+        self.assertEqual(("bad_channel", "some_pixels_not_detected_2sigma"), FlagDecoder.get_meanings(self.ds, "quality_channel_bitmask"))
+
+    def test_get_mask(self):
+        mask = FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", "invalid_geoloc")
+
+        self.assertEqual(("y", "x"), mask.dims)
+        self.assertEqual(np.bool_, mask.dtype)
+        self.assertEqual(2, int(mask.sum()))
+        self.assertTrue(mask.values[0, 1])
+        self.assertTrue(mask.values[0, 2])
+
+    def test_get_mask_or_and(self):
+        any_set = FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", ["invalid", "invalid_geoloc"])
+        all_set = FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", ["invalid", "invalid_geoloc"], combine="and")
+
+        np.testing.assert_array_equal([True, True, True, False], any_set.values[0, :4])
+        np.testing.assert_array_equal([False, False, True, False], all_set.values[0, :4])
+        self.assertEqual(3, int(any_set.sum()))
+        self.assertEqual(1, int(all_set.sum()))
+
+    def test_get_mask_is_lazy_on_dask(self):
+        ds = self.ds.chunk({"y": 2, "x": 100})
+
+        mask = FlagDecoder.get_mask(ds, "quality_pixel_bitmask", ["invalid", "incomplete_channel_data"])
+
+        self.assertIsInstance(mask.data, da.Array)
+        self.assertEqual(((2, 2, 2), (100, 100, 100, 100, 9)), mask.data.chunks)
+        np.testing.assert_array_equal(FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", ["invalid", "incomplete_channel_data"]).values, mask.values)
+
+    def test_get_mask_unknown_meaning(self):
+        with self.assertRaises(ValueError):
+            FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", "cloudy")
+
+        with self.assertRaises(ValueError):
+            FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", "invalid", combine="xor")
+
+    def test_get_mask_highest_bit_of_signed_variable(self):
+        ds = FCDRWriter.createTemplateEasy("AMSUB", 4)
+        ds["qualind"].data[:] = np.array([0, 2147483648, 33554432, 2147483648 + 33554432], dtype=np.uint32).view(np.int32)
+
+        not_use_scan = FlagDecoder.get_mask(ds, "qualind", "not_use_scan")
+        both = FlagDecoder.get_mask(ds, "qualind", ["not_use_scan", "instr_status_changed"], combine="and")
+
+        np.testing.assert_array_equal([False, True, False, True], not_use_scan.values)
+        np.testing.assert_array_equal([False, False, False, True], both.values)
+
+    def test_get_mask_flag_values(self):
+        ds = xr.Dataset()
+        ds["scantype"] = xr.Variable(["y"], np.array([0, 1, 3, 0], dtype=np.int8), {"flag_values": "0, 1, 2, 3",
+                                                                                     "flag_meanings": "earth_view space_view cold_bb_view main_bb_view"})
+
+        calibration_views = FlagDecoder.get_mask(ds, "scantype", ["space_view", "main_bb_view"])
+
+        np.testing.assert_array_equal([False, True, True, False], calibration_views.values)
+
+    def test_get_mask_multi_bit_masks_and_values(self):
+        ds = xr.Dataset()
+        ds["flags"] = xr.Variable(["y"], np.array([0, 1, 2, 3, 4], dtype=np.uint8), {"flag_masks": "3, 3, 4", "flag_values": "1, 3, 4",
+                                                                                    "flag_meanings": "low high other"})
+
+        np.testing.assert_array_equal([False, True, False, True, False], FlagDecoder.get_mask(ds, "flags", ["low", "high"]).values)
+        np.testing.assert_array_equal([False, False, False, False, False], FlagDecoder.get_mask(ds, "flags", ["low", "high"], combine="and").values)
+
+    def test_get_mask_of_decoded_variable_with_fill_value(self):
+        ds = xr.Dataset()
+        ds["flags"] = xr.Variable(["y"], np.array([np.nan, 1.0, 2.0]), {"flag_masks": "1, 2", "flag_meanings": "a b"})
+
+        np.testing.assert_array_equal([False, True, True], FlagDecoder.get_mask(ds, "flags", ["a", "b"]).values)
+
+    def test_get_combined_mask_broadcasts_scanline_and_channel_flags(self):
+        ds = self.ds.chunk({"y": 3})
+
+        mask = FlagDecoder.get_combined_mask(ds, {"quality_pixel_bitmask": "invalid", "quality_scanline_bitmask": "bad_time",
+                                                  "quality_channel_bitmask": "bad_channel"}, like="Ch1")
+
+        self.assertEqual(("y", "x"), ds["Ch1"].dims)
+        self.assertEqual(("y", "x", "channel"), mask.dims)
+        self.assertIsInstance(mask.data, da.Array)
+
+        values = mask.values
+        self.assertTrue(values[0, 0, 0])
+        self.assertFalse(values[0, 1, 0])
+        self.assertTrue(np.all(values[1]))
+        self.assertTrue(np.all(values[5]))
+        np.testing.assert_array_equal([False, True, False, False, False, False], values[2, 100])
+        self.assertFalse(np.any(values[3]))
+
+    def test_combine_and_like(self):
+        scanline_mask = FlagDecoder.get_mask(self.ds, "quality_scanline_bitmask", "do_not_use")
+        pixel_mask = FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", "use_with_caution")
+
+        mask = FlagDecoder.combine([scanline_mask, pixel_mask], combine="and", like=self.ds["Ch4"])
+
+        self.assertEqual(self.ds["Ch4"].dims, mask.dims)
+        self.assertEqual(self.ds["Ch4"].shape, mask.shape)
+        self.assertFalse(np.any(mask.values))
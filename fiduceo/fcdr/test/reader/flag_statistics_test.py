@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.flag_decoder import FlagDecoder
+from fiduceo.fcdr.reader.flag_statistics import FlagStatistics, FlagCounts
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+
+class FlagStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(4711)
+        self.ds = FCDRWriter.createTemplateEasy("AVHRR", 50)
+        self.ds["quality_pixel_bitmask"].data[:] = random.randint(0, 256, size=(50, 409))
+        self.ds["quality_channel_bitmask"].data[:] = random.randint(0, 4, size=(50, 6))
+
+    def test_count(self):
+        result = FlagStatistics.count(self.ds, "quality_pixel_bitmask", block_size=7)
+
+        self.assertEqual("quality_pixel_bitmask", result.var_name)
+        self.assertEqual(FlagDecoder.get_meanings(self.ds, "quality_pixel_bitmask"), result.meanings)
+        self.assertEqual((), result.dims)
+        self.assertEqual(50 * 409, result.num_pixels)
+        for index, meaning in enumerate(result.meanings):
+            self.assertEqual(int(FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", meaning).sum()), result.counts[index])
+
+    def test_count_per_scanline(self):
+        result = FlagStatistics.count(self.ds, "quality_pixel_bitmask", keep_dims=["y"], block_size=16)
+
+        self.assertEqual((8, 50), result.counts.shape)
+        np.testing.assert_array_equal(np.full(50, 409), result.num_pixels)
+        for index, meaning in enumerate(result.meanings):
+            expected = FlagDecoder.get_mask(self.ds, "quality_pixel_bitmask", meaning).sum(dim="x").values
+            np.testing.assert_array_equal(expected, result.counts[index])
+
+    def test_count_per_channel(self):
+        result = FlagStatistics.count(self.ds, "quality_channel_bitmask", keep_dims=["channel"], block_size=16)
+
+        self.assertEqual(("channel",), result.dims)
+        self.assertEqual((2, 6), result.counts.shape)
+        expected = FlagDecoder.get_mask(self.ds, "quality_channel_bitmask", "bad_channel").sum(dim="y").values
+        np.testing.assert_array_equal(expected, result.counts[0])
+
+    def test_count_multi_byte_signed(self):
+        ds = FCDRWriter.createTemplateEasy("AMSUB", 1000)
+        random = np.random.RandomState(17)
+        ds["qualind"].data[:] = random.randint(0, 2 ** 32, size=1000, dtype=np.uint64).astype(np.uint32).view(np.int32)
+        ds["scanqual"].data[:] = random.randint(0, 2 ** 24, size=1000)
+
+        for var_name in ["qualind", "scanqual"]:
+            result = FlagStatistics.count(ds, var_name, block_size=300)
+            for index, meaning in enumerate(result.meanings):
+                self.assertEqual(int(FlagDecoder.get_mask(ds, var_name, meaning).sum()), result.counts[index], meaning)
+
+    def test_count_flag_values_and_multi_bit_masks(self):
+        ds = xr.Dataset()
+        ds["scantype"] = xr.Variable(["y"], np.array([0, 1, 3, 0, 2, 3, 3], dtype=np.int8), {"flag_values": "0, 1, 2, 3",
+                                                                                              "flag_meanings": "earth_view space_view cold_bb_view main_bb_view"})
+        ds["flags"] = xr.Variable(["y"], np.array([0, 257, 2, 768, 256, 1, 3], dtype=np.uint16), {"flag_masks": "768, 768, 1", "flag_values": "256, 768, 1",
+                                                                                                   "flag_meanings": "low high first"})
+
+        np.testing.assert_array_equal([2, 1, 1, 3], FlagStatistics.count(ds, "scantype").counts)
+        np.testing.assert_array_equal([2, 1, 3], FlagStatistics.count(ds, "flags").counts)
+
+    def test_count_decoded_with_fill_value(self):
+        ds = xr.Dataset()
+        ds["flags"] = xr.Variable(["y", "x"], np.array([[np.nan, 1.0], [3.0, 2.0]]), {"flag_masks": "1, 2", "flag_meanings": "a b"})
+
+        result = FlagStatistics.count(ds, "flags", keep_dims=["x"])
+
+        np.testing.assert_array_equal([[1, 1], [1, 1]], result.counts)
+
+    def test_count_chunked(self):
+        chunked = self.ds.chunk({"y": 10})
+
+        result = FlagStatistics.count(chunked, "quality_pixel_bitmask", keep_dims=["y"], block_size=10)
+
+        np.testing.assert_array_equal(FlagStatistics.count(self.ds, "quality_pixel_bitmask", keep_dims=["y"]).counts, result.counts)
+
+    def test_count_invalid_dimension(self):
+        with self.assertRaises(ValueError):
+            FlagStatistics.count(self.ds, "quality_pixel_bitmask", keep_dims=["channel"])
+
+    def test_merge(self):
+        first = FlagStatistics.count(self.ds.isel(y=slice(0, 20)), "quality_pixel_bitmask")
+        second = FlagStatistics.count(self.ds.isel(y=slice(20, 50)), "quality_pixel_bitmask")
+
+        merged = FlagCounts.merge_all([first, second])
+
+        total = FlagStatistics.count(self.ds, "quality_pixel_bitmask")
+        np.testing.assert_array_equal(total.counts, merged.counts)
+        self.assertEqual(total.num_pixels, merged.num_pixels)
+        self.assertEqual(2, merged.num_files)
+        np.testing.assert_array_equal(total.counts, (first + second).counts)
+        self.assertIsNone(FlagCounts.merge_all([]))
+
+    def test_merge_differing_dimensions(self):
+        per_scanline = FlagStatistics.count(self.ds.isel(y=slice(0, 20)), "quality_pixel_bitmask", keep_dims=["y"])
+        other = FlagStatistics.count(self.ds.isel(y=slice(20, 50)), "quality_pixel_bitmask", keep_dims=["y"])
+
+        with self.assertRaises(ValueError):
+            per_scanline.merge(other)
+
+    def test_to_data_array(self):
+        data_array = FlagStatistics.count(self.ds, "quality_channel_bitmask", keep_dims=["channel"]).to_data_array()
+
+        self.assertEqual(("flag_meaning", "channel"), data_array.dims)
+        self.assertEqual(["bad_channel", "some_pixels_not_detected_2sigma"], list(data_array["flag_meaning"].values))
+        self.assertEqual(1, data_array.attrs["num_files"])
+
+    def test_count_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, "flags.nc")
+            flags = self.ds[["quality_pixel_bitmask", "quality_scanline_bitmask"]]
+            flags.attrs = dict()
+            flags.to_netcdf(file_path)
+
+            result = FlagStatistics.count_file(file_path, "quality_pixel_bitmask")
+
+            np.testing.assert_array_equal(FlagStatistics.count(self.ds, "quality_pixel_bitmask").counts, result.counts)
+        finally:
+            shutil.rmtree(temp_dir)
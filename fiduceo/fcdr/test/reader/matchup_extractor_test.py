@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.matchup_extractor import MatchupExtractor
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+
+class MatchupExtractorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        # two consecutive granules, 20 lines each, 1 degree per line and pixel
+        orbit_dir = os.path.join(self.temp_dir, "2016", "01")
+        os.makedirs(orbit_dir)
+        self.first_path = self._write_granule(orbit_dir, datetime(2016, 1, 1, 0, 0), datetime(2016, 1, 1, 1, 0), 0.0, 10)
+        self.second_path = self._write_granule(orbit_dir, datetime(2016, 1, 1, 1, 0), datetime(2016, 1, 1, 2, 0), 20.0, 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_extract(self):
+        lat = [5.0, 25.2, 5.0, 0.0]
+        lon = [3.0, 6.9, 3.0, 0.0]
+        time = np.array(["2016-01-01T00:30:00", "2016-01-01T01:30:00", "2016-01-02T00:00:00", "2016-01-01T00:10:00"], dtype="datetime64[s]")
+
+        with MatchupExtractor(self.temp_dir, window_size=3, max_workers=1) as extractor:
+            ds = extractor.extract(lat, lon, time, ["count", "radiance", "quality"])
+
+        self.assertEqual(4, ds.dims["matchup"])
+        self.assertEqual(3, ds.dims["window_y"])
+        self.assertEqual(3, ds.dims["window_x"])
+        self.assertEqual([self.first_path, self.second_path], ds.attrs["matchup_files"])
+        np.testing.assert_array_equal([0, 1, -1, 0], ds["matchup_file"].values)
+        np.testing.assert_array_equal([5, 5, -1, 0], ds["matchup_y"].values)
+        np.testing.assert_array_equal([3, 7, -1, 0], ds["matchup_x"].values)
+        self.assertTrue(np.isnan(ds["matchup_distance"].values[2]))
+
+        self.assertEqual(("matchup", "window_y", "window_x"), ds["count"].dims)
+        np.testing.assert_array_equal([[52, 53, 54], [62, 63, 64], [72, 73, 74]], ds["count"].values[0])
+        np.testing.assert_array_equal([[1046, 1047, 1048], [1056, 1057, 1058], [1066, 1067, 1068]], ds["count"].values[1])
+        self.assertTrue(np.all(np.isnan(ds["count"].values[2])))
+        np.testing.assert_array_equal([[np.nan, np.nan, np.nan], [np.nan, 10, 11], [np.nan, 20, 21]], ds["count"].values[3])
+
+        self.assertAlmostEqual(2.0 * 63 + 0.5, ds["radiance"].values[0, 1, 1], 8)
+        self.assertAlmostEqual(2.0 * 1057 + 0.5, ds["radiance"].values[1, 1, 1], 8)
+        self.assertTrue(np.all(np.isnan(ds["radiance"].values[2])))
+        self.assertTrue(np.isnan(ds["radiance"].values[3, 0, 0]))
+
+        self.assertEqual(("matchup", "window_y"), ds["quality"].dims)
+        np.testing.assert_array_equal([4, 5, 6], ds["quality"].values[0])
+        np.testing.assert_array_equal([np.nan, 0, 1], ds["quality"].values[3])
+
+    def test_extract_max_distance(self):
+        with MatchupExtractor(self.temp_dir, window_size=1, max_distance=50.0, max_workers=1) as extractor:
+            ds = extractor.extract([5.0, 5.0], [3.0, 40.0], np.array(["2016-01-01T00:30:00"] * 2, dtype="datetime64[s]"), ["count"])
+
+        np.testing.assert_array_equal([0, -1], ds["matchup_file"].values)
+        np.testing.assert_array_equal([[[63]], [[np.nan]]], ds["count"].values)
+
+    def test_extract_within_pixel_size(self):
+        lon = [3.0, 9.8, 11.0, 40.0]
+        with MatchupExtractor(self.temp_dir, window_size=1, max_workers=1) as extractor:
+            ds = extractor.extract([5.0] * 4, lon, np.array(["2016-01-01T00:30:00"] * 4, dtype="datetime64[s]"), ["count"])
+
+        np.testing.assert_array_equal([0, 0, -1, -1], ds["matchup_file"].values)
+        np.testing.assert_array_equal([[[63]], [[69]], [[np.nan]], [[np.nan]]], ds["count"].values)
+
+    def test_extract_tries_next_granule(self):
+        orbit_dir = os.path.join(self.temp_dir, "2016", "01")
+        overlap_path = self._write_granule(orbit_dir, datetime(2016, 1, 1, 0, 30), datetime(2016, 1, 1, 1, 30), 40.0, 5000)
+
+        lat = [5.0, 45.0, 45.0]
+        lon = [3.0, 2.0, 2.0]
+        time = np.array(["2016-01-01T00:45:00", "2016-01-01T00:45:00", "2016-01-01T00:15:00"], dtype="datetime64[s]")
+        with MatchupExtractor(self.temp_dir, window_size=1, max_workers=1) as extractor:
+            ds = extractor.extract(lat, lon, time, ["count"])
+
+        self.assertEqual([self.first_path, overlap_path], ds.attrs["matchup_files"])
+        np.testing.assert_array_equal([0, 1, -1], ds["matchup_file"].values)
+        np.testing.assert_array_equal([5, 5, -1], ds["matchup_y"].values)
+        np.testing.assert_array_equal([[[63]], [[5052]], [[np.nan]]], ds["count"].values)
+
+    def test_extract_in_process_pool(self):
+        lat = [5.0, 25.0]
+        lon = [3.0, 7.0]
+        time = [datetime(2016, 1, 1, 0, 30), datetime(2016, 1, 1, 1, 30)]
+
+        with MatchupExtractor(self.temp_dir, window_size=3, max_workers=2) as extractor:
+            ds = extractor.extract(lat, lon, time, ["radiance"])
+
+        self.assertAlmostEqual(2.0 * 63 + 0.5, ds["radiance"].values[0, 1, 1], 8)
+        self.assertAlmostEqual(2.0 * 1057 + 0.5, ds["radiance"].values[1, 1, 1], 8)
+
+    def test_extract_filters_sensor(self):
+        with MatchupExtractor(self.temp_dir, window_size=1, sensor="HIRS3", max_workers=1) as extractor:
+            ds = extractor.extract([5.0], [3.0], [datetime(2016, 1, 1, 0, 30)], ["count"])
+
+        np.testing.assert_array_equal([-1], ds["matchup_file"].values)
+        self.assertEqual([], ds.attrs["matchup_files"])
+
+    def test_invalid_window_size(self):
+        with self.assertRaises(ValueError):
+            MatchupExtractor(self.temp_dir, window_size=4)
+
+    def _write_granule(self, directory, start, end, first_lat, first_count):
+        height = 20
+        width = 10
+        ds = xr.Dataset()
+        ds["latitude"] = xr.Variable(["y", "x"], np.repeat(first_lat + np.arange(height, dtype=np.float32), width).reshape(height, width))
+        ds["longitude"] = xr.Variable(["y", "x"], np.tile(np.arange(width, dtype=np.float32), (height, 1)))
+        ds["count"] = xr.Variable(["y", "x"], (first_count + np.arange(height * width)).reshape(height, width).astype(np.int16))
+        ds["count"].encoding["_FillValue"] = -1
+        ds["quality"] = xr.Variable(["y"], np.arange(height, dtype=np.float32))
+        ds["gain"] = xr.Variable([], 2.0)
+        ds["offset"] = xr.Variable([], 0.5)
+        radiance = xr.Variable([], np.float32(1.0))
+        radiance.attrs["virtual"] = "true"
+        radiance.attrs["expression"] = "count * gain + offset"
+        ds["radiance"] = radiance
+
+        path = os.path.join(directory, FCDRWriter.create_file_name_FCDR_easy("AVHRR", "NOAA18", start, end, "1.0"))
+        ds.to_netcdf(path)
+        return path
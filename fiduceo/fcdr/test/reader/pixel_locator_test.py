@@ -0,0 +1,209 @@
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+from fiduceo.fcdr.reader.pixel_locator import PixelLocator, PixelLocatorCache, EARTH_RADIUS_KM
+
+
+class PixelLocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        # descending swath crossing the date line, 1 degree steps along track, 0.5 degree steps across
+        self.latitude = np.repeat(np.linspace(20.0, -19.0, 40), 21).reshape(40, 21)
+        self.longitude = np.tile(np.linspace(175.0, 185.0, 21), (40, 1))
+        self.longitude[self.longitude > 180.0] -= 360.0
+
+    def test_find_nearest(self):
+        locator = PixelLocator(self.latitude, self.longitude)
+
+        rows, columns, distances = locator.find_nearest([20.0, 0.1, -19.0], [175.0, -179.9, -175.2])
+
+        np.testing.assert_array_equal([0, 20, 39], rows)
+        np.testing.assert_array_equal([0, 10, 20], columns)
+        self.assertAlmostEqual(0.0, distances[0], 6)
+        self.assertAlmostEqual(self._great_circle(0.1, -179.9, 0.0, 180.0), distances[1], 6)
+
+    def test_find_nearest_equals_brute_force(self):
+        random = np.random.RandomState(7)
+        lat = random.uniform(-19.0, 20.0, 500)
+        lon = random.uniform(175.0, 185.0, 500)
+        lon[lon > 180.0] -= 360.0
+
+        locator = PixelLocator(self.latitude, self.longitude)
+        rows, columns, distances = locator.find_nearest(lat, lon)
+
+        for i in range(len(lat)):
+            brute_force = self._great_circle(lat[i], lon[i], self.latitude, self.longitude)
+            self.assertAlmostEqual(np.min(brute_force), distances[i], 6)
+            self.assertAlmostEqual(np.min(brute_force), brute_force[rows[i], columns[i]], 6)
+
+    def test_find_nearest_keeps_shape(self):
+        locator = PixelLocator(self.latitude, self.longitude)
+
+        rows, columns, distances = locator.find_nearest(np.full((2, 3), 5.0), np.full((2, 3), 176.0))
+
+        self.assertEqual((2, 3), rows.shape)
+        self.assertEqual((2, 3), columns.shape)
+        self.assertEqual((2, 3), distances.shape)
+        np.testing.assert_array_equal(15, rows)
+        np.testing.assert_array_equal(2, columns)
+
+    def test_find_nearest_max_distance(self):
+        locator = PixelLocator(self.latitude, self.longitude)
+
+        rows, columns, distances = locator.find_nearest([0.0, 0.0], [180.1, 170.0], max_distance=50.0)
+
+        np.testing.assert_array_equal([20, -1], rows)
+        np.testing.assert_array_equal([10, -1], columns)
+        self.assertTrue(np.isinf(distances[1]))
+
+    def test_find_nearest_skips_invalid_pixels(self):
+        self.latitude[20, 10] = np.nan
+
+        locator = PixelLocator(self.latitude, self.longitude)
+        rows, columns, distances = locator.find_nearest([0.0], [180.0])
+
+        self.assertEqual(20, rows[0])
+        self.assertNotEqual(10, columns[0])
+        self.assertAlmostEqual(self._great_circle(0.0, 180.0, 0.0, 179.5), distances[0], 6)
+
+    def test_get_pixel_size(self):
+        locator = PixelLocator(self.latitude, self.longitude)
+
+        sizes = locator.get_pixel_size([20, 0, 39], [10, 0, 20])
+
+        np.testing.assert_allclose(self._great_circle(0.0, 180.0, 1.0, 180.0), sizes, rtol=1e-6)
+
+    def test_get_pixel_size_skips_invalid_neighbours(self):
+        self.latitude[19, 10] = np.nan
+        self.latitude[21, 10] = np.nan
+
+        locator = PixelLocator(self.latitude, self.longitude)
+        sizes = locator.get_pixel_size([20, 22], [10, 10])
+
+        self.assertAlmostEqual(self._great_circle(0.0, 180.0, 0.0, 179.5), sizes[0], 6)
+        self.assertAlmostEqual(self._great_circle(-2.0, 180.0, -1.0, 180.0), sizes[1], 6)
+
+    def test_find_nearest_close_to_pole(self):
+        latitude = np.repeat(np.linspace(89.0, 85.0, 5), 36).reshape(5, 36)
+        longitude = np.tile(np.arange(-180.0, 180.0, 10.0), (5, 1))
+
+        locator = PixelLocator(latitude, longitude)
+        rows, columns, _ = locator.find_nearest([89.9, 85.1], [-5.0 + 180.0, 171.0])
+
+        self.assertEqual(0, rows[0])
+        self.assertEqual(4, rows[1])
+        self.assertEqual(35, columns[1])
+
+    def test_find_within(self):
+        locator = PixelLocator(self.latitude, self.longitude)
+
+        result = locator.find_within([0.0, 50.0], [180.0, 0.0], 60.0)
+
+        self.assertEqual(2, len(result))
+        rows, columns = result[0]
+        brute_force = self._great_circle(0.0, 180.0, self.latitude, self.longitude)
+        expected_rows, expected_columns = np.nonzero(brute_force <= 60.0)
+        np.testing.assert_array_equal(expected_rows, rows)
+        np.testing.assert_array_equal(expected_columns, columns)
+        self.assertEqual(0, len(result[1][0]))
+
+    def test_regular_grid(self):
+        locator = PixelLocator(np.linspace(-89.5, 89.5, 180), np.linspace(-179.5, 179.5, 360))
+
+        rows, columns, _ = locator.find_nearest([-89.6, 10.2], [179.9, -179.8])
+
+        np.testing.assert_array_equal([0, 100], rows)
+        self.assertIn(columns[0], (0, 359))
+        np.testing.assert_array_equal(0, columns[1])
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            PixelLocator(np.zeros((3, 4)), np.zeros((4, 3)))
+
+    def test_cache_is_least_recently_used(self):
+        cache = PixelLocatorCache(max_size=2)
+        datasets = [self._create_dataset() for _ in range(3)]
+
+        first = cache.get(datasets[0])
+        cache.get(datasets[1])
+        self.assertIs(first, cache.get(datasets[0]))
+
+        cache.get(datasets[2])
+        self.assertEqual(2, len(cache))
+        self.assertIs(first, cache.get(datasets[0]))
+
+    def test_cache_drops_collected_datasets(self):
+        cache = PixelLocatorCache()
+        dataset = self._create_dataset()
+        cache.get(dataset)
+        self.assertEqual(1, len(cache))
+
+        del dataset
+        gc.collect()
+        self.assertEqual(0, len(cache))
+
+    def test_cache_reuses_locator_of_unchanged_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "swath.nc")
+            self._create_dataset().to_netcdf(path)
+
+            cache = PixelLocatorCache()
+            with xr.open_dataset(path) as first_ds:
+                first = cache.get(first_ds)
+            with xr.open_dataset(path) as second_ds:
+                self.assertIs(first, cache.get(second_ds))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_cache_separates_selections_of_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "swath.nc")
+            self._create_dataset().to_netcdf(path)
+
+            cache = PixelLocatorCache()
+            for chunks in [None, 10]:
+                with xr.open_dataset(path, chunks=chunks) as ds:
+                    subset_locator = cache.get(ds.isel(y=slice(30, 40)))
+                    full_locator = cache.get(ds)
+                    self.assertIsNot(subset_locator, full_locator)
+                    self.assertIs(full_locator, cache.get(ds))
+
+                    rows, _, _ = full_locator.find_nearest([self.latitude[35, 0]], [self.longitude[35, 0]])
+                    self.assertEqual(35, rows[0])
+                    rows, _, _ = subset_locator.find_nearest([self.latitude[35, 0]], [self.longitude[35, 0]])
+                    self.assertEqual(5, rows[0])
+
+                    concatenated = xr.concat([ds, ds.isel(y=slice(0, 10))], dim="y")
+                    self.assertEqual((50, 21), cache.get(concatenated).shape)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_reader_get_pixel_locator(self):
+        dataset = self._create_dataset()
+
+        locator = FCDRReader.get_pixel_locator(dataset)
+
+        self.assertIs(locator, FCDRReader.get_pixel_locator(dataset))
+        rows, columns, _ = locator.find_nearest([0.0], [180.0])
+        self.assertEqual((20, 10), (rows[0], columns[0]))
+
+    def _create_dataset(self):
+        ds = xr.Dataset()
+        ds["latitude"] = xr.Variable(["y", "x"], self.latitude)
+        ds["longitude"] = xr.Variable(["y", "x"], self.longitude)
+        return ds
+
+    @staticmethod
+    def _great_circle(lat_0, lon_0, lat_1, lon_1):
+        lat_0, lon_0, lat_1, lon_1 = np.radians(lat_0), np.radians(lon_0), np.radians(lat_1), np.radians(lon_1)
+        h = np.sin((lat_1 - lat_0) / 2.0) ** 2 + np.cos(lat_0) * np.cos(lat_1) * np.sin((lon_1 - lon_0) / 2.0) ** 2
+        return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
@@ -0,0 +1,92 @@
+import unittest
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.tie_point_interpolator import TiePointInterpolator
+from fiduceo.fcdr.writer.templates.mviri import MVIRI
+
+
+class TiePointInterpolatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.interpolator = TiePointInterpolator()
+
+        tie_points = np.outer(np.arange(0, 5, dtype=np.float32), np.ones(6)) * 10.0 + np.arange(0, 6, dtype=np.float32)
+        self.tie_variable = xr.Variable(["y_tie", "x_tie"], tie_points)
+        self.tie_variable.attrs["tie_points"] = "true"
+
+        self.dataset = xr.Dataset()
+        self.dataset["tie"] = self.tie_variable
+
+    def test_interpolate_corners(self):
+        raster = self.interpolator.interpolate(self.tie_variable, (41, 51))
+
+        self.assertEqual((41, 51), raster.shape)
+        self.assertEqual(np.float64, raster.dtype)
+        self.assertAlmostEqual(0.0, raster[0, 0], 8)
+        self.assertAlmostEqual(5.0, raster[0, 50], 8)
+        self.assertAlmostEqual(40.0, raster[40, 0], 8)
+        self.assertAlmostEqual(45.0, raster[40, 50], 8)
+
+    def test_interpolate_float32(self):
+        raster = self.interpolator.interpolate(self.tie_variable, (41, 51), dtype=np.float32)
+
+        self.assertEqual(np.float32, raster.dtype)
+        self.assertAlmostEqual(45.0, raster[40, 50], 5)
+
+    def test_interpolate_window_equals_full_raster(self):
+        raster = self.interpolator.interpolate(self.tie_variable, (41, 51))
+
+        window = self.interpolator.interpolate_window(self.tie_variable, (41, 51), slice(7, 19), slice(33, 51))
+
+        self.assertEqual((12, 18), window.shape)
+        np.testing.assert_array_almost_equal(raster[7:19, 33:51], window, 10)
+
+    def test_interpolate_points_equals_full_raster(self):
+        raster = self.interpolator.interpolate(self.tie_variable, (41, 51))
+
+        points = self.interpolator.interpolate_points(self.tie_variable, (41, 51), np.array([0, 13, 40, 27]), np.array([50, 7, 0, 27]))
+
+        np.testing.assert_array_almost_equal(raster[[0, 13, 40, 27], [50, 7, 0, 27]], points, 10)
+
+    def test_interpolate_lazy_equals_full_raster(self):
+        raster = self.interpolator.interpolate(self.tie_variable, (41, 51))
+
+        lazy_raster = self.interpolator.interpolate_lazy(self.tie_variable, (41, 51), (10, 20))
+
+        self.assertIsInstance(lazy_raster, da.Array)
+        self.assertEqual(((10, 10, 10, 10, 1), (20, 20, 11)), lazy_raster.chunks)
+        np.testing.assert_array_almost_equal(raster, lazy_raster.compute(), 10)
+
+    def test_get_raster_is_memoized(self):
+        raster = self.interpolator.get_raster(self.dataset, "tie", (41, 51))
+
+        self.assertIs(raster, self.interpolator.get_raster(self.dataset, "tie", (41, 51)))
+        self.assertFalse(raster.flags.writeable)
+        self.assertIsNot(raster, self.interpolator.get_raster(self.dataset, "tie", (41, 51), dtype=np.float32))
+        self.assertEqual((21, 26), self.interpolator.get_raster(self.dataset, "tie", (21, 26)).shape)
+
+    def test_invalidate(self):
+        raster = self.interpolator.get_raster(self.dataset, "tie", (41, 51))
+        self.dataset["tie"].data[0, 0] = 100.0
+
+        self.assertAlmostEqual(0.0, self.interpolator.get_raster(self.dataset, "tie", (41, 51))[0, 0], 8)
+
+        self.interpolator.invalidate(self.dataset, "tie")
+
+        updated = self.interpolator.get_raster(self.dataset, "tie", (41, 51))
+        self.assertIsNot(raster, updated)
+        self.assertAlmostEqual(100.0, updated[0, 0], 8)
+
+    def test_interpolate_mviri_angle_variable(self):
+        variable = MVIRI._create_angle_variable_int(0.005493248, standard_name="solar_zenith_angle")
+        variable.data[:, :] = np.linspace(10.0, 60.0, 500, dtype=np.float32)[:, np.newaxis]
+
+        window = self.interpolator.interpolate_window(variable, (5000, 5000), slice(4990, 5000), slice(0, 5), dtype=np.float32)
+
+        self.assertEqual((10, 5), window.shape)
+        self.assertEqual(np.float32, window.dtype)
+        self.assertAlmostEqual(60.0, window[9, 0], 4)
+        self.assertTrue(window[0, 0] < window[9, 0])
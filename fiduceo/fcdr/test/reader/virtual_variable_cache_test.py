@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.reader.fcdr_reader import FCDRReader
+from fiduceo.fcdr.reader.virtual_variable_cache import VirtualVariableCache
+
+
+class VirtualVariableCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+        self.file_path = os.path.join(self.temp_dir, "source.nc")
+        self.cache = VirtualVariableCache(self.cache_dir, max_size=1024 * 1024)
+
+    def tearDown(self):
+        FCDRReader.disable_cache()
+        shutil.rmtree(self.temp_dir)
+
+    def test_put_and_get(self):
+        ds = self._write_and_read()
+        key = self.cache.create_key(ds, "virtual:v_var:a * 2")
+
+        self.assertIsNone(self.cache.get(key))
+
+        stored = self.cache.put(key, np.arange(0, 12, dtype=np.float32).reshape(3, 4))
+        self.assertIsInstance(stored, np.memmap)
+
+        cached = self.cache.get(key)
+        self.assertIsInstance(cached, np.memmap)
+        self.assertFalse(cached.flags.writeable)
+        self.assertEqual(np.float32, cached.dtype)
+        self.assertEqual(11.0, cached[2, 3])
+        ds.close()
+
+    def test_create_key_depends_on_description_and_file(self):
+        ds = self._write_and_read()
+        key = self.cache.create_key(ds, "virtual:v_var:a * 2")
+        ds.close()
+
+        self.assertEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 2"))
+        self.assertNotEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 3"))
+
+        time.sleep(0.01)
+        ds = self._write_and_read(size=5)
+        self.assertNotEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 2"))
+        ds.close()
+
+    def test_create_key_dataset_in_memory(self):
+        ds = xr.Dataset()
+        ds["a"] = xr.Variable(["y"], np.ones(3))
+
+        self.assertIsNone(self.cache.create_key(ds, "virtual:v_var:a * 2"))
+
+    def test_evicts_least_recently_used(self):
+        cache = VirtualVariableCache(self.cache_dir, max_size=2500)
+        data = np.zeros(100, dtype=np.float64)
+
+        cache.put("first", data)
+        time.sleep(0.01)
+        cache.put("second", data)
+        time.sleep(0.01)
+        cache.get("first")
+        time.sleep(0.01)
+        cache.put("third", data)
+
+        self.assertIsNotNone(cache.get("first"))
+        self.assertIsNone(cache.get("second"))
+        self.assertIsNotNone(cache.get("third"))
+        self.assertTrue(cache.get_size() <= 2500)
+
+        cache.clear()
+        self.assertEqual(0, cache.get_size())
+
+    def test_reader_reopens_cached_virtual_variable(self):
+        FCDRReader.enable_cache(self.cache_dir)
+        ds = self._write_and_read()
+
+        FCDRReader._load_virtual_variable(ds, "v_var")
+
+        expected = np.arange(0, 12, dtype=np.float64).reshape(3, 4) * 2.0 + np.array([1.0, 2.0, 3.0])[:, np.newaxis]
+        np.testing.assert_array_almost_equal(expected, ds["v_var"].values, 12)
+        ds.close()
+
+        ds = FCDRReader.read(self.file_path)
+        key = FCDRReader._create_virtual_variable_key(ds, "v_var")
+        self.assertIsInstance(FCDRReader.virtual_variable_cache.get(key), np.memmap)
+
+        FCDRReader.load_virtual_variables(ds, ["v_var"])
+        np.testing.assert_array_almost_equal(expected, ds["v_var"].values, 12)
+
+        ds = FCDRReader.read(self.file_path)
+        FCDRReader._load_virtual_variable(ds, "v_var", lazy=True)
+        self.assertEqual((3, 4), ds["v_var"].shape)
+        np.testing.assert_array_almost_equal(expected, ds["v_var"].values, 12)
+        ds.close()
+
+    def test_reader_does_not_share_entries_of_selections(self):
+        FCDRReader.enable_cache(self.cache_dir)
+        ds = self._write_and_read(height=100)
+
+        first = ds.isel(y=slice(0, 10))
+        FCDRReader._load_virtual_variable(first, "v_var")
+        second = ds.isel(y=slice(50, 60))
+        FCDRReader._load_virtual_variable(second, "v_var")
+        reversed_ds = ds.isel(y=slice(9, None, -1)).isel(y=slice(0, 10))
+        FCDRReader._load_virtual_variable(reversed_ds, "v_var")
+
+        expected = np.arange(0, 400, dtype=np.float64).reshape(100, 4) * 2.0 + np.arange(1, 101, dtype=np.float64)[:, np.newaxis]
+        np.testing.assert_array_almost_equal(expected[0:10], first["v_var"].values, 12)
+        np.testing.assert_array_almost_equal(expected[50:60], second["v_var"].values, 12)
+        np.testing.assert_array_almost_equal(expected[9::-1], reversed_ds["v_var"].values, 12)
+        ds.close()
+
+    def test_reader_does_not_share_entries_of_decode_options(self):
+        FCDRReader.enable_cache(self.cache_dir)
+        ds = xr.Dataset()
+        ds["a"] = xr.Variable(["y", "x"], np.full((3, 4), 1.2345678, dtype=np.float64), {"valid_min": 0, "valid_max": 16000000})
+        ds["a"].encoding = dict(dtype=np.int32, scale_factor=1e-7)
+        v_var = xr.Variable([], np.float32(1.0))
+        v_var.attrs["virtual"] = "true"
+        v_var.attrs["expression"] = "a * 1"
+        ds["v_var"] = v_var
+        ds.to_netcdf(self.file_path)
+
+        full = FCDRReader.read(self.file_path)
+        compact = FCDRReader.read(self.file_path, compact=True)
+        raw = FCDRReader.read(self.file_path, decode_cf=False)
+        self.assertNotEqual(FCDRReader._create_virtual_variable_key(full, "v_var"), FCDRReader._create_virtual_variable_key(raw, "v_var"))
+
+        FCDRReader._load_virtual_variable(full, "v_var")
+        FCDRReader._load_virtual_variable(compact, "v_var")
+        FCDRReader._load_virtual_variable(raw, "v_var")
+
+        self.assertEqual(np.float64, full["v_var"].dtype)
+        self.assertEqual(np.float32, compact["v_var"].dtype)
+        self.assertAlmostEqual(1.2345678, full["v_var"].values[1, 2], 12)
+        self.assertEqual(12345678, raw["v_var"].values[1, 2])
+        for dataset in [full, compact, raw]:
+            dataset.close()
+
+    def test_create_key_of_unchunked_operands(self):
+        ds = FCDRReader.read(self._write(), chunks=None)
+        key = self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]})
+        ds.close()
+
+        # operands not backed by dask are identified by content
+        ds = FCDRReader.read(self.file_path, chunks=None)
+        self.assertEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]}))
+        ds["a"].values[0, 0] = 12.0
+        self.assertNotEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]}))
+        ds.close()
+
+    def test_create_key_depends_on_operand_attribute_values(self):
+        ds = FCDRReader.read(self._write(), decode_cf=False)
+        key = self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]})
+
+        ds["a"].attrs["scale_factor"] = 0.01
+        scaled_key = self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]})
+        self.assertNotEqual(key, scaled_key)
+
+        ds["a"].attrs["scale_factor"] = 0.02
+        self.assertNotEqual(scaled_key, self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]}))
+        ds.close()
+
+    def test_create_key_reuses_operand_tokens(self):
+        ds = FCDRReader.read(self._write(), chunks=None)
+        operand_tokens = dict()
+        key = self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]}, operand_tokens)
+        self.assertEqual(["a"], list(operand_tokens))
+
+        # within one evaluation the operand is not hashed again
+        ds["a"].values[0, 0] = 12.0
+        self.assertEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]}, operand_tokens))
+        self.assertNotEqual(key, self.cache.create_key(ds, "virtual:v_var:a * 2", {"a": ds.variables["a"]}))
+        ds.close()
+
+    def _write_and_read(self, size=4, height=3):
+        return FCDRReader.read(self._write(size, height))
+
+    def _write(self, size=4, height=3):
+        ds = xr.Dataset()
+        ds["a"] = xr.Variable(["y", "x"], np.arange(0, height * size, dtype=np.float64).reshape(height, size))
+        ds["b"] = xr.Variable(["y"], np.arange(1, height + 1, dtype=np.float64))
+        v_var = xr.Variable([], np.float32(1.0))
+        v_var.attrs["virtual"] = "true"
+        v_var.attrs["expression"] = "a * 2 + b"
+        ds["v_var"] = v_var
+        ds.to_netcdf(self.file_path)
+
+        return self.file_path
@@ -0,0 +1,101 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.common.writer.compression_profile import PROFILES, FLAGS, CompressionProfile
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+
+PRODUCT_HEIGHTS = {"AVHRR": 2560, "AMSUB": 2300, "HIRS3": 960, "SSMT2": 2000, "MVIRI": 5000}
+MEGA_BYTE = 1024.0 * 1024.0
+
+
+class CompressionProfileIoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_write_read_profiles(self):
+        for sensor in sorted(PRODUCT_HEIGHTS.keys()):
+            dataset = self.create_dataset(sensor, PRODUCT_HEIGHTS[sensor])
+            data_size = sum(dataset[var_name].nbytes for var_name in dataset.data_vars) / MEGA_BYTE
+
+            file_sizes = dict()
+            for profile in [None] + sorted(PROFILES.keys()):
+                write_seconds, read_seconds, file_size = self._measure(dataset, sensor, profile)
+                file_sizes[profile] = file_size
+
+                print(sensor + " EASY " + str(PRODUCT_HEIGHTS[sensor]) + " lines, profile " + str(profile) + ": write " + self._throughput(data_size, write_seconds) +
+                      ", read " + self._throughput(data_size, read_seconds) + ", file size " + str(round(file_size / MEGA_BYTE, 2)) + " MB")
+
+            self.assertLessEqual(file_sizes["archive"], file_sizes["fast"])
+
+    def _measure(self, dataset, sensor, profile):
+        target_path = os.path.join(self.temp_dir, sensor + "_" + str(profile) + ".nc")
+
+        start_time = datetime.datetime.now()
+        FCDRWriter.write(dataset, target_path, compression_profile=profile)
+        write_seconds = (datetime.datetime.now() - start_time).total_seconds()
+
+        start_time = datetime.datetime.now()
+        target_data = xr.open_dataset(target_path)
+        try:
+            target_data.load()
+        finally:
+            target_data.close()
+        read_seconds = (datetime.datetime.now() - start_time).total_seconds()
+
+        return write_seconds, read_seconds, os.path.getsize(target_path)
+
+    @staticmethod
+    def _throughput(data_size, seconds):
+        return str(round(data_size / max(seconds, 1e-6), 1)) + " MB/s"
+
+    @staticmethod
+    def create_dataset(sensor, height):
+        """
+        Create an EASY FCDR with smooth, noisy data in the valid range of each variable along "y".
+        """
+        random = np.random.RandomState(4711)
+        dataset = FCDRWriter.createTemplateEasy(sensor, height)
+        # the flag mapper is registered by sensor name, the AMSUB template key is "AMSUB_MHS"
+        dataset.attrs["template_key"] = sensor
+        for name, value in dataset.attrs.items():
+            if value is None:
+                dataset.attrs[name] = "CompressionProfileIoTest"
+
+        for var_name in dataset.data_vars:
+            variable = dataset[var_name]
+            if "y" not in variable.dims or CompressionProfile.get_variable_class(var_name, variable) == FLAGS or variable.dtype.kind not in "iuf":
+                continue
+
+            minimum, maximum = CompressionProfileIoTest._get_value_range(variable)
+            gradient = np.linspace(0.0, 1.0, num=variable.size).reshape(variable.shape)
+            values = minimum + (maximum - minimum) * (0.25 + 0.4 * gradient + 0.1 * random.rand(*variable.shape))
+            variable.data[...] = values.astype(variable.dtype)
+
+        return dataset
+
+    @staticmethod
+    def _get_value_range(variable):
+        encoding = variable.encoding
+        if variable.dtype.kind != "f":
+            info = np.iinfo(variable.dtype)
+            return 0, min(info.max, 1000)
+
+        if encoding.get("dtype") is None:
+            return 0.0, 1.0
+
+        info = np.iinfo(encoding["dtype"])
+        packed_min = max(info.min, float(variable.attrs.get("valid_min", info.min)))
+        packed_max = min(info.max, float(variable.attrs.get("valid_max", info.max)))
+        scale_factor = encoding.get("scale_factor", 1.0)
+        add_offset = encoding.get("add_offset", 0.0)
+        return packed_min * scale_factor + add_offset, packed_max * scale_factor + add_offset
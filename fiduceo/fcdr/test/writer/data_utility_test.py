@@ -1,5 +1,6 @@
 import unittest
 
+import dask.array as da
 import numpy as np
 from xarray import Variable
 
@@ -284,4 +285,40 @@ class DataUtilityTest(unittest.TestCase):
             DataUtility._get_min_max(variable)
             self.fail("ValueError expected")
         except ValueError:
-            pass
\ No newline at end of file
+            pass
+
+    def test_is_fill_only_scaled(self):
+        variable = Variable(["y", "x"], DefaultData.create_default_array(3, 2, np.float32, fill_value=np.NaN))
+        variable.encoding = dict([('dtype', np.int16), ('_FillValue', -32767), ('scale_factor', 0.01)])
+
+        self.assertTrue(DataUtility.is_fill_only(variable))
+
+        variable.data[1, 2] = 0.5
+        self.assertFalse(DataUtility.is_fill_only(variable))
+
+    def test_is_fill_only_unscaled(self):
+        float_variable = Variable(["y"], DefaultData.create_default_vector(4, np.float64, fill_value=np.NaN))
+        self.assertTrue(DataUtility.is_fill_only(float_variable))
+
+        default_fill_variable = Variable(["y"], DefaultData.create_default_vector(4, np.int16))
+        self.assertTrue(DataUtility.is_fill_only(default_fill_variable))
+
+        int_variable = Variable(["y"], DefaultData.create_default_vector(4, np.int16, fill_value=-1), {"_FillValue": -1})
+        self.assertTrue(DataUtility.is_fill_only(int_variable))
+
+        # flags are zero by default, but the NetCDF fill value is 255
+        flag_variable = Variable(["y"], DefaultData.create_default_vector(4, np.uint8, fill_value=0))
+        self.assertFalse(DataUtility.is_fill_only(flag_variable))
+
+    def test_is_fill_only_lazy(self):
+        with DefaultData.lazy_allocation():
+            variable = Variable(["y", "x"], DefaultData.create_default_array(300, 200, np.float32, fill_value=np.NaN))
+        variable.encoding = dict([('dtype', np.int16), ('_FillValue', -32767), ('scale_factor', 0.01)])
+
+        self.assertTrue(DataUtility.is_fill_only(variable))
+        self.assertFalse(variable.data.is_materialized())
+
+    def test_is_fill_only_dask(self):
+        variable = Variable(["y"], da.full(4, np.NaN, dtype=np.float32, chunks=2))
+
+        self.assertFalse(DataUtility.is_fill_only(variable))
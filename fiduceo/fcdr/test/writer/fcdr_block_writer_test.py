@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import netCDF4
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.writer.fcdr_block_writer import FCDRBlockWriter
+from fiduceo.fcdr.writer.global_flags import GlobalFlags as gf
+
+HEIGHT = 40
+
+
+class FCDRBlockWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.target_path = os.path.join(self.temp_dir, "block_written.nc")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_write_blocks(self):
+        random = np.random.RandomState(7)
+        latitude = random.uniform(-80, 80, size=(HEIGHT, 409)).astype(np.float32)
+        ch4 = random.uniform(200, 300, size=(HEIGHT, 409)).astype(np.float32)
+
+        with FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT) as writer:
+            self._set_global_attributes(writer)
+            for start in range(0, HEIGHT, 16):
+                num_lines = min(16, HEIGHT - start)
+                block = writer.create_block(num_lines)
+                self.assertEqual(num_lines, block.dims["y"])
+                self.assertNotIn("SRF_weights", block.variables)
+
+                block["latitude"].data[:] = latitude[start:start + num_lines]
+                block["Ch4"].data[:] = ch4[start:start + num_lines]
+                block["Time"].data[:] = np.arange(start, start + num_lines) * 0.5
+                if start == 16:
+                    block["data_quality_bitmask"].data[0, 2] = 1  # bad_geolocation_timing_err
+                writer.write_block(block)
+
+            srf = xr.Dataset()
+            srf["SRF_weights"] = xr.Variable(["channel", "n_frequencies"], np.full((6, 5902), 0.5, dtype=np.float32))
+            writer.write_variables(srf)
+
+        target_data = xr.open_dataset(self.target_path)
+        try:
+            self.assertEqual(HEIGHT, target_data.dims["y"])
+            self.assertEqual("FCDRBlockWriterTest", target_data.attrs["institution"])
+            np.testing.assert_array_equal(np.arange(HEIGHT), target_data["y"].values)
+            np.testing.assert_allclose(latitude, target_data["latitude"].values, atol=0.0014)
+            np.testing.assert_allclose(ch4, target_data["Ch4"].values, atol=0.0051)
+            np.testing.assert_allclose(np.arange(HEIGHT) * 0.5, target_data["Time"].values)
+            self.assertEqual((HEIGHT, 409), target_data["latitude"].encoding["chunksizes"])
+            self.assertEqual(np.int16, target_data["latitude"].encoding["dtype"])
+            self.assertTrue(target_data["latitude"].encoding["zlib"])
+
+            quality = target_data["quality_pixel_bitmask"].values
+            self.assertEqual(gf.USE_WITH_CAUTION, quality[16, 2])
+            self.assertEqual(1, np.count_nonzero(quality))
+
+            np.testing.assert_allclose(0.5, target_data["SRF_weights"].values, atol=0.00002)
+            self.assertTrue(np.all(np.isnan(target_data["Ch1"].values)))
+        finally:
+            target_data.close()
+
+    def test_write_block_at_start_line(self):
+        with FCDRBlockWriter(self.target_path, "AMSUB", 20, compression_level=0) as writer:
+            self._set_global_attributes(writer)
+            block = writer.create_block(5)
+            block["btemps"].data[:] = 250.0
+            writer.write_block(block, start=10)
+            self.assertEqual(15, writer.next_line)
+
+            with self.assertRaises(ValueError):
+                writer.write_block(block, start=18)
+
+        target_data = xr.open_dataset(self.target_path)
+        try:
+            btemps = target_data["btemps"].values
+            self.assertTrue(np.all(np.isnan(btemps[:, :10])))
+            np.testing.assert_allclose(250.0, btemps[:, 10:15])
+            self.assertTrue(np.all(np.isnan(btemps[:, 15:])))
+        finally:
+            target_data.close()
+
+    def test_write_blocks_compression_profile(self):
+        u_btemps = np.random.RandomState(3).uniform(0.1, 2.0, size=(5, 20, 90)).astype(np.float32)
+
+        with FCDRBlockWriter(self.target_path, "AMSUB", 20, compression_profile="fast") as writer:
+            self._set_global_attributes(writer)
+            block = writer.create_block(20)
+            block["u_independent_btemps"].data[:] = u_btemps
+            writer.write_block(block)
+
+        nc = netCDF4.Dataset(self.target_path)
+        try:
+            self.assertEqual(1, nc.variables["btemps"].filters()["complevel"])
+            self.assertFalse(nc.variables["quality_pixel_bitmask"].filters()["shuffle"])
+            self.assertNotIn("least_significant_digit", nc.variables["u_independent_btemps"].ncattrs())
+        finally:
+            nc.close()
+
+        target_data = xr.open_dataset(self.target_path)
+        try:
+            np.testing.assert_array_equal(u_btemps, target_data["u_independent_btemps"].values)
+        finally:
+            target_data.close()
+
+    def test_write_block_scaling_overflow(self):
+        with FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT) as writer:
+            self._set_global_attributes(writer)
+            block = writer.create_block(10)
+            block["satellite_zenith_angle"].data[2, 3] = 95.0
+
+            with self.assertRaises(ValueError):
+                writer.write_block(block)
+
+    def test_write_variables_along_y(self):
+        with FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT) as writer:
+            self._set_global_attributes(writer)
+            block = writer.create_block(10)
+
+            with self.assertRaises(ValueError):
+                writer.write_variables(block[["Ch1"]])
+
+    def test_close_without_global_attributes(self):
+        writer = FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT)
+
+        with self.assertRaises(ValueError):
+            writer.close()
+
+        self.assertTrue(os.path.isfile(self.target_path))
+
+    def test_file_exists(self):
+        with open(self.target_path, "w") as file:
+            file.write("existing")
+
+        with self.assertRaises(IOError):
+            FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT)
+
+        writer = FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT, overwrite=True)
+        self._set_global_attributes(writer)
+        writer.close()
+
+    def test_invalid_fcdr_type(self):
+        with self.assertRaises(ValueError):
+            FCDRBlockWriter(self.target_path, "AVHRR", HEIGHT, fcdr_type="MEDIUM")
+
+    @staticmethod
+    def _set_global_attributes(writer):
+        for name, value in writer.attrs.items():
+            if value is None:
+                writer.attrs[name] = "FCDRBlockWriterTest"
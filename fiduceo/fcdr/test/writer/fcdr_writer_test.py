@@ -1,7 +1,16 @@
 import datetime
+import os
+import shutil
+import tempfile
 import unittest
 
+import netCDF4
+import numpy as np
+import xarray as xr
+
 from fiduceo.common.test.assertions import Assertions
+from fiduceo.common.writer.compression_profile import CompressionProfile
+from fiduceo.common.writer.fill_value_array import FillValueArray
 from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
 
 
@@ -603,6 +612,183 @@ class FCDRWriterTest(unittest.TestCase):
         self.assertIsNotNone(ds.variables["latitude_ir_wv"])
         self.assertIsNotNone(ds.variables["longitude_ir_wv"])
 
+    def testCreateTemplateFull_MVIRI_lazy(self):
+        ds = FCDRWriter.createTemplateFull('MVIRI', 5000, lazy=True)
+
+        eager = FCDRWriter.createTemplateFull('MVIRI', 5000)
+        self.assertEqual(list(eager.variables), list(ds.variables))
+        self.assertEqual(dict(eager.dims), dict(ds.dims))
+
+        count = ds["count_vis"].data
+        self.assertIsInstance(count, FillValueArray)
+        self.assertFalse(count.is_materialized())
+        self.assertEqual(eager["count_vis"].dtype, count.dtype)
+        self.assertEqual(eager["count_vis"].data[12, 13], count[12, 13])
+
+        ds["count_vis"].data[12, 13] = 0
+        self.assertTrue(count.is_materialized())
+        self.assertFalse(ds["u_latitude"].data.is_materialized())
+
+    def testCreateTemplateEasy_lazy_keeps_writes(self):
+        ds = FCDRWriter.createTemplateEasy('AVHRR', 1300, lazy=True)
+        eager = FCDRWriter.createTemplateEasy('AVHRR', 1300)
+
+        for dataset in [ds, eager]:
+            dataset["Ch4"].values[3, 4] = 280.0
+            np.copyto(dataset["Ch5"].data, np.full(dataset["Ch5"].shape, 270.0, dtype=dataset["Ch5"].dtype))
+
+        self.assertTrue(ds["Ch4"].data.is_materialized())
+        self.assertTrue(ds["Ch5"].data.is_materialized())
+        self.assertFalse(ds["Ch1"].data.is_materialized())
+        np.testing.assert_array_equal(eager["Ch4"].values, ds["Ch4"].values)
+        np.testing.assert_array_equal(eager["Ch5"].values, ds["Ch5"].values)
+        self.assertEqual(280.0, ds["Ch4"].values[3, 4])
+
+    def testWrite_lazy_template(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            ds = FCDRWriter.createTemplateEasy('AVHRR', 1300, lazy=True)
+            for name, value in ds.attrs.items():
+                if value is None:
+                    ds.attrs[name] = "FCDRWriterTest"
+            ds["Ch4"].data[3, :] = 280.0
+            ds["data_quality_bitmask"].data[5, 6] = 1
+
+            target_path = os.path.join(temp_dir, "lazy.nc")
+            FCDRWriter.write(ds, target_path)
+
+            self.assertFalse(ds["Ch1"].data.is_materialized())
+            self.assertIsInstance(ds["Ch1"].data, FillValueArray)
+
+            target_data = xr.open_dataset(target_path)
+            try:
+                np.testing.assert_allclose(np.full(409, 280.0), target_data["Ch4"].values[3])
+                self.assertTrue(np.all(np.isnan(target_data["Ch4"].values[4])))
+                self.assertTrue(np.all(np.isnan(target_data["Ch1"].values)))
+                self.assertEqual(2, target_data["quality_pixel_bitmask"].values[5, 6])
+                self.assertEqual(1, np.count_nonzero(target_data["quality_pixel_bitmask"].values))
+                self.assertEqual((1280, 409), target_data["Ch1"].encoding["chunksizes"])
+                self.assertEqual(np.int16, target_data["Ch1"].encoding["dtype"])
+                self.assertEqual(ds["Ch1"].attrs["long_name"], target_data["Ch1"].attrs["long_name"])
+            finally:
+                target_data.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testWrite_skips_fill_only_variables(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            ds = FCDRWriter.createTemplateEasy('AMSUB', 10)
+            # the flag mapper is registered by sensor name
+            ds.attrs["template_key"] = "AMSUB"
+            for name, value in ds.attrs.items():
+                if value is None:
+                    ds.attrs[name] = "FCDRWriterTest"
+            ds["btemps"].data[2, 3, 4] = 270.0
+
+            target_path = os.path.join(temp_dir, "fill_only.nc")
+            FCDRWriter.write(ds, target_path)
+
+            nc = netCDF4.Dataset(target_path)
+            try:
+                # no data written, the whole variable reads as _FillValue
+                u_common = nc.variables["u_structured_btemps"]
+                self.assertEqual(list(ds["u_structured_btemps"].dims), list(u_common.dimensions))
+                self.assertTrue(np.all(u_common[:].mask))
+                self.assertEqual(1, np.count_nonzero(~nc.variables["btemps"][:].mask))
+            finally:
+                nc.close()
+
+            target_data = xr.open_dataset(target_path)
+            try:
+                self.assertEqual(set(ds.data_vars), set(target_data.variables) - set(target_data.dims))
+                self.assertTrue(np.all(np.isnan(target_data["u_structured_btemps"].values)))
+                self.assertAlmostEqual(270.0, target_data["btemps"].values[2, 3, 4], 2)
+                self.assertEqual(0, target_data["quality_pixel_bitmask"].values.max())
+            finally:
+                target_data.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testWrite_skipped_variables_keep_structure(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            ds = FCDRWriter.createTemplateEasy('AMSUB', 10)
+            # the flag mapper is registered by sensor name
+            ds.attrs["template_key"] = "AMSUB"
+            for name, value in ds.attrs.items():
+                if value is None:
+                    ds.attrs[name] = "FCDRWriterTest"
+            ds["btemps"].data[2, 3, 4] = 270.0
+            ds["u_structured_btemps"].encoding["fletcher32"] = True
+
+            skipped_path = os.path.join(temp_dir, "skipped.nc")
+            FCDRWriter.write(ds, skipped_path, compression_profile="archive")
+
+            written_path = os.path.join(temp_dir, "written.nc")
+            ds.to_netcdf(written_path, format='netCDF4', engine='netcdf4', encoding=CompressionProfile.create_encoding(ds, profile="archive"))
+
+            skipped = netCDF4.Dataset(skipped_path)
+            written = netCDF4.Dataset(written_path)
+            try:
+                self.assertEqual(list(written.dimensions), list(skipped.dimensions))
+                self.assertEqual(list(written.variables), list(skipped.variables))
+                self.assertEqual(written.ncattrs(), skipped.ncattrs())
+                for name, written_variable in written.variables.items():
+                    skipped_variable = skipped.variables[name]
+                    self.assertEqual(written_variable.ncattrs(), skipped_variable.ncattrs(), name)
+                    for attr_name in written_variable.ncattrs():
+                        np.testing.assert_array_equal(written_variable.getncattr(attr_name), skipped_variable.getncattr(attr_name))
+                    self.assertEqual(written_variable.dtype, skipped_variable.dtype, name)
+                    self.assertEqual(written_variable.filters(), skipped_variable.filters(), name)
+                    self.assertEqual(written_variable.chunking(), skipped_variable.chunking(), name)
+
+                self.assertTrue(skipped.variables["u_structured_btemps"].filters()["fletcher32"])
+                self.assertTrue(np.all(skipped.variables["u_structured_btemps"][:].mask))
+            finally:
+                skipped.close()
+                written.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def testWrite_compression_profile(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            ds = FCDRWriter.createTemplateEasy('AMSUB', 10)
+            # the flag mapper is registered by sensor name
+            ds.attrs["template_key"] = "AMSUB"
+            for name, value in ds.attrs.items():
+                if value is None:
+                    ds.attrs[name] = "FCDRWriterTest"
+            random = np.random.RandomState(11)
+            u_btemps = random.uniform(0.1, 2.0, size=ds["u_independent_btemps"].shape).astype(np.float32)
+            ds["u_independent_btemps"].data[:] = u_btemps
+            ds["btemps"].data[:] = 250.0
+
+            target_path = os.path.join(temp_dir, "archive.nc")
+            FCDRWriter.write(ds, target_path, compression_profile="archive")
+
+            nc = netCDF4.Dataset(target_path)
+            try:
+                u_independent = nc.variables["u_independent_btemps"]
+                self.assertEqual(dict(zlib=True, szip=False, zstd=False, bzip2=False, blosc=False, shuffle=True, complevel=9, fletcher32=False),
+                                 u_independent.filters())
+                self.assertEqual(2, u_independent.least_significant_digit)
+                self.assertEqual(9, nc.variables["btemps"].filters()["complevel"])
+                self.assertEqual(np.int32, nc.variables["btemps"].dtype)
+            finally:
+                nc.close()
+
+            target_data = xr.open_dataset(target_path)
+            try:
+                np.testing.assert_allclose(u_btemps, target_data["u_independent_btemps"].values, atol=0.005)
+                self.assertFalse(np.array_equal(u_btemps, target_data["u_independent_btemps"].values))
+                np.testing.assert_allclose(250.0, target_data["btemps"].values)
+            finally:
+                target_data.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_create_file_name_FCDR_easy(self):
         start = datetime.datetime(2015, 8, 23, 14, 24, 52)
         end = datetime.datetime(2015, 8, 23, 15, 25, 53)
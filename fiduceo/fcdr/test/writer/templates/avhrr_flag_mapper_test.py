@@ -1,5 +1,6 @@
 import unittest
 
+import dask.array as da
 import numpy as np
 import xarray as xr
 from fiduceo.fcdr.writer.global_flags import GlobalFlags as gf
@@ -62,3 +63,16 @@ class AVHRR_FlagMapperTest(unittest.TestCase):
         self.assertEqual(0, self.dataset["quality_pixel_bitmask"].data[1, 0])
         self.assertEqual(10, self.dataset["quality_pixel_bitmask"].data[2, 0]) # invalid_input & invalid_geoloc
         self.assertEqual(8, self.dataset["quality_pixel_bitmask"].data[0, 1])  # invalid_input
+
+    def test_map_global_flags_chunked(self):
+        self.dataset["quality_pixel_bitmask"].data[2, 0] = gf.INVALID_GEOLOC
+        self.dataset["data_quality_bitmask"].data[2, 0] = 2
+        self.dataset["data_quality_bitmask"].data[0, 1] = 3
+
+        dataset = self.dataset.chunk({"y": 2})
+        self.mapper.map_global_flags(dataset)
+
+        global_flag_data = dataset["quality_pixel_bitmask"].data
+        self.assertIsInstance(global_flag_data, da.Array)
+        self.assertEqual(np.uint8, global_flag_data.dtype)
+        np.testing.assert_array_equal([[0, 2, 0], [0, 0, 0], [10, 0, 0]], global_flag_data.compute())
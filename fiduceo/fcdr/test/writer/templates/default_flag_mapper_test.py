@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from fiduceo.fcdr.writer.global_flags import GlobalFlags as gf
+from fiduceo.fcdr.writer.templates.avhrr_flag_mapper import AVHRR_FlagMapper
+from fiduceo.fcdr.writer.templates.default_flag_mapper import DefaultFlagMapper
+from fiduceo.fcdr.writer.templates.mviri_flag_mapper import MVIRI_FlagMapper
+
+
+class DefaultFlagMapperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.random = np.random.RandomState(31)
+
+    def test_evaluate_masks_uint8(self):
+        mapper = MVIRI_FlagMapper()
+        flag_data = self.random.randint(0, 256, size=(50, 40)).astype(np.uint8)
+        global_flag_data = self.random.choice([0, gf.INVALID_INPUT, gf.PADDED_DATA], size=(50, 40)).astype(np.uint8)
+
+        result = mapper.evaluate_masks_uint8(flag_data, global_flag_data, mapper.source_masks, mapper.target_masks)
+
+        self.assertEqual(np.uint8, result.dtype)
+        np.testing.assert_array_equal(self._evaluate_masks(flag_data, global_flag_data, mapper.source_masks, mapper.target_masks), result)
+
+    def test_evaluate_masks_uint16(self):
+        mapper = DefaultFlagMapper()
+        source_masks = [np.uint16(1), np.uint16(256), np.uint16(32768 + 2)]
+        target_masks = [gf.USE_WITH_CAUTION, gf.INVALID, gf.INVALID_TIME]
+        flag_data = self.random.randint(0, 65536, size=(20, 30)).astype(np.uint16)
+        global_flag_data = np.zeros((20, 30), dtype=np.uint8)
+
+        result = mapper.evaluate_masks_uint8(flag_data, global_flag_data, source_masks, target_masks)
+
+        self.assertEqual(65536, len(mapper.get_lookup_table(np.uint16, np.uint8, source_masks, target_masks)))
+        np.testing.assert_array_equal(self._evaluate_masks(flag_data, global_flag_data, source_masks, target_masks), result)
+
+    def test_evaluate_masks_signed(self):
+        mapper = DefaultFlagMapper()
+        source_masks = [np.int8(1), np.uint8(128)]
+        target_masks = [gf.USE_WITH_CAUTION, gf.INVALID]
+        flag_data = np.array([0, 1, -128, -127, 64], dtype=np.int8)
+        global_flag_data = np.zeros(5, dtype=np.uint8)
+
+        result = mapper.evaluate_masks_uint8(flag_data, global_flag_data, source_masks, target_masks)
+
+        np.testing.assert_array_equal([0, 2, 1, 3, 0], result)
+
+    def test_evaluate_masks_wider_types_evaluated_per_mask(self):
+        mapper = DefaultFlagMapper()
+        flag_data = np.array([0, 2, 4, 65536], dtype=np.int32)
+        global_flag_data = np.zeros(4, dtype=np.uint8)
+
+        result = mapper.evaluate_masks_uint8(flag_data, global_flag_data, [np.int32(2), np.int32(65536)], [gf.USE_WITH_CAUTION, gf.INVALID])
+
+        np.testing.assert_array_equal([0, 2, 0, 1], result)
+
+    def test_get_lookup_table_is_built_once_per_class(self):
+        table = AVHRR_FlagMapper.get_lookup_table(np.uint8, np.uint8, AVHRR_FlagMapper.source_masks, AVHRR_FlagMapper.target_masks)
+
+        self.assertIs(table, AVHRR_FlagMapper().get_lookup_table(np.uint8, np.uint8, AVHRR_FlagMapper.source_masks, AVHRR_FlagMapper.target_masks))
+        self.assertFalse(table.flags.writeable)
+        self.assertEqual(256, len(table))
+        np.testing.assert_array_equal([0, 2, 2, 2, 0], table[:5])
+
+    @staticmethod
+    def _evaluate_masks(flag_data, global_flag_data, source_masks, target_masks):
+        expected = global_flag_data.copy()
+        for source_mask, target_mask in zip(source_masks, target_masks):
+            expected[np.bitwise_and(flag_data, source_mask) > 0] |= target_mask
+        return expected
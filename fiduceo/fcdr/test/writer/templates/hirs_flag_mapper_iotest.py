@@ -0,0 +1,95 @@
+import datetime
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from fiduceo.fcdr.writer.global_flags import GlobalFlags as gf
+from fiduceo.fcdr.writer.templates.hirs_flag_mapper import HIRS_FlagMapper
+
+PRODUCT_WIDTH = 56
+PRODUCT_HEIGHT = 7000
+NUM_CHANNELS = 19
+
+
+class HIRS_FlagMapperIoTest(unittest.TestCase):
+
+    def test_map_global_flags_speedup(self):
+        mapper = HIRS_FlagMapper()
+
+        legacy_flags, legacy_seconds = self._measure(mapper, _apply_scanline_flags_loop, _apply_channel_flags_loop)
+        flags, seconds = self._measure(mapper, HIRS_FlagMapper.apply_scanline_flags, HIRS_FlagMapper.apply_channel_flags)
+
+        print("HIRS flag mapping of " + str(PRODUCT_HEIGHT) + " lines, loops: " + str(legacy_seconds) + " s, vectorized: " + str(seconds) + " s")
+
+        np.testing.assert_array_equal(legacy_flags, flags)
+        self.assertTrue(seconds * 10 < legacy_seconds)
+
+    def _measure(self, mapper, apply_scanline_flags, apply_channel_flags):
+        dataset = self.create_dataset()
+
+        start_time = datetime.datetime.now()
+        global_flag_data = dataset["quality_pixel_bitmask"].data
+        global_flag_data = mapper.evaluate_masks_uint8(dataset["data_quality_bitmask"].data, global_flag_data, mapper.source_masks, mapper.target_masks)
+        global_flag_data = apply_scanline_flags(mapper, dataset, global_flag_data)
+        global_flag_data = apply_channel_flags(mapper, dataset, global_flag_data)
+        elapsed = (datetime.datetime.now() - start_time).total_seconds()
+
+        return global_flag_data, elapsed
+
+    @staticmethod
+    def create_dataset():
+        random = np.random.RandomState(2718)
+        dataset = xr.Dataset()
+        dataset["quality_pixel_bitmask"] = xr.Variable(["y", "x"], random.choice([0, gf.INVALID_GEOLOC, gf.PADDED_DATA], size=(PRODUCT_HEIGHT, PRODUCT_WIDTH),
+                                                                                    p=[0.9, 0.05, 0.05]).astype(np.uint8))
+        dataset["data_quality_bitmask"] = xr.Variable(["y", "x"], (random.randint(0, 32, size=(PRODUCT_HEIGHT, PRODUCT_WIDTH)) *
+                                                                   (random.rand(PRODUCT_HEIGHT, PRODUCT_WIDTH) < 0.1)).astype(np.uint8))
+        dataset["quality_scanline_bitmask"] = xr.Variable(["y"], (random.randint(0, 32, size=PRODUCT_HEIGHT) * (random.rand(PRODUCT_HEIGHT) < 0.2)).astype(np.int32))
+
+        channel_flags = (random.randint(0, 32, size=(PRODUCT_HEIGHT, NUM_CHANNELS)) * (random.rand(PRODUCT_HEIGHT, NUM_CHANNELS) < 0.05)).astype(np.uint8)
+        # some lines with a flag raised in all channels
+        channel_flags[::50, :] |= random.choice([1, 4, 8], size=(channel_flags[::50].shape[0], 1)).astype(np.uint8)
+        dataset["quality_channel_bitmask"] = xr.Variable(["y", "channel"], channel_flags)
+        return dataset
+
+
+def _apply_channel_flags_loop(mapper, dataset, global_flag_data):
+    # implementation before vectorization, reference for results and timing
+    channel_flag_data = dataset["quality_channel_bitmask"].data
+    num_channels = channel_flag_data.shape[1]
+    for line in range(0, channel_flag_data.shape[0]):
+        for source_mask in mapper.source_channel_masks_dual:
+            flag_count = 0
+            flag_set = False
+            for channel in range(0, num_channels):
+                channel_flag_set = np.bitwise_and(source_mask, channel_flag_data[line, channel]) > 0
+                flag_set |= channel_flag_set
+                flag_count += channel_flag_set.astype(np.uint8)
+
+            if flag_count == num_channels:
+                global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], gf.INVALID)
+            elif flag_set:
+                global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], gf.USE_WITH_CAUTION)
+
+        for source_mask in mapper.source_channel_masks:
+            flag_set = False
+            for channel in range(0, num_channels):
+                channel_flag_set = np.bitwise_and(source_mask, channel_flag_data[line, channel]) > 0
+                flag_set |= channel_flag_set
+
+            if flag_set:
+                global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], gf.USE_WITH_CAUTION)
+
+    return global_flag_data
+
+
+def _apply_scanline_flags_loop(mapper, dataset, global_flag_data):
+    scanline_flag_data = dataset["quality_scanline_bitmask"].data
+    for line in range(0, scanline_flag_data.shape[0]):
+        for source_mask, target_mask in zip(mapper.source_scanline_masks, mapper.target_scanline_masks):
+            flag_set = np.bitwise_and(source_mask, scanline_flag_data[line]) > 0
+            if flag_set:
+                global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], target_mask)
+
+    return global_flag_data
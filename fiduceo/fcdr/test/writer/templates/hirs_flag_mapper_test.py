@@ -1,5 +1,6 @@
 import unittest
 
+import dask.array as da
 import numpy as np
 import xarray as xr
 from xarray import Variable
@@ -150,3 +151,23 @@ class HIRS_FlagMapperTest(unittest.TestCase):
         self.assertEqual(10, self.dataset["quality_pixel_bitmask"].data[2, 0])  # use_with_caution & invalid_geoloc
         self.assertEqual(0, self.dataset["quality_pixel_bitmask"].data[2, 1])
         self.assertEqual(0, self.dataset["quality_pixel_bitmask"].data[2, 2])
+
+    def test_map_global_flags_chunked(self):
+        random = np.random.RandomState(12)
+        dataset = xr.Dataset()
+        dataset["quality_pixel_bitmask"] = Variable(["y", "x"], random.choice([0, gf.INVALID_GEOLOC], size=(20, 5)).astype(np.uint8))
+        dataset["data_quality_bitmask"] = Variable(["y", "x"], (random.randint(0, 32, size=(20, 5)) * (random.rand(20, 5) < 0.3)).astype(np.uint8))
+        dataset["quality_scanline_bitmask"] = Variable(["y"], random.choice([0, 2, 4, 6], size=20).astype(np.int32))
+        channel_flags = (random.randint(0, 32, size=(20, 19)) * (random.rand(20, 19) < 0.1)).astype(np.uint8)
+        channel_flags[3, :] = 1
+        dataset["quality_channel_bitmask"] = Variable(["y", "channel"], channel_flags)
+
+        chunked = dataset.chunk({"y": 7, "x": 2, "channel": 5})
+        self.mapper.map_global_flags(chunked)
+        self.mapper.map_global_flags(dataset)
+
+        global_flag_data = chunked["quality_pixel_bitmask"].data
+        self.assertIsInstance(global_flag_data, da.Array)
+        self.assertEqual(((7, 7, 6), (2, 2, 1)), global_flag_data.chunks)
+        np.testing.assert_array_equal(dataset["quality_pixel_bitmask"].data, global_flag_data.compute())
+        np.testing.assert_array_equal(np.full(5, gf.INVALID), dataset["quality_pixel_bitmask"].data[3] & gf.INVALID)
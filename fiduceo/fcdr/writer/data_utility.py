@@ -1,4 +1,18 @@
+import warnings
+
+import dask.array as da
+import netCDF4
 import numpy as np
+from xarray import Variable
+from xarray.backends import NetCDF4DataStore
+from xarray.backends.api import dump_to_store
+from xarray.backends.common import ArrayWriter
+from xarray.conventions import encode_cf_variable
+
+from fiduceo.common.writer.fill_value_array import FillValueArray
+
+# number of elements compared at once when checking for uniform data
+UNIFORM_CHECK_SIZE = 1 << 20
 
 
 class DataUtility:
@@ -11,8 +25,12 @@ class DataUtility:
         valid_min = DataUtility._apply_min_attribute(variable, valid_range)
         valid_max = DataUtility._apply_max_attribute(variable, valid_range)
 
-        data_min = np.nanmin(variable.data)
-        data_max = np.nanmax(variable.data)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN data
+            data_min = np.nanmin(variable.data)
+            data_max = np.nanmax(variable.data)
+        if np.isnan(data_min):
+            return  # only fill values, nothing to scale
 
         scale_factor = DataUtility._get_scale_factor(variable)
         add_offset = DataUtility._get_add_offset(variable)
@@ -67,3 +85,98 @@ class DataUtility:
                 return valid_max
 
         return valid_range.max
+
+    @staticmethod
+    def store_netcdf(ds, nc, encoding, skip=()):
+        """
+        Define the dimensions and variables of a dataset in a NetCDF4 file opened for writing and write their data, like
+        Dataset.to_netcdf() does: variables in the order of the dataset, with the same attributes and the full encoding.
+        The variables skipped are defined only, their data is neither encoded nor written, no chunk is allocated for
+        them and reading them returns the _FillValue.
+        :param ds: the dataset
+        :param nc: the netCDF4.Dataset
+        :param encoding: dictionary of the encoding per variable name, as for Dataset.to_netcdf()
+        :param skip: names of the data variables not written
+        """
+        skip = set(skip)
+        if len(skip) > 0:
+            ds = ds.copy(deep=False)
+            for name in skip:
+                variable = ds[name].variable
+                # never computed
+                variable.data = da.zeros(variable.shape, dtype=variable.dtype, chunks=-1)
+
+        writer = _SkippingArrayWriter(skip)
+        dump_to_store(ds, NetCDF4DataStore(nc), writer, encoding=encoding, unlimited_dims=ds.encoding.get("unlimited_dims"))
+        writer.sync()
+
+    @staticmethod
+    def is_fill_only(variable, name=None):
+        """
+        Check if the variable holds nothing but the value it is stored with when no data is written to file, i.e.
+        its NetCDF _FillValue, so writing the data can be skipped. Lazy template arrays never written to are
+        detected without reading them, other arrays are compared block by block and rejected on the first
+        differing block. Dask arrays are not checked.
+        :param variable: the variable
+        :param name: the variable name
+        :return: True if writing the data can be skipped
+        """
+        value = DataUtility._get_uniform_value(variable.data)
+        if value is None:
+            return False
+
+        sample = Variable(variable.dims, np.full((1,) * variable.ndim, value, variable.dtype), variable.attrs, variable.encoding)
+        encoded = encode_cf_variable(sample, name=name)
+        if encoded.dtype.kind not in "iuf":
+            return False
+
+        fill_value = encoded.attrs.get("_FillValue")
+        if fill_value is None:
+            fill_value = netCDF4.default_fillvals[encoded.dtype.str[1:]]
+
+        encoded_value = encoded.values.flat[0]
+        if encoded.dtype.kind == "f" and np.isnan(fill_value):
+            return bool(np.isnan(encoded_value))
+        return bool(encoded_value == np.array(fill_value).astype(encoded.dtype))
+
+    @staticmethod
+    def _get_uniform_value(data):
+        if isinstance(data, FillValueArray) and not data.is_materialized():
+            return data.fill_value
+
+        if isinstance(data, da.Array) or data.size == 0:
+            return None
+
+        data = np.asarray(data)
+        if data.dtype.kind not in "iuf":
+            return None
+
+        first = data.flat[0]
+        if data.ndim == 0:
+            return first
+
+        is_nan = data.dtype.kind == "f" and np.isnan(first)
+        step = max(1, UNIFORM_CHECK_SIZE * data.shape[0] // data.size)
+        for start in range(0, data.shape[0], step):
+            block = data[start:start + step]
+            if is_nan:
+                uniform = np.isnan(block).all()
+            else:
+                uniform = (block == first).all()
+            if not uniform:
+                return None
+
+        return first
+
+
+class _SkippingArrayWriter(ArrayWriter):
+    __slots__ = ("skip",)
+
+    def __init__(self, skip):
+        super().__init__()
+        self.skip = skip
+
+    def add(self, source, target, region=None):
+        if getattr(target, "variable_name", None) in self.skip:
+            return
+        super().add(source, target, region)
@@ -0,0 +1,208 @@
+import os
+
+import netCDF4
+import numpy as np
+from xarray import Variable
+from xarray.conventions import encode_cf_variable
+
+from fiduceo.common.writer.compression_profile import CompressionProfile
+from fiduceo.fcdr.writer.data_utility import DataUtility
+from fiduceo.fcdr.writer.fcdr_writer import FCDRWriter
+from fiduceo.fcdr.writer.templates.template_factory import TemplateFactory
+
+BLOCK_DIM = "y"
+EASY = "EASY"
+FULL = "FULL"
+
+
+class FCDRBlockWriter:
+    """
+    Writes an FCDR product incrementally in blocks of scanlines.
+
+    The NetCDF file is created from the template schema when the writer is constructed, all variables along
+    the "y" dimension are then written block by block with write_block(), the remaining variables with
+    write_variables(). Each block is flag mapped, checked against the scaling ranges, scaled and compressed
+    on its own, so the memory needed is bounded by the block size. Variables of a block holding fill values
+    only are not written. Blocks aligned to the chunk height of the
+    sensor (e.g. 1280 lines for AVHRR) are flushed as complete chunks.
+
+    Usage:
+        with FCDRBlockWriter(file, "AVHRR", 13198) as writer:
+            writer.attrs["institution"] = ...
+            for start in range(0, 13198, 1280):
+                block = writer.create_block(min(1280, 13198 - start))
+                ... fill the block ...
+                writer.write_block(block)
+    """
+
+    def __init__(self, file, sensorType, height, fcdr_type=EASY, compression_level=None, overwrite=False, srf_size=None, corr_dx=None, corr_dy=None,
+                 lut_size=None, compression_profile=None):
+        """
+        Create the NetCDF file with all variables of the product, the variables along "y" filled with fill values.
+        :param file: File path
+        :param sensorType: the sensor type
+        :param height: the height in pixels of the data product
+        :param fcdr_type: "EASY" or "FULL"
+        :param compression_level: the file compression level, 0 - 9, default is 5, overrides the level of the compression profile
+        :param overwrite: set true to overwrite existing files
+        :param srf_size: EASY only, if set, the length of the spectral response function in frequency steps
+        :param corr_dx: EASY only, correlation length across track
+        :param corr_dy: EASY only, correlation length along track
+        :param lut_size: EASY only, size of a BT/radiance conversion lookup table
+        :param compression_profile: "fast", "balanced" or "archive" to set deflate level, shuffle filter and quantization per
+        variable class, default is the compression level for all variables
+        """
+        if fcdr_type not in (EASY, FULL):
+            raise ValueError("Invalid FCDR type: " + str(fcdr_type))
+
+        if os.path.isfile(file):
+            if overwrite is True:
+                os.remove(file)
+            else:
+                raise IOError("The file already exists: " + file)
+
+        self.sensorType = sensorType
+        self.height = height
+        self.fcdr_type = fcdr_type
+        self.template_args = dict(srf_size=srf_size, corr_dx=corr_dx, corr_dy=corr_dy, lut_size=lut_size)
+        self.next_line = 0
+
+        # lazy templates allocate nothing for the variables along "y"
+        schema = self._create_template(height, lazy=True)
+        if schema.dims[BLOCK_DIM] != height:
+            raise ValueError("The " + sensorType + " product has a fixed height of " + str(schema.dims[BLOCK_DIM]) + " lines")
+
+        self.attrs = dict(schema.attrs)
+        schema.attrs = dict()
+        self.flag_mapper = TemplateFactory().get_flag_mapper(sensorType)
+        encoding = CompressionProfile.create_encoding(schema, compression_level, compression_profile)
+        for name, var_encoding in encoding.items():
+            chunksizes = var_encoding.get("chunksizes")
+            if chunksizes is not None:
+                # products lower than a chunk
+                var_encoding["chunksizes"] = tuple(min(size, schema.dims[dim]) for size, dim in zip(chunksizes, schema[name].dims))
+        block_names = [name for name in schema.data_vars if BLOCK_DIM in schema[name].dims]
+
+        self.nc = netCDF4.Dataset(file, "w", format="NETCDF4")
+        try:
+            # defined like FCDRWriter.write() does, the variables along "y" are written by blocks
+            DataUtility.store_netcdf(schema, self.nc, encoding, skip=block_names)
+            self.nc.set_auto_maskandscale(False)
+        except Exception:
+            self.nc.close()
+            raise
+
+        # dimensions, attributes and encoding of each variable, the schema data is not kept
+        self.variables = dict((name, self._get_variable_schema(name, variable)) for name, variable in schema.variables.items())
+
+    def create_block(self, num_lines):
+        """
+        Create a template dataset holding the variables along "y" for a block of scanlines.
+        :param num_lines: the number of scanlines
+        :return the block dataset, filled with default values
+        """
+        template = self._create_template(num_lines)
+        block = template[[name for name in template.data_vars if BLOCK_DIM in template[name].dims]]
+        if block.dims[BLOCK_DIM] != num_lines:
+            block = block.isel(**{BLOCK_DIM: slice(0, num_lines)})
+        return block
+
+    def write_block(self, block, start=None):
+        """
+        Map the flags of a block of scanlines, check the scaling ranges and write all variables along "y" to file.
+        Variables of the product missing in the block are left unchanged, variables without the "y" dimension are
+        ignored.
+        :param block: dataset with the variables of the scanlines, e.g. from create_block()
+        :param start: the first scanline of the block, default is to append to the last block written
+        """
+        if start is None:
+            start = self.next_line
+
+        stop = start + block.dims[BLOCK_DIM]
+        if start < 0 or stop > self.height:
+            raise ValueError("Block of lines " + str(start) + " to " + str(stop) + " exceeds product height " + str(self.height))
+
+        if "quality_pixel_bitmask" in block.data_vars:
+            self.flag_mapper.map_global_flags(block)
+
+        # lines not written before read as fill value, blocks holding fill values only need not be written
+        skip_fill = start >= self.next_line
+        for name, variable in block.variables.items():
+            if name == BLOCK_DIM or BLOCK_DIM not in variable.dims:
+                continue
+
+            self._write_variable(name, variable, start, stop, skip_fill)
+
+        self.next_line = max(self.next_line, stop)
+
+    def write_variables(self, ds):
+        """
+        Write variables without the "y" dimension, e.g. spectral response functions or correlation matrices.
+        :param ds: dataset with the variables
+        """
+        for name in ds.data_vars:
+            variable = ds[name].variable
+            if BLOCK_DIM in variable.dims:
+                raise ValueError("Variable " + name + " is written by blocks of scanlines")
+
+            self._write_variable(name, variable, None, None, False)
+
+    def close(self):
+        """
+        Write the global attributes and close the file.
+        """
+        try:
+            missing = [name for name, value in self.attrs.items() if value is None]
+            if len(missing) > 0:
+                raise ValueError("Global attributes not set: " + ", ".join(missing))
+
+            self.nc.setncatts(self.attrs)
+        finally:
+            self.nc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.nc.close()
+
+    def _create_template(self, height, lazy=False):
+        if self.fcdr_type == EASY:
+            return FCDRWriter.createTemplateEasy(self.sensorType, height, lazy=lazy, **self.template_args)
+
+        return FCDRWriter.createTemplateFull(self.sensorType, height, lazy=lazy)
+
+    def _get_variable_schema(self, name, variable):
+        encoding = dict(variable.encoding)
+        if np.issubdtype(variable.dtype, np.datetime64) or np.issubdtype(variable.dtype, np.timedelta64):
+            # all blocks are encoded relative to the same epoch
+            nc_variable = self.nc.variables[name]
+            for key in ["units", "calendar"]:
+                if key in nc_variable.ncattrs():
+                    encoding[key] = nc_variable.getncattr(key)
+        return variable.dims, dict(variable.attrs), encoding
+
+    def _write_variable(self, name, variable, start, stop, skip_fill):
+        if name not in self.variables:
+            raise ValueError("Variable " + name + " is not part of the " + self.sensorType + " " + self.fcdr_type + " product")
+
+        dims, attrs, encoding = self.variables[name]
+        if skip_fill and DataUtility.is_fill_only(Variable(variable.dims, variable.data, attrs, encoding), name):
+            return
+
+        variable = Variable(dims, np.asarray(variable.transpose(*dims).values), attrs, encoding)
+        DataUtility.check_scaling_ranges(variable)
+
+        encoded = encode_cf_variable(variable, name=name)
+        index = tuple(slice(start, stop) if dim == BLOCK_DIM else slice(None) for dim in dims)
+        self.nc.variables[name][index] = FCDRBlockWriter._to_nc_data(encoded)
+
+    @staticmethod
+    def _to_nc_data(encoded):
+        data = encoded.values
+        if data.dtype.kind in "SU":
+            return data.astype(object)
+        return data
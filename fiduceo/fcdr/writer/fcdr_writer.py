@@ -1,9 +1,15 @@
 import os
 
+import dask.array as da
+import netCDF4
 import xarray as xr
 
 from fiduceo.common.version import __version__
+from fiduceo.common.writer.compression_profile import CompressionProfile
+from fiduceo.common.writer.default_data import DefaultData
+from fiduceo.common.writer.fill_value_array import FillValueArray
 from fiduceo.common.writer.writer_utils import WriterUtils
+from fiduceo.fcdr.writer.data_utility import DataUtility
 from fiduceo.fcdr.writer.templates.template_factory import TemplateFactory
 
 DATE_PATTERN = "%Y%m%d%H%M%S"
@@ -12,13 +18,18 @@ DATE_PATTERN = "%Y%m%d%H%M%S"
 class FCDRWriter:
 
     @staticmethod
-    def write(ds, file, compression_level=None, overwrite=False):
+    def write(ds, file, compression_level=None, overwrite=False, compression_profile=None):
         """
-        Save a dataset to NetCDF file.
+        Save a dataset to NetCDF file. Dask backed datasets are flag mapped blockwise and written chunk by chunk,
+        the flag arrays are never loaded as a whole. Variables of lazy templates not written to are stored as fill
+        values chunk by chunk, without allocating them. Variables holding fill values only are defined in the file
+        but no data is written, reading them returns the _FillValue.
         :param ds: The dataset
         :param file: File path
-        :param compression_level: the file compression level, 0 - 9, default is 5
+        :param compression_level: the file compression level, 0 - 9, default is 5, overrides the level of the compression profile
         :param overwrite: set true to overwrite existing files
+        :param compression_profile: "fast", "balanced" or "archive" to set deflate level, shuffle filter and quantization per
+        variable class, default is the compression level for all variables
          """
         if os.path.isfile(file):
             if overwrite is True:
@@ -33,20 +44,35 @@ class FCDRWriter:
 
         # set up compression parameter for ALL variables. Unfortunately, xarray does not allow
         # one set of compression params per file, only per variable. tb 2017-01-25
-        if compression_level is None:
-            compression_level = 5
+        encoding = CompressionProfile.create_encoding(ds, compression_level, compression_profile)
 
-        comp = dict(zlib=True, complevel=compression_level)
-        encoding = dict()
-        for var_name in ds.data_vars:
-            var_encoding = dict(comp)
-            var_encoding.update(ds[var_name].encoding)
-            encoding.update({var_name: var_encoding})
+        fill_only = [var_name for var_name in ds.data_vars if DataUtility.is_fill_only(ds[var_name].variable, var_name)]
+        data_ds = FCDRWriter._defer_fill_values(ds, fill_only)
 
-        ds.to_netcdf(file, format='netCDF4', engine='netcdf4', encoding=encoding)
+        nc = netCDF4.Dataset(file, "w", format="NETCDF4")
+        try:
+            DataUtility.store_netcdf(data_ds, nc, encoding, skip=fill_only)
+        finally:
+            nc.close()
 
     @staticmethod
-    def createTemplateEasy(sensorType, height, srf_size=None, corr_dx=None, corr_dy=None, lut_size=None):
+    def _defer_fill_values(ds, skipped):
+        untouched = [var_name for var_name in ds.data_vars if var_name not in skipped and isinstance(ds[var_name].data, FillValueArray) and
+                     not ds[var_name].data.is_materialized()]
+        if len(untouched) == 0:
+            return ds
+
+        ds = ds.copy(deep=False)
+        for var_name in untouched:
+            data = ds[var_name].data
+            chunks = ds[var_name].encoding.get("chunksizes")
+            if chunks is None:
+                chunks = "auto"
+            ds[var_name].data = da.full(data.shape, data.fill_value, dtype=data.dtype, chunks=chunks)
+        return ds
+
+    @staticmethod
+    def createTemplateEasy(sensorType, height, srf_size=None, corr_dx=None, corr_dy=None, lut_size=None, lazy=False):
         """
         Create a template dataset in EASY FCDR format for the sensor given as argument.
         :param sensorType: the sensor type to create the template for
@@ -55,6 +81,7 @@ class FCDRWriter:
         :param corr_dx: correlation length across track
         :param corr_dy: correlation length along track
         :param lut_size: size of a BT/radiance conversion lookup table
+        :param lazy: set true to allocate the variables on first write only
         :return the template dataset
          """
         dataset = xr.Dataset()
@@ -63,18 +90,20 @@ class FCDRWriter:
         template_factory = TemplateFactory()
 
         sensor_template = template_factory.get_sensor_template(sensorType)
-        sensor_template.add_original_variables(dataset, height, srf_size)
-        sensor_template.add_easy_fcdr_variables(dataset, height, corr_dx, corr_dy, lut_size)
+        with DefaultData.lazy_allocation(lazy):
+            sensor_template.add_original_variables(dataset, height, srf_size)
+            sensor_template.add_easy_fcdr_variables(dataset, height, corr_dx, corr_dy, lut_size)
         sensor_template.add_template_key(dataset)
 
         return dataset
 
     @staticmethod
-    def createTemplateFull(sensorType, height):
+    def createTemplateFull(sensorType, height, lazy=False):
         """
         Create a template dataset in FULL FCDR format for the sensor given as argument.
         :param sensorType: the sensor type to create the template for
         :param height the hheight in pixels of the data product
+        :param lazy: set true to allocate the variables on first write only
         :return the template dataset
          """
         dataset = xr.Dataset()
@@ -84,8 +113,9 @@ class FCDRWriter:
         template_factory = TemplateFactory()
 
         sensor_template = template_factory.get_sensor_template(sensorType)
-        sensor_template.add_original_variables(dataset, height)
-        sensor_template.add_full_fcdr_variables(dataset, height)
+        with DefaultData.lazy_allocation(lazy):
+            sensor_template.add_original_variables(dataset, height)
+            sensor_template.add_full_fcdr_variables(dataset, height)
         sensor_template.add_template_key(dataset)
 
         return dataset
@@ -1,13 +1,73 @@
+import dask.array as da
 import numpy as np
 
+
 class DefaultFlagMapper:
+    # lookup tables of the sensor to global flag mapping, built once per mapper class, masks and data type
+    _lookup_tables = dict()
 
     def map_global_flags(self, dataset):
         pass
 
     def evaluate_masks_uint8(self, avhrr_flag_data, global_flag_data, source_masks, target_masks):
+        """
+        Set the target global flags of all pixels having any of the bits of the corresponding source masks set.
+        Sensor flags of 8 or 16 bit are translated with a lookup table in one pass over the data, other data is
+        evaluated mask by mask. Dask arrays are mapped blockwise and stay lazy.
+        :param avhrr_flag_data: the sensor specific flags
+        :param global_flag_data: the global flags
+        :param source_masks: the sensor specific flag masks
+        :param target_masks: the global flags set for each source mask
+        :return: the global flags
+        """
+        if DefaultFlagMapper.is_dask(avhrr_flag_data, global_flag_data):
+            return da.map_blocks(self.evaluate_masks_uint8, da.asarray(avhrr_flag_data), da.asarray(global_flag_data), source_masks, target_masks,
+                                 dtype=global_flag_data.dtype)
+
+        avhrr_flag_data = np.asarray(avhrr_flag_data)
+        if avhrr_flag_data.dtype.kind in "ui" and avhrr_flag_data.dtype.itemsize <= 2:
+            table = self.get_lookup_table(avhrr_flag_data.dtype, global_flag_data.dtype, source_masks, target_masks)
+            index_type = np.dtype("u" + str(avhrr_flag_data.dtype.itemsize))
+            # indexing with the unsigned flags is faster than take(), which converts the indices to intp first
+            return np.bitwise_or(global_flag_data, table[avhrr_flag_data.view(index_type)])
+
         for source_mask, target_mask in zip(source_masks, target_masks):
             intermediate = np.bitwise_and(avhrr_flag_data, source_mask) > 0
             intermediate = intermediate.astype(np.uint8) * target_mask
             global_flag_data = np.bitwise_or(global_flag_data, intermediate)
-        return global_flag_data
\ No newline at end of file
+        return global_flag_data
+
+    @staticmethod
+    def is_dask(*arrays):
+        """
+        Check if any of the arrays is a dask array.
+        :param arrays: the arrays
+        :return: True if any array is a dask array
+        """
+        return any(isinstance(array, da.Array) for array in arrays)
+
+    @classmethod
+    def get_lookup_table(cls, flag_type, global_flag_type, source_masks, target_masks):
+        """
+        Return the table of the global flags for each possible value of the sensor flags.
+        :param flag_type: data type of the sensor flags, 8 or 16 bit integer
+        :param global_flag_type: data type of the global flags
+        :param source_masks: the sensor specific flag masks
+        :param target_masks: the global flags set for each source mask
+        :return: read-only array of 256 or 65536 entries, indexed by the unsigned sensor flag value
+        """
+        flag_type = np.dtype(flag_type)
+        global_flag_type = np.dtype(global_flag_type)
+        key = (cls, flag_type.str, global_flag_type.str, tuple(int(mask) for mask in source_masks), tuple(int(mask) for mask in target_masks))
+        table = DefaultFlagMapper._lookup_tables.get(key)
+        if table is not None:
+            return table
+
+        flag_values = np.arange(2 ** (8 * flag_type.itemsize), dtype=np.int64).astype(np.dtype("u" + str(flag_type.itemsize))).view(flag_type)
+        table = np.zeros(flag_values.shape, dtype=global_flag_type)
+        for source_mask, target_mask in zip(source_masks, target_masks):
+            table[np.bitwise_and(flag_values, source_mask) > 0] |= target_mask
+
+        table.flags.writeable = False
+        DefaultFlagMapper._lookup_tables[key] = table
+        return table
@@ -1,3 +1,4 @@
+import dask.array as da
 import numpy as np
 
 from fiduceo.fcdr.writer.global_flags import GlobalFlags as gf
@@ -49,38 +50,51 @@ class HIRS_FlagMapper(DefaultFlagMapper):
             return global_flag_data
 
         channel_flag_data = dataset["quality_channel_bitmask"].data
-        num_channels = channel_flag_data.shape[1]
-        for line in range(0, channel_flag_data.shape[0]):
-            for source_mask in self.source_channel_masks_dual:
-                flag_count = 0
-                flag_set = False
-                for channel in range(0, num_channels):
-                    channel_flag_set = np.bitwise_and(source_mask, channel_flag_data[line, channel]) > 0
-                    flag_set |= channel_flag_set
-                    flag_count += channel_flag_set.astype(np.uint8)
-
-                if flag_count == num_channels:
-                    global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], gf.INVALID)
-                elif flag_set:
-                    global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], gf.USE_WITH_CAUTION)
-
-            for source_mask in self.source_channel_masks:
-                flag_set = False
-                for channel in range(0, num_channels):
-                    channel_flag_set = np.bitwise_and(source_mask, channel_flag_data[line, channel]) > 0
-                    flag_set |= channel_flag_set
-
-                if flag_set:
-                    global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], gf.USE_WITH_CAUTION)
+        if DefaultFlagMapper.is_dask(channel_flag_data):
+            # all channels of a line are needed at once
+            line_flags = channel_flag_data.rechunk({1: -1}).map_blocks(self._get_channel_line_flags, global_flag_data.dtype, drop_axis=1,
+                                                                       dtype=global_flag_data.dtype)
+        else:
+            line_flags = self._get_channel_line_flags(channel_flag_data, global_flag_data.dtype)
 
-        return global_flag_data
+        return HIRS_FlagMapper._apply_line_flags(global_flag_data, line_flags)
 
     def apply_scanline_flags(self, dataset, global_flag_data):
         scanline_flag_data = dataset["quality_scanline_bitmask"].data
-        for line in range(0, scanline_flag_data.shape[0]):
-            for source_mask, target_mask in zip(self.source_scanline_masks, self.target_scanline_masks):
-                flag_set = np.bitwise_and(source_mask, scanline_flag_data[line]) > 0
-                if flag_set:
-                    global_flag_data[line, :] = np.bitwise_or(global_flag_data[line, :], target_mask)
+        if DefaultFlagMapper.is_dask(scanline_flag_data):
+            line_flags = scanline_flag_data.map_blocks(self._get_scanline_line_flags, global_flag_data.dtype, dtype=global_flag_data.dtype)
+        else:
+            line_flags = self._get_scanline_line_flags(scanline_flag_data, global_flag_data.dtype)
+
+        return HIRS_FlagMapper._apply_line_flags(global_flag_data, line_flags)
+
+    def _get_channel_line_flags(self, channel_flag_data, flag_type):
+        # bits set in any and in all channels of each line
+        any_channel = np.bitwise_or.reduce(channel_flag_data, axis=1)
+        all_channels = np.bitwise_and.reduce(channel_flag_data, axis=1)
+
+        line_flags = np.zeros(channel_flag_data.shape[0], dtype=flag_type)
+        for source_mask in self.source_channel_masks_dual:
+            line_flags |= np.where(np.bitwise_and(all_channels, source_mask) > 0, gf.INVALID,
+                                   np.where(np.bitwise_and(any_channel, source_mask) > 0, gf.USE_WITH_CAUTION, 0)).astype(line_flags.dtype)
+
+        for source_mask in self.source_channel_masks:
+            line_flags |= np.where(np.bitwise_and(any_channel, source_mask) > 0, gf.USE_WITH_CAUTION, 0).astype(line_flags.dtype)
+
+        return line_flags
+
+    def _get_scanline_line_flags(self, scanline_flag_data, flag_type):
+        line_flags = np.zeros(scanline_flag_data.shape[0], dtype=flag_type)
+        for source_mask, target_mask in zip(self.source_scanline_masks, self.target_scanline_masks):
+            line_flags |= np.where(np.bitwise_and(scanline_flag_data, source_mask) > 0, target_mask, 0).astype(line_flags.dtype)
+
+        return line_flags
+
+    @staticmethod
+    def _apply_line_flags(global_flag_data, line_flags):
+        if DefaultFlagMapper.is_dask(global_flag_data, line_flags):
+            return da.bitwise_or(da.asarray(global_flag_data), line_flags[:, np.newaxis])
 
+        # broadcast onto all pixels of each line, in place like the pixel flags
+        np.bitwise_or(global_flag_data, line_flags[:, np.newaxis], out=global_flag_data)
         return global_flag_data